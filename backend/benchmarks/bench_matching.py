@@ -0,0 +1,61 @@
+"""
+Matching throughput benchmark.
+
+Scores a synthetic menu against a synthetic catalog with an increasing number
+of process pool workers and reports names/s for each worker count.
+
+    cd backend
+    python -m benchmarks.bench_matching --catalog 5000 --names 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import List, Dict
+
+from services.matching import MatchingService
+from benchmarks.fakes import FakeDatabaseService, make_catalog, make_menu
+
+
+async def run(workers: int, catalog: List[Dict], names: List[str], rounds: int) -> float:
+    service = MatchingService(FakeDatabaseService(catalog), max_workers=workers)
+    service.catalog_limit = len(catalog)
+    try:
+        # Warm up: load the catalog and start the pool
+        await service.match_products_batch(names[:1])
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await service.match_products_batch(names)
+        elapsed = time.perf_counter() - start
+        return len(names) * rounds / elapsed
+    finally:
+        service.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Matching throughput by worker count")
+    parser.add_argument("--catalog", type=int, default=1000, help="catalog size")
+    parser.add_argument("--names", type=int, default=100, help="menu names per batch")
+    parser.add_argument("--rounds", type=int, default=3, help="batches per worker count")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    catalog = make_catalog(args.catalog, rng)
+    names = make_menu(args.names, rng)
+
+    print(f"catalog={args.catalog} names={args.names} rounds={args.rounds}")
+    print(f"{'workers':>8} {'names/s':>10} {'speedup':>8}")
+
+    baseline = None
+    worker_counts = [0] + [w for w in (1, 2, 4, 8, 16, 32) if w <= args.max_workers]
+    for workers in worker_counts:
+        throughput = await run(workers, catalog, names, args.rounds)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Session response serialization benchmark.
+
+Compares the previous response path (jsonable_encoder + stdlib JSONResponse,
+as used for /session/{id}/status) with FastJSONResponse, and reports the
+cost and size of gzip/brotli compression of the resulting body.
+
+    cd backend
+    python -m benchmarks.bench_serialization --items 50,500
+"""
+import argparse
+import logging
+import random
+from datetime import datetime
+from typing import Dict, Any, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from services.serialization import FastJSONResponse, compress, orjson, brotli
+from services.session_schema import build_session_items
+from benchmarks.fakes import make_ocr_products, make_images
+from benchmarks.harness import measure, print_results
+
+
+def make_session_payload(size: int, rng: random.Random) -> Dict[str, Any]:
+    """Status response for a processed session with `size` items and 3 images each"""
+    ocr_products = make_ocr_products(size, rng)
+    matches = [
+        {"name": p["name"].strip(), "matched": i % 2 == 0, "confidence": 0.9, "product_id": f"p{i}"}
+        for i, p in enumerate(ocr_products)
+    ]
+    items = build_session_items(matches, ocr_products)
+    for item in items:
+        item["images"] = make_images()
+        item["image_url"] = item["images"][0]["url"]
+    return {
+        "session_id": "benchmark",
+        "upload_time": datetime.utcnow(),
+        "processing_status": {"status": "completed", "progress": 100, "total": size, "completed": size, "error": None},
+        "items": items,
+        "total_items": size,
+        "matched_items": len([m for m in items if m["matched"]]),
+        "ocr_error": None
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session response serialization benchmark")
+    parser.add_argument("--items", type=_int_list, default=[50, 500], help="session sizes")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per benchmark")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    print(f"orjson={'yes' if orjson else 'no'} brotli={'yes' if brotli else 'no'}")
+
+    results = []
+    for size in args.items:
+        payload = make_session_payload(size, rng)
+        body = FastJSONResponse(payload).body
+
+        cases = [
+            (f"session/stdlib/items={size}", lambda p=payload: JSONResponse(jsonable_encoder(p)).body),
+            (f"session/fast/items={size}", lambda p=payload: FastJSONResponse(p).body),
+            (f"session/fast+gzip/items={size}", lambda p=payload: compress(FastJSONResponse(p).body, "gzip")),
+        ]
+        if brotli is not None:
+            cases.append((f"session/fast+br/items={size}", lambda p=payload: compress(FastJSONResponse(p).body, "br")))
+
+        size_results = [measure(name, fn, min_time=args.min_time, min_iterations=3) for name, fn in cases]
+        results.extend(size_results)
+
+        baseline = size_results[0]["ops_per_sec"]
+        speedup = size_results[1]["ops_per_sec"] / baseline if baseline else 0.0
+        sizes = f"raw={len(body) / 1024:.1f}KB gzip={len(compress(body, 'gzip')) / 1024:.1f}KB"
+        if brotli is not None:
+            sizes += f" br={len(compress(body, 'br')) / 1024:.1f}KB"
+        print(f"items={size}: fast path {speedup:.1f}x stdlib, {sizes}")
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Micro-benchmarks for the hot request path.
+
+Covers catalog matching (MatchingService._find_best_match), OCR response
+cleaning (OCRService.extract_structured_data with a canned model response),
+salvaging items from a truncated response,
+parse_product_names, session response building/serialization and
+near-duplicate lookups (perceptual hash, multi-index vs linear scan), all
+against in-memory fakes.
+
+    cd backend
+    python -m benchmarks.bench_suite                       # run everything
+    python -m benchmarks.bench_suite --only match          # filter by name
+    python -m benchmarks.bench_suite --save benchmarks/baseline.json
+    python -m benchmarks.bench_suite --compare benchmarks/baseline.json --threshold 10
+
+With --compare the exit code is 1 if any benchmark lost more than
+--threshold percent ops/s against the baseline.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import sys
+from typing import List, Dict, Any, Callable, Tuple
+
+from services.matching import MatchingService
+from services.ocr import OCRService
+from services.partial_json import salvage_products
+from services.session_schema import build_session_items
+from services.dedup import HammingIndex, hamming, perceptual_hash
+from benchmarks.fakes import (
+    FakeDatabaseService, FakeOpenAIClient, FakeUploadFile,
+    make_catalog, make_menu, make_ocr_products, make_ocr_response, make_ocr_text, make_images
+)
+from benchmarks.harness import measure, print_results, find_regressions, save_baseline, load_baseline
+
+
+def _fake_photo(width: int = 640, height: int = 480) -> bytes:
+    """A decodable JPEG, so image preprocessing sees a real photo"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (240, 235, 220)).save(buffer, "JPEG", quality=70)
+    return buffer.getvalue()
+
+
+FAKE_IMAGE = _fake_photo()
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def matching_cases(catalog_sizes: List[int], rng: random.Random) -> List[Tuple[str, Callable]]:
+    cases = []
+    for size in catalog_sizes:
+        service = MatchingService(FakeDatabaseService(make_catalog(size, rng)), max_workers=0)
+        service.catalog_limit = size
+        service.catalog_ttl = float("inf")
+        names = make_menu(50, rng)
+        state = {"i": 0}
+
+        def find_best_match(service=service, names=names, state=state):
+            state["i"] = (state["i"] + 1) % len(names)
+            return service._find_best_match(names[state["i"]])
+
+        cases.append((f"match/catalog={size}", find_best_match))
+    return cases
+
+
+def ocr_cases(menu_sizes: List[int], rng: random.Random) -> List[Tuple[str, Callable]]:
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    cases = []
+    for size in menu_sizes:
+        response = make_ocr_response(size, rng)
+        service = OCRService()
+        service.client = FakeOpenAIClient(response)
+        upload = FakeUploadFile(FAKE_IMAGE)
+
+        cases.append((f"ocr/clean/items={size}", lambda s=service, r=response: s._parse_structured_response(r)))
+        cases.append((f"ocr/extract/items={size}", lambda s=service, u=upload: s.extract_structured_data(u)))
+
+        truncated = response[:len(response) * 2 // 3]
+        cases.append((f"ocr/salvage/items={size}", lambda t=truncated: salvage_products(t)))
+
+        text = make_ocr_text(size, rng)
+        cases.append((f"ocr/parse_names/items={size}", lambda s=service, t=text: s.parse_product_names(t)))
+    return cases
+
+
+def response_cases(menu_sizes: List[int], rng: random.Random) -> List[Tuple[str, Callable]]:
+    cases = []
+    for size in menu_sizes:
+        ocr_products = make_ocr_products(size, rng)
+        matches = [
+            {"name": p["name"], "matched": i % 2 == 0, "confidence": 0.9, "product_id": f"p{i}"}
+            for i, p in enumerate(ocr_products)
+        ]
+
+        def build_response(matches=matches, ocr_products=ocr_products):
+            items = build_session_items(matches, ocr_products)
+            return json.dumps({
+                "session_id": "benchmark",
+                "items": items,
+                "total_items": len(items),
+                "matched_items": len([m for m in items if m["matched"]]),
+                "ocr_error": None
+            })
+
+        session_items = build_session_items(matches, ocr_products)
+        for item in session_items:
+            item["images"] = make_images()
+            item["image_url"] = item["images"][0]["url"]
+
+        def serialize_session(items=session_items):
+            return json.dumps({"session_id": "benchmark", "items": items, "total_items": len(items)})
+
+        cases.append((f"response/build/items={size}", build_response))
+        cases.append((f"response/session_json/items={size}", serialize_session))
+    return cases
+
+
+def dedup_cases(index_sizes: List[int], rng: random.Random) -> List[Tuple[str, Callable]]:
+    from PIL import Image
+
+    image = Image.effect_noise((1600, 2000), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    photo = buffer.getvalue()
+    cases = [("dedup/hash/1600x2000", lambda: perceptual_hash(photo))]
+
+    for size in index_sizes:
+        hashes = [rng.getrandbits(64) for _ in range(size)]
+        index = HammingIndex(4)
+        for i, value in enumerate(hashes):
+            index.add(value, i)
+        queries = [rng.getrandbits(64) for _ in range(64)]
+        state = {"i": 0}
+
+        def index_search(index=index, queries=queries, state=state):
+            state["i"] = (state["i"] + 1) % len(queries)
+            return index.search(queries[state["i"]])
+
+        def linear_scan(hashes=hashes, queries=queries, state=state):
+            state["i"] = (state["i"] + 1) % len(queries)
+            query = queries[state["i"]]
+            return [i for i, value in enumerate(hashes) if hamming(query, value) <= 4]
+
+        cases.append((f"dedup/index/index={size}", index_search))
+        cases.append((f"dedup/scan/index={size}", linear_scan))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Menu Visualizer micro-benchmarks")
+    parser.add_argument("--catalog-sizes", type=_int_list, default=[1000, 10000, 100000])
+    parser.add_argument("--menu-sizes", type=_int_list, default=[10, 50, 200])
+    parser.add_argument("--dedup-sizes", type=_int_list, default=[10000, 100000])
+    parser.add_argument("--only", default="", help="run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+    if args.compare and not os.path.exists(args.compare):
+        # Baselines are machine-specific and not committed; fail before running anything
+        parser.error(f"no baseline at {args.compare}; record one on this machine with `make bench-save` first")
+
+    # Benchmarks would otherwise be dominated by INFO logging
+    logging.disable(logging.INFO)
+
+    rng = random.Random(42)
+    cases = []
+    # Building large synthetic catalogs is slow, skip it when filtered out
+    if not args.only or "match" in args.only:
+        cases += matching_cases(args.catalog_sizes, rng)
+    cases += ocr_cases(args.menu_sizes, rng)
+    cases += response_cases(args.menu_sizes, rng)
+    if not args.only or "dedup" in args.only:
+        cases += dedup_cases(args.dedup_sizes, rng)
+    cases = [(name, fn) for name, fn in cases if args.only in name]
+
+    results: List[Dict[str, Any]] = []
+    for name, fn in cases:
+        print(f"running {name}...", file=sys.stderr)
+        results.append(measure(name, fn, min_time=args.min_time, min_iterations=3))
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    print_results(results, baseline)
+
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"Saved baseline to {args.save}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""In-memory stand-ins and synthetic data for benchmarks"""
+import copy
+import json
+import random
+import uuid
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+from services.session_schema import compact_session, expand_session
+
+WORDS = [
+    "chicken", "beef", "pork", "salmon", "tuna", "shrimp", "tofu", "mushroom",
+    "caesar", "greek", "garden", "spicy", "grilled", "fried", "roasted", "smoked",
+    "salad", "soup", "pizza", "burger", "pasta", "risotto", "curry", "taco",
+    "sandwich", "noodles", "dumplings", "steak", "cake", "pie", "tart", "stew"
+]
+
+
+class FakeDatabaseService:
+    """In-memory stand-in for DatabaseService (products and sessions)"""
+
+    def __init__(self, products: Optional[List[Dict]] = None):
+        self.products = products or []
+        self.sessions: Dict[str, Dict] = {}
+
+    async def ping(self):
+        pass
+
+    async def get_products(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        return self.products[offset:offset + limit]
+
+    async def get_product(self, product_id: str) -> Optional[Dict]:
+        return next((p for p in self.products if p["_id"] == product_id), None)
+
+    async def store_session(self, session_data: Dict) -> str:
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = {
+            "_id": session_id,
+            "upload_time": datetime.utcnow(),
+            **compact_session(copy.deepcopy(session_data))
+        }
+        return session_id
+
+    async def get_session(self, session_id: str) -> Optional[Dict]:
+        session = self.sessions.get(session_id)
+        return expand_session(copy.deepcopy(session)) if session else None
+
+    async def update_session(self, session_id: str, update_data: Dict) -> bool:
+        if session_id not in self.sessions:
+            return False
+        self.sessions[session_id].update(copy.deepcopy(update_data))
+        return True
+
+    def record_session_progress(self, session_id: str, update_data: Dict):
+        pass
+
+    async def get_latest_menu_session(self, menu_id: str) -> Optional[Dict]:
+        sessions = [s for s in self.sessions.values() if s.get("menu_id") == menu_id]
+        return expand_session(copy.deepcopy(sessions[-1])) if sessions else None
+
+    async def get_session_hashes(self, limit: int) -> List[tuple]:
+        hashed = [(s["_id"], s["image_hash"], s.get("menu_id")) for s in self.sessions.values() if s.get("image_hash") and s.get("menu_id")]
+        return hashed[-limit:]
+
+
+class FakeStorageService:
+    """In-memory stand-in for StorageService (MinIO)"""
+
+    def __init__(self):
+        self.bucket_name = "menu-images"
+        self.objects: Dict[str, bytes] = {}
+
+    async def store_image(self, image_file) -> str:
+        await image_file.seek(0)
+        content = await image_file.read()
+        object_name = f"uploads/{uuid.uuid4()}.jpg"
+        self.objects[object_name] = content
+        return f"minio://{self.bucket_name}/{object_name}"
+
+    def put_bytes(self, object_name: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+        self.objects[object_name] = data
+        return object_name
+
+    def get_bytes(self, object_name: str) -> bytes:
+        return self.objects[object_name]
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content: str):
+        self.message = _Message(content)
+
+
+class _Completion:
+    def __init__(self, content: str):
+        self.choices = [_Choice(content)]
+
+
+class FakeOpenAIClient:
+    """Returns a canned chat completion, mimicking openai.OpenAI().chat.completions"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs) -> _Completion:
+        return _Completion(self.content)
+
+
+class FakeUploadFile:
+    """Minimal async UploadFile stand-in"""
+
+    def __init__(self, content: bytes, filename: str = "menu.jpg", content_type: str = "image/jpeg"):
+        self.content = content
+        self.filename = filename
+        self.content_type = content_type
+
+    async def seek(self, offset: int):
+        pass
+
+    async def read(self) -> bytes:
+        return self.content
+
+
+def make_catalog(size: int, rng: random.Random) -> List[Dict]:
+    """Synthetic catalog with 1-4 aliases per product"""
+    products = []
+    for _ in range(size):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 3))).title()
+        products.append({
+            "_id": str(uuid.uuid4()),
+            "name": name,
+            "aliases": [" ".join(rng.sample(WORDS, 2)) for _ in range(rng.randint(1, 4))],
+            "image_url": None,
+            "tags": rng.sample(WORDS, 2)
+        })
+    return products
+
+
+def make_menu(size: int, rng: random.Random) -> List[str]:
+    """Synthetic menu item names"""
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(size)]
+
+
+def make_ocr_products(size: int, rng: random.Random) -> List[Dict[str, str]]:
+    """Synthetic OCR products as returned by the vision model"""
+    products = []
+    for name in make_menu(size, rng):
+        products.append({
+            "name": f"  {name.title()} ",
+            "nameEnglish": name.title(),
+            "price": f"${rng.randint(5, 40)}.{rng.randint(0, 99):02d}",
+            "description": " ".join(rng.sample(WORDS, 6)),
+            "parsingError": ""
+        })
+    return products
+
+
+def make_ocr_response(size: int, rng: random.Random) -> str:
+    """Synthetic JSON response body from the vision model"""
+    return json.dumps({"products": make_ocr_products(size, rng), "error": ""}, indent=2)
+
+
+def make_ocr_text(size: int, rng: random.Random) -> str:
+    """Synthetic raw OCR text with numbering and prices"""
+    lines = []
+    for i, name in enumerate(make_menu(size, rng), start=1):
+        lines.append(f"{i}. {name.title()} ... ${rng.randint(5, 40)}.{rng.randint(0, 99):02d}")
+        if rng.random() < 0.2:
+            lines.append("")
+    return "\n".join(lines)
+
+
+def make_images(count: int = 3) -> List[Dict[str, Any]]:
+    """Provider image records as attached by the background task"""
+    return [
+        {
+            "url": f"https://images.example.com/photos/{uuid.uuid4()}.jpeg?auto=compress&w=350",
+            "source": "pexels",
+            "photographer": "Jane Doe",
+            "photographer_url": "https://www.pexels.com/@jane-doe"
+        }
+        for _ in range(count)
+    ]
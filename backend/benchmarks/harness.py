@@ -0,0 +1,106 @@
+"""Timing, memory and baseline helpers shared by the benchmarks"""
+import asyncio
+import inspect
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name: str, fn: Callable[[], Any], min_time: float = 1.0,
+            min_iterations: int = 5, max_iterations: int = 10000, warmup: int = 1) -> Dict[str, Any]:
+    """
+    Time fn repeatedly and report ops/s, p50/p99 latency and peak memory.
+
+    fn may be a plain callable or return a coroutine. Peak memory comes from a
+    separate traced call so tracemalloc overhead does not skew the timings.
+    """
+    loop = asyncio.new_event_loop()
+
+    def call():
+        result = fn()
+        if inspect.isawaitable(result):
+            result = loop.run_until_complete(result)
+        return result
+
+    try:
+        for _ in range(warmup):
+            call()
+
+        samples = []
+        started = time.perf_counter()
+        while len(samples) < max_iterations:
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+            if len(samples) >= min_iterations and time.perf_counter() - started >= min_time:
+                break
+
+        tracemalloc.start()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        loop.close()
+
+    total = sum(samples)
+    return {
+        "name": name,
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / total if total > 0 else 0.0,
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        "peak_kb": peak / 1024
+    }
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None):
+    header = f"{'benchmark':<32} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KB':>9}"
+    if baseline is not None:
+        header += f" {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        line = (
+            f"{result['name']:<32} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>9.3f} "
+            f"{result['p99_ms']:>9.3f} {result['peak_kb']:>9.1f}"
+        )
+        if baseline is not None:
+            base = baseline.get(result["name"])
+            line += f" {_change(result, base):>8}" if base else f" {'new':>8}"
+        print(line)
+
+
+def _change(result: Dict[str, Any], base: Dict[str, Any]) -> str:
+    change = (result["ops_per_sec"] - base["ops_per_sec"]) / base["ops_per_sec"] * 100
+    return f"{change:+.1f}%"
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                     threshold_pct: float) -> List[str]:
+    """Names of benchmarks whose ops/s dropped more than threshold_pct below baseline"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result["name"])
+        if base and result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold_pct / 100.0):
+            regressions.append(f"{result['name']} ({_change(result, base)})")
+    return regressions
+
+
+def save_baseline(path: str, results: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({result["name"]: result for result in results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,312 @@
+"""
+End-to-end load and soak harness for /parse-image and the background pipeline.
+
+Starts the provider stubs (benchmarks.stubs) and the API with in-memory
+MongoDB/MinIO stand-ins (benchmarks.loadtest_app) as subprocesses, then
+drives concurrent uploads, each followed by status polling until its images
+are processed.
+
+    cd backend
+    # ramp concurrency until throughput stops growing
+    python -m benchmarks.loadtest --levels 1,2,4,8,16,32 --step-duration 30
+    # hold a fixed load and report every 30s
+    python -m benchmarks.loadtest --soak 1800 --concurrency 8
+    # against an already running API (e.g. docker compose pointed at the stubs)
+    python -m benchmarks.loadtest --target http://localhost:8000 --stubs-url http://localhost:9100
+
+Reports per step: completed flows/s, upload latency (OCR + match + store),
+time until images are processed, polls per flow, errors, and the stubs'
+own request counts and latencies. The saturation point is the first level
+where throughput grows less than --saturation-gain over the previous level.
+"""
+import argparse
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+def make_menu_image() -> bytes:
+    """A small JPEG upload; the OpenAI stub never looks at the pixels"""
+    try:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (240, 235, 220)).save(buffer, format="JPEG", quality=70)
+        return buffer.getvalue()
+    except ImportError:
+        return b"\xff\xd8\xff\xe0" + b"\x00" * 4096
+
+
+class StepStats:
+    """Samples collected while running one load level"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.started = time.perf_counter()
+        self.upload_ms: List[float] = []
+        self.images_ms: List[float] = []
+        self.total_ms: List[float] = []
+        self.polls: List[int] = []
+        self.completed = 0
+        self.upload_errors = 0
+        self.rejected = 0
+        self.pipeline_errors = 0
+        self.timeouts = 0
+
+    def summary(self, stub_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 1),
+            "completed": self.completed,
+            "throughput": self.completed / elapsed if elapsed > 0 else 0.0,
+            "upload_p50_ms": _percentile(self.upload_ms, 50),
+            "upload_p95_ms": _percentile(self.upload_ms, 95),
+            "images_p50_ms": _percentile(self.images_ms, 50),
+            "images_p95_ms": _percentile(self.images_ms, 95),
+            "total_p95_ms": _percentile(self.total_ms, 95),
+            "polls_per_flow": sum(self.polls) / len(self.polls) if self.polls else 0.0,
+            "upload_errors": self.upload_errors,
+            "rejected": self.rejected,
+            "pipeline_errors": self.pipeline_errors,
+            "timeouts": self.timeouts,
+            "stubs": stub_stats or {}
+        }
+
+
+async def run_flow(client: httpx.AsyncClient, image: bytes, stats: StepStats,
+                   poll_interval: float, flow_timeout: float):
+    """Upload one menu and poll its session until the background pipeline finishes"""
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/parse-image", files={"file": ("menu.jpg", image, "image/jpeg")}
+        )
+    except httpx.HTTPError:
+        stats.upload_errors += 1
+        return
+    uploaded = time.perf_counter()
+
+    if response.status_code == 503:
+        stats.rejected += 1
+        retry_after = float(response.headers.get("Retry-After", poll_interval))
+        await asyncio.sleep(min(retry_after, poll_interval * 5))
+        return
+    if response.status_code != 200:
+        stats.upload_errors += 1
+        return
+    stats.upload_ms.append((uploaded - start) * 1000)
+
+    session_id = response.json()["session_id"]
+    polls = 0
+    while time.perf_counter() - start < flow_timeout:
+        await asyncio.sleep(poll_interval)
+        polls += 1
+        try:
+            status = await client.get(f"/session/{session_id}/status")
+        except httpx.HTTPError:
+            continue
+        if status.status_code != 200:
+            continue
+        state = status.json()["processing_status"]["status"]
+        if state in ("completed", "error"):
+            finished = time.perf_counter()
+            stats.polls.append(polls)
+            if state == "error":
+                stats.pipeline_errors += 1
+                return
+            stats.completed += 1
+            stats.images_ms.append((finished - uploaded) * 1000)
+            stats.total_ms.append((finished - start) * 1000)
+            return
+
+    stats.timeouts += 1
+
+
+async def run_step(client: httpx.AsyncClient, stubs: Optional[httpx.AsyncClient], image: bytes,
+                   concurrency: int, duration: float, args) -> Dict[str, Any]:
+    """Keep `concurrency` flows in flight for `duration` seconds"""
+    if stubs:
+        await stubs.post("/stats/reset")
+    stats = StepStats(concurrency)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await run_flow(client, image, stats, args.poll_interval, args.flow_timeout)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    stub_stats = (await stubs.get("/stats")).json() if stubs else None
+    return stats.summary(stub_stats)
+
+
+def find_saturation(results: List[Dict[str, Any]], min_gain: float) -> Optional[int]:
+    """First concurrency level whose throughput gain over the previous level is below min_gain"""
+    for previous, current in zip(results, results[1:]):
+        if previous["throughput"] <= 0:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 + min_gain):
+            return current["concurrency"]
+    return None
+
+
+def print_step(result: Dict[str, Any]):
+    print(
+        f"c={result['concurrency']:<4} done={result['completed']:<6} "
+        f"thr={result['throughput']:7.2f}/s "
+        f"upload p50/p95={result['upload_p50_ms']:7.0f}/{result['upload_p95_ms']:7.0f}ms "
+        f"images p50/p95={result['images_p50_ms']:7.0f}/{result['images_p95_ms']:7.0f}ms "
+        f"polls={result['polls_per_flow']:4.1f} "
+        f"err={result['upload_errors']}/{result['pipeline_errors']} "
+        f"503={result['rejected']} timeout={result['timeouts']}"
+    )
+    for name, stub in result["stubs"].items():
+        print(
+            f"       {name:<9} req={stub['requests']:<6} ok={stub['ok']:<6} "
+            f"429={stub['throttled']:<5} 500={stub['errors']:<5} "
+            f"p50/p95={stub['p50_ms']:.0f}/{stub['p95_ms']:.0f}ms"
+        )
+    sys.stdout.flush()
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def wait_healthy(url: str, timeout: float = 30.0):
+    async with httpx.AsyncClient(base_url=url, timeout=2.0) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+def start_processes(args) -> List[subprocess.Popen]:
+    """Start stub and API subprocesses wired to each other"""
+    stubs_url = f"http://127.0.0.1:{args.stubs_port}"
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"{stubs_url}/openai/v1",
+        "PEXELS_API_KEY": "loadtest",
+        "PEXELS_API_URL": f"{stubs_url}/pexels/v1",
+        "UNSPLASH_ACCESS_KEY": "loadtest",
+        "UNSPLASH_API_URL": f"{stubs_url}/unsplash",
+    })
+
+    stubs = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stubs", "--port", str(args.stubs_port),
+        "--openai", args.openai, "--pexels", args.pexels, "--unsplash", args.unsplash
+    ], env=env)
+    api_cmd = [
+        sys.executable, "-m", "benchmarks.loadtest_app", "--port", str(args.api_port),
+        "--catalog", str(args.catalog)
+    ]
+    if args.real_infra:
+        api_cmd.append("--real-infra")
+    api = subprocess.Popen(api_cmd, env=env)
+    return [stubs, api]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load and soak test the parse-image pipeline")
+    parser.add_argument("--target", help="API base URL (default: start a local API with stand-ins)")
+    parser.add_argument("--stubs-url", help="stub server URL when using --target")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency ramp")
+    parser.add_argument("--step-duration", type=float, default=20.0, help="seconds per ramp level")
+    parser.add_argument("--soak", type=float, default=0.0, help="soak duration in seconds (disables ramp)")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrency for --soak")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="soak report window")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="status poll interval (frontend uses 2s)")
+    parser.add_argument("--flow-timeout", type=float, default=120.0)
+    parser.add_argument("--saturation-gain", type=float, default=0.10)
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--stubs-port", type=int, default=9100)
+    parser.add_argument("--catalog", type=int, default=1000)
+    parser.add_argument("--real-infra", action="store_true", help="local API uses real MongoDB/MinIO")
+    parser.add_argument("--openai", default="latency=lognormal:2000:0.4,items=10:40")
+    parser.add_argument("--pexels", default="latency=uniform:80:300")
+    parser.add_argument("--unsplash", default="latency=uniform:100:400")
+    args = parser.parse_args()
+
+    processes = []
+    api_pid = None
+    if args.target:
+        api_url, stubs_url = args.target, args.stubs_url
+    else:
+        processes = start_processes(args)
+        api_pid = processes[1].pid
+        api_url = f"http://127.0.0.1:{args.api_port}"
+        stubs_url = f"http://127.0.0.1:{args.stubs_port}"
+
+    try:
+        await wait_healthy(api_url)
+        if stubs_url:
+            await wait_healthy(stubs_url)
+
+        image = make_menu_image()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=api_url, timeout=args.flow_timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=stubs_url or api_url, timeout=10.0) as stubs_client:
+            stubs = stubs_client if stubs_url else None
+
+            if args.soak:
+                print(f"Soak: concurrency={args.concurrency} for {args.soak:.0f}s")
+                windows = max(1, int(args.soak // args.report_interval))
+                for window in range(windows):
+                    result = await run_step(client, stubs, image, args.concurrency, args.report_interval, args)
+                    rss = _rss_mb(api_pid) if api_pid else None
+                    print(f"[{(window + 1) * args.report_interval:6.0f}s]" + (f" api rss={rss:.0f}MB" if rss else ""))
+                    print_step(result)
+                return
+
+            levels = [int(level) for level in args.levels.split(",") if level.strip()]
+            results = []
+            for concurrency in levels:
+                result = await run_step(client, stubs, image, concurrency, args.step_duration, args)
+                results.append(result)
+                print_step(result)
+
+            saturation = find_saturation(results, args.saturation_gain)
+            best = max(results, key=lambda r: r["throughput"])
+            print(f"Peak throughput {best['throughput']:.2f} flows/s at concurrency {best['concurrency']}")
+            if saturation:
+                print(f"Saturation at concurrency {saturation} (<{args.saturation_gain:.0%} throughput gain)")
+            else:
+                print("No saturation within the tested levels")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Run the API for load tests with in-memory MongoDB and MinIO stand-ins.
+
+Provider calls go wherever OPENAI_BASE_URL / PEXELS_API_URL /
+UNSPLASH_API_URL point (see benchmarks.stubs).
+
+    cd backend
+    python -m benchmarks.loadtest_app --port 8100 --catalog 1000
+    python -m benchmarks.loadtest_app --real-infra   # use MONGODB_URL / MINIO_* instead
+"""
+import argparse
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+
+import uvicorn
+
+import main
+from services.ocr import OCRService
+from services.matching import MatchingService
+from services.image_search import ImageSearchService
+from services.startup import StartupCoordinator
+from services.dedup import MenuDeduplicator
+from benchmarks.fakes import FakeDatabaseService, FakeStorageService, make_catalog
+
+
+def install_standins(catalog_size: int):
+    """Replace the app lifespan so MongoDB and MinIO are served from memory"""
+
+    @asynccontextmanager
+    async def standin_lifespan(app):
+        main.profiler.install(asyncio.get_running_loop())
+        main.db_service = FakeDatabaseService(make_catalog(catalog_size, random.Random(42)))
+        main.storage_service = FakeStorageService()
+        main.ocr_service = OCRService()
+        main.matching_service = MatchingService(main.db_service)
+        main.image_search_service = ImageSearchService()
+        main.deduplicator = MenuDeduplicator(main.db_service)
+        main.startup = StartupCoordinator()
+        main.logger.info(f"Load test app using in-memory stand-ins ({catalog_size} products)")
+        sweeper_task = asyncio.create_task(main.session_jobs.run_forever())
+        try:
+            yield
+        finally:
+            sweeper_task.cancel()
+            await main.session_jobs.shutdown()
+            main.matching_service.shutdown()
+            main.ocr_service.shutdown()
+            main.deduplicator.shutdown()
+
+    main.app.router.lifespan_context = standin_lifespan
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="API server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--catalog", type=int, default=1000, help="synthetic catalog size")
+    parser.add_argument("--real-infra", action="store_true", help="use real MongoDB and MinIO")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    # main.py configures INFO logging, which dominates under load
+    logging.getLogger().setLevel(args.log_level.upper())
+    if not args.real_infra:
+        install_standins(args.catalog)
+    uvicorn.run(main.app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,268 @@
+"""
+Local stand-ins for the OpenAI chat-completions, Pexels search and Unsplash
+search APIs, with configurable latency, error rate and 429 behaviour.
+
+    cd backend
+    python -m benchmarks.stubs --port 9100 \\
+        --openai "latency=lognormal:2000:0.4,error_rate=0.01,rps=10,items=10:40" \\
+        --pexels "latency=uniform:80:300,rate_limit=0.02" \\
+        --unsplash "latency=exp:200"
+
+Point the API at it with:
+
+    OPENAI_BASE_URL=http://localhost:9100/openai/v1
+    PEXELS_API_URL=http://localhost:9100/pexels/v1
+    UNSPLASH_API_URL=http://localhost:9100/unsplash
+
+Stub settings (comma-separated key=value):
+    latency     fixed:MS | uniform:MIN_MS:MAX_MS | exp:MEAN_MS | lognormal:MEDIAN_MS:SIGMA
+    error_rate  probability of a 500 response
+    rate_limit  probability of a random 429 response
+    rps         token-bucket limit; requests over it get 429 with Retry-After
+    items       menu items per OCR response, N or MIN:MAX (openai only)
+
+GET /stats returns per-stub counters and latencies, POST /stats/reset clears them.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, Any, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.fakes import make_ocr_products
+
+
+class LatencyDistribution:
+    """Samples artificial service time in seconds"""
+
+    def __init__(self, spec: str = "fixed:0"):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ("fixed", "uniform", "exp", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == "exp":
+            ms = rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        else:
+            ms = rng.lognormvariate(0, self.params[1]) * self.params[0]
+        return max(0.0, ms) / 1000.0
+
+
+class TokenBucket:
+    """Requests-per-second limiter"""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.tokens = rps
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rps, self.tokens + (now - self.updated) * self.rps)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class StubBehaviour:
+    """Latency, failure and rate-limit behaviour of one stub, plus its stats"""
+
+    def __init__(self, name: str, spec: str = "", seed: int = 0):
+        self.name = name
+        self.latency = LatencyDistribution("fixed:0")
+        self.error_rate = 0.0
+        self.rate_limit = 0.0
+        self.bucket = None
+        self.items = (10, 40)
+        self.rng = random.Random(seed)
+
+        for pair in filter(None, (p.strip() for p in spec.split(","))):
+            key, _, value = pair.partition("=")
+            if key == "latency":
+                self.latency = LatencyDistribution(value)
+            elif key == "error_rate":
+                self.error_rate = float(value)
+            elif key == "rate_limit":
+                self.rate_limit = float(value)
+            elif key == "rps":
+                self.bucket = TokenBucket(float(value))
+            elif key == "items":
+                low, _, high = value.partition(":")
+                self.items = (int(low), int(high or low))
+            else:
+                raise ValueError(f"Unknown {name} stub setting: {key}")
+
+        self.reset()
+
+    def reset(self):
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "latencies_ms": []}
+
+    async def respond(self, build_body) -> JSONResponse:
+        """Apply rate limiting, latency and errors around build_body()"""
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        try:
+            if (self.bucket and not self.bucket.take()) or self.rng.random() < self.rate_limit:
+                self.stats["throttled"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    content={"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                    headers={"Retry-After": "1"}
+                )
+
+            await asyncio.sleep(self.latency.sample(self.rng))
+
+            if self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return JSONResponse(status_code=500, content={"error": {"message": "Stub failure"}})
+
+            self.stats["ok"] += 1
+            return JSONResponse(content=build_body())
+        finally:
+            self.stats["latencies_ms"].append((time.perf_counter() - start) * 1000)
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.stats["latencies_ms"])
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": self.stats["requests"],
+            "ok": self.stats["ok"],
+            "errors": self.stats["errors"],
+            "throttled": self.stats["throttled"],
+            "p50_ms": round(pct(50), 1),
+            "p95_ms": round(pct(95), 1),
+            "p99_ms": round(pct(99), 1)
+        }
+
+
+def _photos(query: str, count: int) -> List[str]:
+    slug = query.replace(" ", "-")
+    return [f"https://stub.images.local/{slug}/{uuid.uuid4().hex[:12]}.jpeg" for _ in range(count)]
+
+
+def create_stub_app(openai_spec: str = "", pexels_spec: str = "", unsplash_spec: str = "", seed: int = 42) -> FastAPI:
+    """One app serving all three stubs under /openai, /pexels and /unsplash"""
+    app = FastAPI(title="Menu Visualizer provider stubs")
+    stubs = {
+        "openai": StubBehaviour("openai", openai_spec, seed),
+        "pexels": StubBehaviour("pexels", pexels_spec, seed + 1),
+        "unsplash": StubBehaviour("unsplash", unsplash_spec, seed + 2)
+    }
+    rng = random.Random(seed + 3)
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stub = stubs["openai"]
+
+        def build():
+            products = make_ocr_products(rng.randint(*stub.items), rng)
+            content = json.dumps({"products": products, "error": ""})
+            prompt_tokens = 800 + len(json.dumps(body)) // 400
+            completion_tokens = len(content) // 4
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+
+        return await stub.respond(build)
+
+    @app.get("/pexels/v1/search")
+    async def pexels_search(query: str = "", per_page: int = 15):
+        def build():
+            return {
+                "total_results": 1000,
+                "photos": [
+                    {
+                        "width": 4000,
+                        "height": 2667,
+                        "src": {"medium": url, "large": url, "large2x": url, "small": url, "original": url},
+                        "photographer": "Stub Photographer",
+                        "photographer_url": "https://stub.images.local/photographer"
+                    }
+                    for url in _photos(query, per_page)
+                ]
+            }
+
+        return await stubs["pexels"].respond(build)
+
+    @app.get("/unsplash/search/photos")
+    async def unsplash_search(query: str = "", per_page: int = 10):
+        def build():
+            return {
+                "total": 1000,
+                "results": [
+                    {
+                        "width": 4000,
+                        "height": 2667,
+                        "urls": {"regular": url, "small": url, "thumb": url, "full": url},
+                        "user": {"name": "Stub Photographer", "links": {"html": "https://stub.images.local/user"}}
+                    }
+                    for url in _photos(query, per_page)
+                ]
+            }
+
+        return await stubs["unsplash"].respond(build)
+
+    @app.get("/stats")
+    async def stats():
+        return {name: stub.summary() for name, stub in stubs.items()}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        for stub in stubs.values():
+            stub.reset()
+        return {"status": "reset"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider stub servers for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--openai", default="latency=lognormal:2000:0.4,items=10:40")
+    parser.add_argument("--pexels", default="latency=uniform:80:300")
+    parser.add_argument("--unsplash", default="latency=uniform:100:400")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_stub_app(args.openai, args.pexels, args.unsplash, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Catalog bulk import/export.
+
+    cd backend
+    python catalog_cli.py import products.csv
+    python catalog_cli.py import products.tsv
+    python catalog_cli.py import products.jsonl --batch-size 10000
+    python catalog_cli.py export products.ndjson
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from services.database import DatabaseService
+from services.catalog_io import CatalogImportService, detect_format, export_ndjson, EXPORT_PROJECTION, IMPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+
+async def run_import(db_service: DatabaseService, path: str, fmt: str, batch_size: int):
+    import_service = CatalogImportService(db_service, batch_size=batch_size)
+    with open(path, "rb") as stream:
+        stats = await import_service.import_stream(stream, fmt or detect_format(path))
+
+    print(f"Processed {stats['processed']} rows: {stats['valid']} valid, {stats['invalid']} invalid")
+    print(f"Upserted {stats['upserted']}, modified {stats['modified']}")
+    print(f"{stats['elapsed_seconds']}s ({stats['rows_per_second']} rows/s)")
+    for error in stats["errors"]:
+        print(f"  {error}")
+
+
+def run_export(db_service: DatabaseService, path: str):
+    start = time.perf_counter()
+    count = 0
+    output = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    try:
+        for line in export_ndjson(db_service.iter_products(projection=EXPORT_PROJECTION)):
+            output.write(line)
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Exported {count} products in {elapsed:.3f}s ({rate:.1f} rows/s)", file=sys.stderr)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Menu Visualizer catalog import/export")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Upsert products from CSV, TSV or JSONL")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=list(IMPORT_FORMATS), help="default: from file extension")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+
+    export_parser = subparsers.add_parser("export", help="Write products as NDJSON")
+    export_parser.add_argument("path", nargs="?", default="-", help="output file, '-' for stdout")
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    db_service = DatabaseService()
+    await db_service.connect()
+    try:
+        if args.command == "import":
+            await run_import(db_service, args.path, args.format, args.batch_size)
+        else:
+            run_export(db_service, args.path)
+    finally:
+        await db_service.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,38 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 import os
 from dotenv import load_dotenv
 import logging
 from contextlib import asynccontextmanager
 import asyncio
-from typing import Dict, Any
+import copy
+import time
+from typing import Dict, Any, Optional
 
 from services.database import DatabaseService
 from services.ocr import OCRService
 from services.matching import MatchingService
 from services.image_search import ImageSearchService
 from services.storage import StorageService
+from services.archiver import SessionArchiver
+from services.session_schema import build_session_items, public_session
+from services.metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS, STAGE_SECONDS, QUEUE_DEPTH, DEDUP_CONFIRMATIONS
+from services.metrics import IMAGE_SEARCH_CANCELLED
+from services.catalog_io import (
+    CatalogImportService, detect_format, export_ndjson, chunk_lines, EXPORT_PROJECTION, IMPORT_FORMATS
+)
+from services.profiling import profiler
+from services.startup import StartupCoordinator
+from services.serialization import FastJSONResponse, CompressionMiddleware
+from services.admission import AdmissionController, AdmissionRejected, current_lane
+from services.dedup import MenuDeduplicator, name_overlap
+from services.menu_diff import plan_reuse, merge_items, removed_count, has_images
+from services.image_variants import target_width, adapt_items
+from services.session_jobs import SessionJobs, ImageJob, AUTO_RESUME_REASONS
+from services.image_cache import ImageResultCache
+from services.cache_warmer import CacheWarmer
+from services.provider_usage import ProviderUsage
 from models.schemas import ProcessImageResponse, ProductResponse, SessionResponse, ImageResult
 
 # Load environment variables
@@ -28,26 +48,74 @@ ocr_service = None
 matching_service = None
 image_search_service = None
 storage_service = None
+session_archiver = None
+deduplicator = None
+image_cache = None
+cache_warmer = None
+startup = None
+
+# Per-stage concurrency limits for the upload pipeline
+admission = AdmissionController()
 
 # Background task status tracking
 background_tasks_status: Dict[str, Dict[str, Any]] = {}
 
+# Running image jobs, cancelled when their session is abandoned
+session_jobs = SessionJobs()
+
+def pipeline_busy() -> bool:
+    """Whether uploads are being processed; background chores wait for off-peak"""
+    return any(admission.stages[stage].in_flight for stage in ("upload", "ocr", "background"))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup"""
-    global db_service, ocr_service, matching_service, image_search_service, storage_service
+    global db_service, ocr_service, matching_service, image_search_service, storage_service, session_archiver, startup
+    global deduplicator, image_cache, cache_warmer
     
+    archiver_task = None
+    warmer_task = None
+    startup_task = None
+    sweeper_task = None
     try:
-        # Initialize services
-        db_service = DatabaseService()
-        await db_service.connect()
+        # Request profiling (no-op unless ADMIN_TOKEN is set)
+        profiler.install(asyncio.get_running_loop())
         
+        # Construct services without I/O; connections are made by the startup steps
+        db_service = DatabaseService()
         ocr_service = OCRService()
         matching_service = MatchingService(db_service)
-        image_search_service = ImageSearchService()
+        image_cache = ImageResultCache(db_service)
+        provider_usage = ProviderUsage(db_service)
+        image_search_service = ImageSearchService(image_cache, provider_usage)
         storage_service = StorageService()
+        session_archiver = SessionArchiver(db_service, storage_service)
+        deduplicator = MenuDeduplicator(db_service)
+        cache_warmer = CacheWarmer(db_service, image_search_service, image_cache, provider_usage, is_busy=pipeline_busy)
+        
+        async def start_archiver():
+            nonlocal archiver_task
+            archiver_task = asyncio.create_task(session_archiver.run_forever())
+        
+        async def start_warmer():
+            nonlocal warmer_task
+            warmer_task = asyncio.create_task(cache_warmer.run_forever())
         
-        logger.info("All services initialized successfully")
+        # Independent steps run concurrently and retry until their dependency is up
+        startup = StartupCoordinator()
+        startup.add("mongo", db_service.connect)
+        startup.add("minio", storage_service.connect)
+        if os.getenv("STARTUP_WARMUP", "false").lower() == "true":
+            startup.add("warmup", matching_service.warm_up, depends_on=["mongo"])
+        startup.add("dedup_index", deduplicator.load, depends_on=["mongo"], required=False)
+        if os.getenv("SESSION_ARCHIVER_ENABLED", "true").lower() == "true":
+            startup.add("archiver", start_archiver, depends_on=["mongo", "minio"], required=False)
+        if cache_warmer.enabled:
+            startup.add("cache_warmer", start_warmer, depends_on=["mongo"], required=False)
+        startup_task = asyncio.create_task(startup.run())
+        sweeper_task = asyncio.create_task(session_jobs.run_forever())
+        
+        logger.info("Services created, initializing in the background")
         yield
         
     except Exception as e:
@@ -55,6 +123,22 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Cleanup
+        if startup_task:
+            startup_task.cancel()
+        if archiver_task:
+            archiver_task.cancel()
+        if warmer_task:
+            warmer_task.cancel()
+        if sweeper_task:
+            sweeper_task.cancel()
+        # Keep partial image results of running jobs for a resume after restart
+        await session_jobs.shutdown()
+        if matching_service:
+            matching_service.shutdown()
+        if ocr_service:
+            ocr_service.shutdown()
+        if deduplicator:
+            deduplicator.shutdown()
         if db_service:
             await db_service.disconnect()
         logger.info("Services cleaned up")
@@ -67,6 +151,31 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    """503 telling the client when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Server busy ({e.stage}), please retry",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+@app.middleware("http")
+async def admit_uploads(request, call_next):
+    """
+    Bound concurrent uploads before their bodies are read; excess gets 503 +
+    Retry-After. Registered first so it is the innermost middleware: CORS,
+    compression and request metrics also apply to its rejections.
+    """
+    if request.method != "POST" or request.url.path != "/parse-image":
+        return await call_next(request)
+    current_lane.set(admission.lane_for(request.headers.get("X-Tenant-Key")))
+    try:
+        async with admission.slot("upload"):
+            return await call_next(request)
+    except AdmissionRejected as e:
+        error = admission_error(e)
+        return JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=error.headers)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -74,31 +183,112 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-Id", "Retry-After"],
 )
 
-async def process_images_background(session_id: str, enhanced_matches: list):
+# Negotiated brotli/gzip for JSON responses (large sessions compress ~10x)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)))
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Observe request latency by route template (not raw path, to bound label cardinality)"""
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status
+        )
+
+@app.middleware("http")
+async def profile_requests(request, call_next):
+    """Sample-profile requests that carry the admin token in X-Profile-Token (?profile=0 opts out)"""
+    if not profiler.wants_profile(request):
+        return await call_next(request)
+    async with profiler.profile(f"{request.method} {request.url.path}") as profile:
+        response = await call_next(request)
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject requests without a valid X-Admin-Token"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def load_session(session_id: str):
+    """Get a session from MongoDB, falling back to the MinIO archive"""
+    session = await db_service.get_session(session_id)
+    if not session and session_archiver:
+        session = await session_archiver.load_session(session_id)
+    return session
+
+async def process_images_background(session_id: str, enhanced_matches: list, job: Optional[ImageJob] = None):
     """Background task to process images for all products"""
+    # Registered before queueing for a slot, so waiting jobs can be cancelled too
+    job = job or session_jobs.start(session_id)
+    # Detached from the request: a background task holds its keep-alive
+    # connection, which would stall the client's status polls until it ends
+    job.runner = asyncio.create_task(_run_image_job(session_id, enhanced_matches, job))
+
+@profiler.profiled("background")
+async def _run_image_job(session_id: str, enhanced_matches: list, job: ImageJob):
+    QUEUE_DEPTH.inc(queue="background_jobs")
+    try:
+        async with admission.slot("background", bounded=False):
+            await _process_images(session_id, enhanced_matches, job)
+    finally:
+        session_jobs.finish(job)
+        QUEUE_DEPTH.dec(queue="background_jobs")
+
+async def _process_images(session_id: str, enhanced_matches: list, job: Optional[ImageJob] = None):
+    """Search images for every item and store them on the session"""
+    job = job or session_jobs.start(session_id)
     try:
+        if job.cancelled:
+            await db_service.update_session(session_id, {"images_cancelled": job.cancel_reason})
+            background_tasks_status[session_id] = {
+                "status": "cancelled", "progress": 0, "total": 0, "completed": 0, "error": None
+            }
+            logger.info(f"Image processing for session {session_id} cancelled ({job.cancel_reason}) before it started")
+            return
+        
         logger.info(f"Starting background image processing for session {session_id}")
         
+        # Items reused from an earlier session already have their images
+        pending = [match for match in enhanced_matches if not has_images(match)]
+        
         # Update status
         background_tasks_status[session_id] = {
             "status": "processing_images",
             "progress": 0,
-            "total": len(enhanced_matches),
+            "total": len(pending),
             "completed": 0,
             "error": None
         }
         
         # Process images in parallel for better performance
         async def process_single_product(match_index: int, match: dict):
+            QUEUE_DEPTH.inc(queue="image_search")
+            in_flight = False
             try:
                 # Use English name for image search if available, otherwise use original name
                 search_name = match["nameEnglish"] if match["nameEnglish"] else match["name"]
                 logger.info(f"Searching for images for product: '{match['name']}' using search term: '{search_name}'")
                 
                 # Get multiple images (3 by default)
-                images = await image_search_service.search_product_images(search_name, count=3)
+                async with admission.slot("image_search", bounded=False):
+                    in_flight = True
+                    with STAGE_SECONDS.time(stage="image_search"):
+                        images = await image_search_service.search_product_images(search_name, count=3)
                 match["images"] = images
                 
                 # Keep backward compatibility with single image_url
@@ -107,6 +297,9 @@ async def process_images_background(session_id: str, enhanced_matches: list):
                 else:
                     match["image_url"] = None
                 
+                # Status polls see images as they arrive; persisted in batches
+                db_service.record_session_progress(session_id, {"matches": enhanced_matches})
+                
                 # Update progress
                 background_tasks_status[session_id]["completed"] += 1
                 background_tasks_status[session_id]["progress"] = (
@@ -116,6 +309,10 @@ async def process_images_background(session_id: str, enhanced_matches: list):
                 
                 logger.info(f"✅ Processed images for '{match['name']}' ({background_tasks_status[session_id]['completed']}/{background_tasks_status[session_id]['total']})")
                 
+            except asyncio.CancelledError:
+                # Session abandoned or cancelled; the item stays without images for a resume
+                IMAGE_SEARCH_CANCELLED.inc(state="in_flight" if in_flight else "queued")
+                raise
             except Exception as e:
                 logger.error(f"Error processing images for product '{match['name']}': {e}")
                 # Set placeholder images on error
@@ -126,22 +323,36 @@ async def process_images_background(session_id: str, enhanced_matches: list):
                     "photographer_url": None
                 }] * 3
                 match["image_url"] = match["images"][0]["url"]
+            finally:
+                QUEUE_DEPTH.dec(queue="image_search")
         
         # Process all products in parallel
         tasks = []
-        for i, match in enumerate(enhanced_matches):
+        for i, match in enumerate(pending):
             task = asyncio.create_task(process_single_product(i, match))
             tasks.append(task)
+        job.started(tasks)
+        
+        # Wait for all tasks to complete (or be cancelled)
+        with STAGE_SECONDS.time(stage="background_images"):
+            await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Wait for all tasks to complete
-        await asyncio.gather(*tasks, return_exceptions=True)
+        if job.cancelled:
+            # Keep the images found so far; a resume searches only the rest
+            await db_service.update_session(session_id, {"matches": enhanced_matches, "images_cancelled": job.cancel_reason})
+            background_tasks_status[session_id]["status"] = "cancelled"
+            logger.info(
+                f"Image processing for session {session_id} cancelled ({job.cancel_reason}) after "
+                f"{background_tasks_status[session_id]['completed']}/{len(pending)} items"
+            )
+            return
         
         # Update session in database with processed images
         session_data = await db_service.get_session(session_id)
         if session_data:
             session_data["matches"] = enhanced_matches
             # Update the session document
-            await db_service.update_session(session_id, {"matches": enhanced_matches})
+            await db_service.update_session(session_id, {"matches": enhanced_matches, "images_processed": True})
         
         # Mark as completed
         background_tasks_status[session_id]["status"] = "completed"
@@ -153,6 +364,160 @@ async def process_images_background(session_id: str, enhanced_matches: list):
         logger.error(f"Background image processing failed for session {session_id}: {e}")
         background_tasks_status[session_id]["status"] = "error"
         background_tasks_status[session_id]["error"] = str(e)
+    finally:
+        session_jobs.finish(job)
+
+async def resume_session(session_id: str, session_data: Dict[str, Any], background_tasks: BackgroundTasks) -> bool:
+    """Search images for the items a cancelled or interrupted session is missing; False if none"""
+    if session_data.get("images_processed", False) or session_jobs.running(session_id):
+        return False
+    admission.check("background")
+    
+    # Registered now so concurrent polls do not resume it twice
+    job = session_jobs.start(session_id)
+    await db_service.update_session(session_id, {"images_cancelled": None})
+    matches = copy.deepcopy(session_data.get("matches", []))
+    missing = len([match for match in matches if not has_images(match)])
+    background_tasks_status[session_id] = {
+        "status": "processing_images", "progress": 0, "total": missing, "completed": 0, "error": None
+    }
+    background_tasks.add_task(process_images_background, session_id, matches, job)
+    logger.info(f"Resuming image processing for session {session_id}")
+    return True
+
+async def track_client(session_id: str, session_data: Dict[str, Any], background_tasks: BackgroundTasks):
+    """Note a client is waiting on the session, resuming it if it was abandoned or interrupted"""
+    session_jobs.touch(session_id)
+    if session_data.get("images_cancelled") in AUTO_RESUME_REASONS:
+        try:
+            await resume_session(session_id, session_data, background_tasks)
+        except AdmissionRejected:
+            # Busy: the partial results are served and a later poll retries
+            pass
+
+async def reuse_session(previous: Dict[str, Any], image_path: str, image_hash: str, content: bytes,
+                        menu_id: str, background_tasks: BackgroundTasks) -> FastJSONResponse:
+    """Store a new session carrying the OCR, match and image results of a near-duplicate upload of its menu"""
+    matches = copy.deepcopy(previous["matches"])
+    images_ready = previous.get("images_processed", False)
+    if not images_ready:
+        admission.check("background")
+    
+    session_id = await db_service.store_session({
+        "image_path": image_path,
+        "matches": matches,
+        "ocr_error": "",
+        "images_processed": images_ready,
+        "image_hash": image_hash,
+        "duplicate_of": previous["_id"],
+        "menu_id": menu_id,
+        "previous_session_id": previous["_id"],
+        "reused_items": len(matches),
+        "reused_matches": 0,
+        "recomputed_items": 0,
+        "removed_items": 0
+    })
+    deduplicator.add(image_hash, session_id, menu_id)
+    logger.info(f"Session {session_id} reuses results of session {previous['_id']}")
+    
+    # The earlier session's images may still be in progress or have failed
+    if not images_ready:
+        background_tasks.add_task(process_images_background, session_id, matches)
+    if deduplicator.confirm:
+        background_tasks.add_task(confirm_duplicate, session_id, content, matches)
+    
+    return FastJSONResponse({
+        "session_id": session_id,
+        "items": adapt_items(matches, None),
+        "total_items": len(matches),
+        "matched_items": len([m for m in matches if m.get("matched")]),
+        "ocr_error": None,
+        "duplicate_of": previous["_id"],
+        "menu_id": menu_id,
+        "previous_session_id": previous["_id"],
+        "reused_items": len(matches),
+        "reused_matches": 0,
+        "recomputed_items": 0,
+        "removed_items": 0
+    })
+
+@profiler.profiled("background")
+async def confirm_duplicate(session_id: str, content: bytes, reused_matches: list):
+    """Re-run OCR for a reused session and reprocess it if the menu turns out to differ"""
+    try:
+        async with admission.slot("ocr", bounded=False):
+            structured_ocr = await ocr_service.extract_from_bytes(content)
+        ocr_products = structured_ocr.get("products", [])
+        if not ocr_products:
+            DEDUP_CONFIRMATIONS.inc(outcome="error")
+            logger.warning(f"Could not confirm session {session_id}: {structured_ocr.get('error')}")
+            return
+        
+        similarity = name_overlap(
+            [product.get("name", "") for product in ocr_products],
+            [match.get("name", "") for match in reused_matches]
+        )
+        if similarity >= deduplicator.confirm_min_similarity:
+            DEDUP_CONFIRMATIONS.inc(outcome="confirmed")
+            return
+        
+        DEDUP_CONFIRMATIONS.inc(outcome="diverged")
+        logger.warning(f"Session {session_id} shares only {similarity:.0%} of items with its near-duplicate, reprocessing")
+        product_names = [product.get("name", "").strip() for product in ocr_products if product.get("name", "").strip()]
+        matches = await matching_service.match_products(product_names)
+        enhanced_matches = build_session_items(matches, ocr_products)
+        # The job for the reused items would otherwise store them over the new ones
+        await session_jobs.supersede(session_id)
+        await db_service.update_session(session_id, {
+            "matches": enhanced_matches,
+            "ocr_error": structured_ocr.get("error", ""),
+            "images_processed": False,
+            "images_cancelled": None,
+            "duplicate_of": None
+        })
+        await process_images_background(session_id, enhanced_matches)
+    except Exception as e:
+        DEDUP_CONFIRMATIONS.inc(outcome="error")
+        logger.error(f"Duplicate confirmation failed for session {session_id}: {e}")
+
+# Prometheus metrics
+@app.get("/metrics")
+async def metrics():
+    """Stage latencies, Mongo/provider timings, OCR tokens, cache and queue stats"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# Request profiles (admin only)
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Recent request and background job profiles, newest first"""
+    return {"profiles": profiler.list()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile_waterfall(profile_id: str):
+    """Stage waterfall of a profile"""
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.waterfall()
+
+@app.get("/admin/profiles/{profile_id}/flamegraph", dependencies=[Depends(require_admin)])
+async def get_profile_flamegraph(profile_id: str):
+    """Collapsed stacks for flamegraph.pl, speedscope or inferno"""
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+# Image cache effectiveness and warmer state
+@app.get("/admin/cache-warmer", dependencies=[Depends(require_admin)])
+async def get_cache_warmer_report():
+    """Image cache hit and warm-hit rates, and the warmer's last run and budget"""
+    if not cache_warmer:
+        raise HTTPException(status_code=404, detail="Cache warmer not running")
+    return await cache_warmer.report()
 
 # Health check endpoint
 @app.get("/health")
@@ -160,23 +525,56 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Menu Visualizer API is running"}
 
+# Liveness probe: the process is up and serving requests
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe"""
+    return {"status": "alive"}
+
+# Readiness probe: startup steps are done and MongoDB answers
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe; 503 until the service can handle uploads"""
+    if startup is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    
+    status = startup.status()
+    if status["ready"]:
+        try:
+            await asyncio.wait_for(db_service.ping(), timeout=float(os.getenv("READINESS_PING_TIMEOUT", 2.0)))
+        except Exception as e:
+            status["ready"] = False
+            status["error"] = f"MongoDB ping failed: {e}"
+    
+    status["status"] = "ready" if status["ready"] else "not_ready"
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # Main image processing endpoint - now returns immediate OCR results
 @app.post("/parse-image", response_model=ProcessImageResponse)
-async def parse_image(file: UploadFile = File(...), background_tasks: BackgroundTasks = BackgroundTasks()):
+async def parse_image(file: UploadFile = File(...), menu_id: Optional[str] = Form(None),
+                      background_tasks: BackgroundTasks = BackgroundTasks()):
     """
     Process uploaded menu image:
     1. Extract structured data using OCR (immediate response)
     2. Start background task for image processing
     3. Return OCR results immediately
+    
+    With a menu_id (e.g. a restaurant's menu slug), items unchanged since the
+    menu's previous upload reuse its catalog matches and images.
     """
     try:
         # Validate file
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
+        menu_id = menu_id.strip() if menu_id else None
+        if menu_id and len(menu_id) > 128:
+            raise HTTPException(status_code=400, detail="menu_id must be at most 128 characters")
+        
         # Check file size (5MB limit)
         max_size = int(os.getenv("MAX_FILE_SIZE", 5242880))  # 5MB
-        content = await file.read()
+        with STAGE_SECONDS.time(stage="upload_read"):
+            content = await file.read()
         file_size = len(content)
         
         if file_size > max_size:
@@ -186,14 +584,29 @@ async def parse_image(file: UploadFile = File(...), background_tasks: Background
         await file.seek(0)
         
         # Store uploaded image (this will reset file pointer internally)
-        image_path = await storage_service.store_image(file)
+        with STAGE_SECONDS.time(stage="minio_store"):
+            image_path = await storage_service.store_image(file)
+        
+        # A re-photographed menu reuses its earlier session; a new version of
+        # it goes through the item diff below
+        with STAGE_SECONDS.time(stage="dedup"):
+            image_hash = await deduplicator.hash_image(content, menu_id)
+            duplicate = await deduplicator.find_session(image_hash, menu_id, load_session)
+        if duplicate:
+            return await reuse_session(duplicate[1], image_path, image_hash, content, menu_id, background_tasks)
+        previous_session = await db_service.get_latest_menu_session(menu_id) if menu_id else None
         
         # Reset file pointer again before OCR
         await file.seek(0)
         
+        # Refuse early if the image pipeline cannot take another menu
+        admission.check("background")
+        
         # Extract structured data using OCR
         logger.info("Starting OCR processing...")
-        structured_ocr = await ocr_service.extract_structured_data(file)
+        async with admission.slot("ocr"):
+            with STAGE_SECONDS.time(stage="ocr"):
+                structured_ocr = await ocr_service.extract_structured_data(file)
         
         # Check for OCR errors
         ocr_error = structured_ocr.get("error", "")
@@ -202,7 +615,7 @@ async def parse_image(file: UploadFile = File(...), background_tasks: Background
         
         # Get products from structured OCR
         ocr_products = structured_ocr.get("products", [])
-        logger.info(f"OCR extracted {len(ocr_products)} products")
+        logger.info(f"OCR extracted {len(ocr_products)} products ({structured_ocr.get('backend', 'remote')} backend)")
         
         # Convert OCR products to product names for matching
         product_names = []
@@ -215,91 +628,115 @@ async def parse_image(file: UploadFile = File(...), background_tasks: Background
         
         logger.info(f"Product names for matching: {product_names}")
         
-        # Match products against catalog
-        matches = await matching_service.match_products(product_names)
+        # Items already in the menu's previous version keep their results
+        previous_items = previous_session.get("matches", []) if previous_session else []
+        reuse = plan_reuse(ocr_products, previous_items)
+        to_match = [product["name"].strip() for product, previous in zip(ocr_products, reuse) if previous is None]
         
-        # Enhance matches with OCR details (without images initially)
-        enhanced_matches = []
-        for i, match in enumerate(matches):
-            # Find corresponding OCR product
-            ocr_product = None
-            if i < len(ocr_products):
-                ocr_product = ocr_products[i]
-            
-            # Create enhanced match without images initially
-            enhanced_match = {
-                "name": match["name"],
-                "nameEnglish": ocr_product.get("nameEnglish", "") if ocr_product else "",
-                "matched": match["matched"],
-                "confidence": match.get("confidence"),
-                "product_id": match.get("product_id"),
-                "image_url": None,  # Will be populated by background task
-                "images": [],  # Will be populated by background task
-                "price": ocr_product.get("price", "") if ocr_product else "",
-                "description": ocr_product.get("description", "") if ocr_product else "",
-                "parsingError": ocr_product.get("parsingError", "") if ocr_product else ""
-            }
-            
-            enhanced_matches.append(enhanced_match)
+        # Match new or renamed products against catalog
+        with STAGE_SECONDS.time(stage="match"):
+            matches = await matching_service.match_products(to_match)
+        
+        # Enhance matches with OCR details (reused images, otherwise filled in later)
+        enhanced_matches, reused_items, reused_matches = merge_items(ocr_products, reuse, matches)
+        recomputed_items = len(enhanced_matches) - reused_items - reused_matches
+        removed_items = removed_count(ocr_products, previous_items)
+        if previous_session:
+            logger.info(
+                f"Menu '{menu_id}': {reused_items} items reused from session {previous_session['_id']}, "
+                f"{reused_matches} kept their match with new images, {recomputed_items} recomputed, "
+                f"{removed_items} removed"
+            )
         
         # Store initial session results without images
+        # Matches carry every OCR field, so they are the only stored copy
         session_data = {
             "image_path": image_path,
-            "raw_ocr_text": "",  # Legacy field - keep for compatibility
-            "parsed_items": product_names,
             "matches": enhanced_matches,
-            "structured_ocr": structured_ocr,
-            "images_processed": False
+            "ocr_error": ocr_error,
+            "images_processed": False,
+            "image_hash": image_hash,
+            "menu_id": menu_id,
+            "previous_session_id": previous_session["_id"] if previous_session else None,
+            "reused_items": reused_items,
+            "reused_matches": reused_matches,
+            "recomputed_items": recomputed_items,
+            "removed_items": removed_items
         }
         
         session_id = await db_service.store_session(session_data)
+        if enhanced_matches and not ocr_error:
+            deduplicator.add(image_hash, session_id, menu_id)
         
         # Start background image processing
         logger.info(f"Starting background image processing for session {session_id}")
         background_tasks.add_task(process_images_background, session_id, enhanced_matches)
         
-        # Return immediate response with OCR results
-        return ProcessImageResponse(
-            session_id=session_id,
-            items=enhanced_matches,
-            total_items=len(enhanced_matches),
-            matched_items=len([m for m in enhanced_matches if m["matched"]]),
-            ocr_error=ocr_error if ocr_error else None
-        )
+        # Return immediate response with OCR results (built here, so no re-validation)
+        return FastJSONResponse({
+            "session_id": session_id,
+            "items": enhanced_matches,
+            "total_items": len(enhanced_matches),
+            "matched_items": len([m for m in enhanced_matches if m["matched"]]),
+            "ocr_error": ocr_error if ocr_error else None,
+            "duplicate_of": None,
+            "menu_id": menu_id,
+            "previous_session_id": session_data["previous_session_id"],
+            "reused_items": reused_items,
+            "reused_matches": reused_matches,
+            "recomputed_items": recomputed_items,
+            "removed_items": removed_items
+        })
         
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         logger.error(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # New endpoint to check session status and get updated results
 @app.get("/session/{session_id}/status")
-async def get_session_status(session_id: str):
-    """Get session processing status and updated results"""
+async def get_session_status(session_id: str, background_tasks: BackgroundTasks,
+                             width: Optional[int] = None, dpr: Optional[float] = None):
+    """
+    Get session processing status and updated results.
+    
+    `width` (CSS pixels) and/or `dpr` point each image url at the smallest
+    stored variant that fills the client's slot; `srcset`, built here from
+    the stored variants, lists them all.
+    Polling keeps the image job alive; a session cancelled for lack of
+    polls, or by a restart, resumes on the next one.
+    """
     try:
-        # Get session from database
-        session_data = await db_service.get_session(session_id)
+        # Get session from database (or archive)
+        session_data = await load_session(session_id)
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found")
+        await track_client(session_id, session_data, background_tasks)
         
         # Get background task status
+        if session_data.get("images_cancelled") and not session_jobs.running(session_id):
+            default_status = "cancelled"
+        else:
+            default_status = "completed" if session_data.get("images_processed", False) else "not_started"
         task_status = background_tasks_status.get(session_id, {
-            "status": "completed" if session_data.get("images_processed", False) else "not_started",
+            "status": default_status,
             "progress": 100 if session_data.get("images_processed", False) else 0,
             "total": len(session_data.get("matches", [])),
             "completed": len(session_data.get("matches", [])) if session_data.get("images_processed", False) else 0,
             "error": None
         })
         
-        return {
+        return FastJSONResponse({
             "session_id": session_id,
             "processing_status": task_status,
-            "items": session_data.get("matches", []),
+            "items": adapt_items(session_data.get("matches", []), target_width(width, dpr)),
             "total_items": len(session_data.get("matches", [])),
             "matched_items": len([m for m in session_data.get("matches", []) if m.get("matched", False)]),
             "ocr_error": session_data.get("structured_ocr", {}).get("error")
-        }
+        })
         
     except HTTPException:
         raise
@@ -307,17 +744,142 @@ async def get_session_status(session_id: str):
         logger.error(f"Error getting session status: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Stop searching images for a session the client no longer needs
+@app.post("/session/{session_id}/cancel")
+async def cancel_session(session_id: str):
+    """Cancel the session's queued and running image searches, keeping images found so far"""
+    try:
+        if not session_jobs.running(session_id) and not await load_session(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        return {"session_id": session_id, "cancelled": session_jobs.cancel(session_id, "client")}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling session: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# Search images for the items a cancelled session is missing
+@app.post("/session/{session_id}/resume")
+async def resume_session_images(session_id: str, background_tasks: BackgroundTasks):
+    """Resume image processing of a cancelled or interrupted session"""
+    try:
+        session_data = await load_session(session_id)
+        if not session_data:
+            raise HTTPException(status_code=404, detail="Session not found")
+        resumed = await resume_session(session_id, session_data, background_tasks)
+        return {"session_id": session_id, "resumed": resumed}
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except Exception as e:
+        logger.error(f"Error resuming session: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 # Get products from catalog
 @app.get("/products", response_model=list[ProductResponse])
-async def get_products(limit: int = 50, offset: int = 0):
-    """Get products from catalog"""
+async def get_products(response: Response, limit: int = 50, offset: int = 0,
+                       cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Get products from catalog.
+    
+    Pages are keyed on _id: pass the X-Next-Cursor header of the previous
+    page as `cursor`. `fields` is a comma-separated projection (e.g.
+    `name,tags`). `offset` is kept for existing clients and skips documents;
+    it cannot be combined with `cursor` or `fields`.
+    """
     try:
-        products = await db_service.get_products(limit=limit, offset=offset)
+        limit = max(1, min(limit, 500))
+        
+        if offset:
+            if cursor or fields:
+                raise ValueError("offset cannot be combined with cursor or fields")
+            return await db_service.get_products(limit=limit, offset=offset)
+        
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        products, next_cursor = await db_service.get_products_page(
+            limit=limit, cursor=cursor, fields=field_list
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        
+        if field_list:
+            # Partial documents do not validate against ProductResponse
+            return JSONResponse(
+                content=[{"id": p.pop("_id"), **p} for p in products],
+                headers=headers
+            )
+        
+        response.headers.update(headers)
         return products
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching products: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Search products in catalog
+@app.get("/products/search")
+async def search_products(q: str, limit: int = 20, prefix: bool = True):
+    """Ranked product search by name, alias or token prefix"""
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        limit = max(1, min(limit, 100))
+
+        products = await db_service.search_products(q, limit=limit, prefix=prefix)
+        return {
+            "query": q,
+            "results": [
+                {
+                    "id": product["_id"],
+                    "name": product["name"],
+                    "aliases": product.get("aliases", []),
+                    "image_url": product.get("image_url"),
+                    "tags": product.get("tags", []),
+                    "score": product["score"]
+                }
+                for product in products
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching products: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# Bulk import products from CSV, TSV or JSONL
+@app.post("/products/import", dependencies=[Depends(require_admin)])
+async def import_products(file: UploadFile = File(...), format: Optional[str] = None):
+    """Stream a CSV/TSV/JSONL catalog file into the products collection (upsert by id)"""
+    try:
+        fmt = format or detect_format(file.filename)
+        if fmt not in IMPORT_FORMATS:
+            raise HTTPException(status_code=400, detail="Format must be 'csv', 'tsv' or 'jsonl'")
+        
+        import_service = CatalogImportService(db_service)
+        stats = await import_service.import_stream(file.file, fmt)
+        
+        # Matching workers hold a catalog snapshot
+        matching_service.invalidate_catalog()
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing products: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# Stream the catalog as NDJSON
+@app.get("/products/export")
+async def export_products():
+    """Export all products as NDJSON in the import format"""
+    # Sync generator - Starlette iterates it in a worker thread, one hop per chunk
+    chunks = chunk_lines(export_ndjson(db_service.iter_products(projection=EXPORT_PROJECTION)))
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=products.ndjson"}
+    )
+
 # Get specific product
 @app.get("/product/{product_id}", response_model=ProductResponse)
 async def get_product(product_id: str):
@@ -335,13 +897,18 @@ async def get_product(product_id: str):
 
 # Get session results
 @app.get("/results/{session_id}", response_model=SessionResponse)
-async def get_session_results(session_id: str):
-    """Get OCR session results"""
+async def get_session_results(session_id: str, background_tasks: BackgroundTasks,
+                              width: Optional[int] = None, dpr: Optional[float] = None):
+    """Get OCR session results, images sized as for the status endpoint"""
     try:
-        session = await db_service.get_session(session_id)
+        session = await load_session(session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-        return session
+        await track_client(session_id, session, background_tasks)
+        session = {**public_session(session), "matches": adapt_items(session.get("matches", []), target_width(width, dpr))}
+        # Trusted document from our own store, projected to its public fields -
+        # skip SessionResponse validation
+        return FastJSONResponse(session)
     except HTTPException:
         raise
     except Exception as e:
@@ -353,7 +920,8 @@ async def get_session_results(session_id: str):
 async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
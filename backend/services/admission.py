@@ -0,0 +1,186 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import logging
+
+from services.metrics import ADMISSION_IN_FLIGHT, ADMISSION_WAITING, ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Priority lane of the request being handled, inherited by its background jobs
+current_lane: ContextVar[Optional[str]] = ContextVar("admission_lane", default=None)
+
+
+class AdmissionRejected(Exception):
+    """A stage is saturated; the client should retry after retry_after seconds"""
+
+    def __init__(self, stage: str, reason: str, retry_after: int):
+        super().__init__(f"{stage} saturated ({reason})")
+        self.stage = stage
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int, lane: str, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.lane = lane
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class StageLimiter:
+    """Concurrency limit with a bounded, priority-ordered wait queue"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, timeout: float, max_retry_after: int = 60):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_time = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.future.done())
+
+    def saturated(self) -> bool:
+        return self.in_flight >= self.concurrency and self.waiting >= self.queue_size
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained"""
+        backlog = (self.waiting + 1) / self.concurrency
+        return int(min(self.max_retry_after, max(1, math.ceil(self._hold_time * backlog))))
+
+    def _reject(self, lane: str, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTIONS.inc(stage=self.name, lane=lane, reason=reason)
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    async def acquire(self, priority: int = 0, lane: str = "default", bounded: bool = True):
+        """Take a slot, waiting in priority order; bounded waits may be rejected"""
+        if self.in_flight < self.concurrency and not self.waiting:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.inc(stage=self.name)
+            return
+
+        if bounded and self.waiting >= self.queue_size:
+            # A full queue only admits requests that outrank its lowest-priority waiter
+            lowest = max((w for w in self._waiters if not w.future.done()), default=None)
+            if lowest is None or lowest.priority <= priority:
+                raise self._reject(lane, "queue_full")
+            lowest.future.set_exception(self._reject(lowest.lane, "preempted"))
+
+        waiter = _Waiter(priority, next(self._seq), lane, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        ADMISSION_WAITING.inc(stage=self.name, lane=lane)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout if bounded and self.timeout else None)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.exception():
+                # The slot was handed over just as we gave up
+                self.release()
+            else:
+                waiter.future.cancel()
+            raise self._reject(lane, "timeout")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self.release()
+            else:
+                waiter.future.cancel()
+            raise
+        finally:
+            ADMISSION_WAITING.dec(stage=self.name, lane=lane)
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, stage=self.name)
+
+    def release(self):
+        """Hand the slot to the highest-priority waiter, or free it"""
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec(stage=self.name)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, lane: str = "default", bounded: bool = True):
+        await self.acquire(priority, lane, bounded)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_time = 0.8 * self._hold_time + 0.2 * (time.perf_counter() - start)
+            self.release()
+
+
+class AdmissionController:
+    """Per-stage concurrency limits and priority lanes for the upload pipeline"""
+
+    STAGE_DEFAULTS = {
+        # stage: (concurrency, queue size, wait timeout in seconds; 0 waits indefinitely)
+        "upload": (16, 32, 10.0),
+        "ocr": (4, 32, 30.0),
+        "background": (8, 64, 0.0),
+        "image_search": (16, 0, 0.0),
+    }
+
+    def __init__(self):
+        self.enabled = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+        max_retry_after = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", 60))
+
+        self.stages: Dict[str, StageLimiter] = {}
+        for name, (concurrency, queue_size, timeout) in self.STAGE_DEFAULTS.items():
+            prefix = f"ADMISSION_{name.upper()}_"
+            self.stages[name] = StageLimiter(
+                name,
+                int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+                int(os.getenv(prefix + "QUEUE", queue_size)),
+                float(os.getenv(prefix + "TIMEOUT", timeout)),
+                max_retry_after
+            )
+
+        # Lanes from highest to lowest priority; requests without a known key use the last one
+        self.lanes = [lane.strip() for lane in os.getenv("ADMISSION_LANES", "priority,standard").split(",") if lane.strip()]
+        self.default_lane = self.lanes[-1]
+        self.tenant_lanes: Dict[str, str] = {}
+        for pair in os.getenv("ADMISSION_TENANT_KEYS", "").split(","):
+            key, _, lane = pair.strip().partition(":")
+            if key and lane in self.lanes:
+                self.tenant_lanes[key] = lane
+
+    def lane_for(self, tenant_key: Optional[str]) -> str:
+        return self.tenant_lanes.get(tenant_key or "", self.default_lane)
+
+    def _lane(self) -> str:
+        return current_lane.get() or self.default_lane
+
+    @asynccontextmanager
+    async def slot(self, stage: str, bounded: bool = True):
+        """Hold a slot of the stage for the current request's lane"""
+        if not self.enabled:
+            yield
+            return
+        lane = self._lane()
+        async with self.stages[stage].slot(self.lanes.index(lane), lane, bounded):
+            yield
+
+    def check(self, stage: str):
+        """Fail fast when a downstream stage has no room for more work"""
+        limiter = self.stages[stage]
+        if self.enabled and limiter.saturated():
+            raise limiter._reject(self._lane(), "backlog")
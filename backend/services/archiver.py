@@ -0,0 +1,137 @@
+import os
+import gzip
+import json
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+import logging
+
+from services.session_schema import compact_session, expand_session
+from services.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "archive/sessions"
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Unserializable value: {type(value).__name__}")
+
+
+def _decode_hook(value: Dict[str, Any]):
+    if len(value) == 1 and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def pack_sessions(sessions: List[Dict[str, Any]]) -> bytes:
+    """Serialize sessions as gzip-compressed JSON lines"""
+    lines = [
+        json.dumps(compact_session(session), default=_encode_default, ensure_ascii=False)
+        for session in sessions
+    ]
+    return gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def unpack_sessions(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Inverse of pack_sessions, keyed by session id"""
+    sessions = {}
+    for line in gzip.decompress(data).decode("utf-8").splitlines():
+        if line.strip():
+            session = json.loads(line, object_hook=_decode_hook)
+            sessions[session["_id"]] = session
+    return sessions
+
+
+class SessionArchiver:
+    """Moves old sessions from MongoDB into compressed MinIO batches and reads them back"""
+
+    def __init__(self, db_service, storage_service):
+        self.db_service = db_service
+        self.storage_service = storage_service
+        self.archive_after_days = int(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", 7))
+        self.batch_size = int(os.getenv("SESSION_ARCHIVE_BATCH_SIZE", 500))
+        self.interval = float(os.getenv("SESSION_ARCHIVE_INTERVAL", 3600))
+        self.cache_size = int(os.getenv("SESSION_ARCHIVE_CACHE_BATCHES", 4))
+
+        # Recently loaded archive batches, keyed by object name
+        self._batch_cache: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+
+        ttl_days = getattr(db_service, "session_ttl_days", 0)
+        if ttl_days and ttl_days <= self.archive_after_days:
+            logger.warning(
+                f"SESSION_TTL_DAYS ({ttl_days}) <= SESSION_ARCHIVE_AFTER_DAYS ({self.archive_after_days}): "
+                "sessions will expire before they are archived"
+            )
+
+    async def archive_once(self) -> int:
+        """Archive every session older than the cutoff, one batch per object"""
+        cutoff = datetime.utcnow() - timedelta(days=self.archive_after_days)
+        archived = 0
+
+        while True:
+            sessions = await self.db_service.get_sessions_before(cutoff, self.batch_size)
+            if not sessions:
+                break
+
+            oldest = sessions[0]["upload_time"]
+            object_name = f"{ARCHIVE_PREFIX}/{oldest:%Y/%m/%d}/{uuid.uuid4()}.jsonl.gz"
+            data = await asyncio.to_thread(pack_sessions, sessions)
+
+            # Upload before deleting so a crash can only leave duplicates behind
+            await asyncio.to_thread(
+                self.storage_service.put_bytes, object_name, data, "application/gzip"
+            )
+            await self.db_service.mark_sessions_archived([s["_id"] for s in sessions], object_name)
+
+            archived += len(sessions)
+            logger.info(f"Archived {len(sessions)} sessions ({len(data)} bytes) to {object_name}")
+
+            if len(sessions) < self.batch_size:
+                break
+
+        return archived
+
+    async def run_forever(self):
+        """Archive on a fixed interval until cancelled"""
+        logger.info(
+            f"Session archiver started: sessions older than {self.archive_after_days} days, "
+            f"every {self.interval:.0f}s"
+        )
+        while True:
+            try:
+                await self.archive_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Session archiving failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Read an archived session back from MinIO"""
+        object_name = await self.db_service.get_archived_session_location(session_id)
+        if not object_name:
+            return None
+
+        batch = self._batch_cache.get(object_name)
+        CACHE_REQUESTS.inc(cache="session_archive", result="miss" if batch is None else "hit")
+        if batch is None:
+            data = await asyncio.to_thread(self.storage_service.get_bytes, object_name)
+            batch = await asyncio.to_thread(unpack_sessions, data)
+            self._batch_cache[object_name] = batch
+            while len(self._batch_cache) > self.cache_size:
+                self._batch_cache.popitem(last=False)
+        else:
+            self._batch_cache.move_to_end(object_name)
+
+        session = batch.get(session_id)
+        if session is None:
+            logger.warning(f"Session {session_id} missing from archive {object_name}")
+            return None
+
+        logger.info(f"Loaded archived session {session_id} from {object_name}")
+        return expand_session({**session, "archived": True})
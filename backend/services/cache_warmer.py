@@ -0,0 +1,213 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+from services.menu_diff import item_key
+from services.image_cache import has_real_images
+from services.provider_usage import FOREGROUND, WARMER
+from services.metrics import WARMER_PREFETCHES
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hours(spec: str) -> Optional[Set[int]]:
+    """Hours of the day from "1-6" or "22-4,13" (end exclusive); None for any hour"""
+    if not spec.strip():
+        return None
+    hours = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition("-")
+        start = int(start) % 24
+        end = int(end) % 24 if end else (start + 1) % 24
+        hour = start
+        while True:
+            hours.add(hour)
+            hour = (hour + 1) % 24
+            if hour == end:
+                break
+    return hours
+
+
+def rank_items(counts: List[Dict[str, Any]], window_hours: float, recent_hours: float,
+               top_n: int, rising_n: int, min_count: int, min_growth: float) -> List[Tuple[str, str, str]]:
+    """
+    Items worth prefetching as (key, search query, reason): the fastest
+    rising first, then the most frequent. An item rises when its rate over
+    the recent hours is min_growth times its rate over the rest of the window.
+    """
+    items: Dict[str, Dict[str, Any]] = {}
+    for row in counts:
+        key = item_key(row["_id"])
+        if not key:
+            continue
+        item = items.setdefault(key, {"key": key, "query": row["_id"], "top": 0, "total": 0, "recent": 0})
+        item["total"] += row["total"]
+        item["recent"] += row["recent"]
+        if row["total"] > item["top"]:
+            # Search with the most common spelling
+            item["top"], item["query"] = row["total"], row["_id"]
+
+    baseline_hours = max(window_hours - recent_hours, 1.0)
+
+    def growth(item: Dict[str, Any]) -> float:
+        recent_rate = item["recent"] / recent_hours
+        baseline_rate = (item["total"] - item["recent"] + 1) / baseline_hours
+        return recent_rate / baseline_rate
+
+    rising = sorted(
+        (item for item in items.values() if item["recent"] >= min_count and growth(item) >= min_growth),
+        key=growth, reverse=True
+    )[:rising_n]
+    frequent = sorted(items.values(), key=lambda item: item["total"], reverse=True)[:top_n]
+
+    ranked, seen = [], set()
+    for reason, group in (("rising", rising), ("frequent", frequent)):
+        for item in group:
+            if item["key"] not in seen:
+                seen.add(item["key"])
+                ranked.append((item["key"], item["query"], reason))
+    return ranked
+
+
+class CacheWarmer:
+    """
+    Prefetches image search results for the dishes uploads are most likely
+    to contain, mined from recent sessions. Runs off-peak and spends at most
+    quota_share of the hourly provider quota, counted across replicas.
+    """
+
+    def __init__(self, db_service, image_search_service, cache, usage,
+                 is_busy: Optional[Callable[[], bool]] = None):
+        self.db_service = db_service
+        self.image_search_service = image_search_service
+        self.cache = cache
+        self.usage = usage
+        self.is_busy = is_busy or (lambda: False)
+
+        self.enabled = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+        self.interval = float(os.getenv("WARMER_INTERVAL", 900))
+        self.window_days = float(os.getenv("WARMER_WINDOW_DAYS", 7))
+        self.recent_hours = max(1.0, float(os.getenv("WARMER_RECENT_HOURS", 24)))
+        self.top_n = int(os.getenv("WARMER_TOP_ITEMS", 300))
+        self.rising_n = int(os.getenv("WARMER_RISING_ITEMS", 50))
+        self.min_count = int(os.getenv("WARMER_MIN_COUNT", 3))
+        self.min_growth = float(os.getenv("WARMER_MIN_GROWTH", 2.0))
+        self.images_per_item = int(os.getenv("WARMER_IMAGES_PER_ITEM", 3))
+        # Entries expiring within this are refreshed ahead of time
+        self.refresh_margin = timedelta(days=float(os.getenv("WARMER_REFRESH_DAYS", 1)))
+        # Server-local hours to run in, e.g. "1-6"; empty means whenever the app is idle
+        self.hours = parse_hours(os.getenv("WARMER_HOURS", ""))
+        # Provider requests per hour the image providers allow, and the warmer's share of them
+        self.hourly_quota = int(os.getenv("IMAGE_PROVIDER_HOURLY_QUOTA", 200))
+        self.quota_share = float(os.getenv("WARMER_QUOTA_SHARE", 0.2))
+
+        self.prefetched = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def budget(self) -> int:
+        """
+        Provider requests the warmer may still make: its share of the last
+        hour's quota less what every replica's warmer spent, and never more
+        than uploads left of the whole quota
+        """
+        used = await self.usage.last_hour()
+        warmer, foreground = used.get(WARMER, 0), used.get(FOREGROUND, 0)
+        share = int(self.hourly_quota * self.quota_share)
+        return max(0, min(share - warmer, self.hourly_quota - foreground - warmer))
+
+    def off_peak(self) -> bool:
+        if self.hours is not None and datetime.now().hour not in self.hours:
+            return False
+        return not self.is_busy()
+
+    async def candidates(self) -> List[Tuple[str, str, str]]:
+        """Ranked items from recent sessions, as (key, query, reason)"""
+        now = datetime.utcnow()
+        counts = await self.db_service.get_item_counts(
+            since=now - timedelta(days=self.window_days),
+            recent_since=now - timedelta(hours=self.recent_hours),
+            min_count=self.min_count
+        )
+        return rank_items(
+            counts, self.window_days * 24, self.recent_hours,
+            self.top_n, self.rising_n, self.min_count, self.min_growth
+        )
+
+    async def warm_once(self) -> Dict[str, Any]:
+        """Prefetch the top uncached items the budget allows"""
+        result = {"started_at": datetime.utcnow().isoformat(), "candidates": 0, "cached": 0, "empty": 0, "errors": 0}
+        if not self.off_peak():
+            result["skipped"] = "peak"
+            return result
+        budget = await self.budget()
+        if budget <= 0:
+            result["skipped"] = "quota"
+            return result
+
+        ranked = await self.candidates()
+        fresh = await self.cache.fresh_keys([key for key, _, _ in ranked], self.refresh_margin)
+        todo = [(key, query, reason) for key, query, reason in ranked if key not in fresh]
+        result["candidates"] = len(ranked)
+        result["already_cached"] = len(ranked) - len(todo)
+
+        for key, query, reason in todo:
+            if self.is_busy():
+                # Uploads take precedence; the rest waits for the next run
+                result["skipped"] = "peak"
+                break
+            if budget <= 0:
+                result["skipped"] = "quota"
+                break
+            try:
+                images = await self.image_search_service.fetch_product_images(
+                    query, self.images_per_item, caller=WARMER
+                )
+            except Exception as e:
+                WARMER_PREFETCHES.inc(outcome="error")
+                result["errors"] += 1
+                logger.warning(f"Cache warmer could not fetch images for '{query}': {e}")
+                continue
+            await self.cache.put(query, images, warmed=True)
+            outcome = "cached" if has_real_images(images) else "empty"
+            WARMER_PREFETCHES.inc(outcome=outcome)
+            result[outcome] += 1
+            logger.debug(f"Cache warmer prefetched '{query}' ({reason}): {outcome}")
+            # An item may take a request to each provider, and other replicas spend too
+            budget = await self.budget()
+
+        self.prefetched += result["cached"]
+        logger.info(
+            f"Cache warmer: {result['cached']} prefetched, {result['already_cached']} already cached "
+            f"of {result['candidates']} popular items"
+        )
+        return result
+
+    async def report(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "budget_remaining": await self.budget(),
+            "provider_requests_last_hour": await self.usage.last_hour(),
+            "hourly_budget": int(self.hourly_quota * self.quota_share),
+            "prefetched": self.prefetched,
+            "last_run": self.last_run,
+            "cache": self.cache.hit_rates()
+        }
+
+    async def run_forever(self):
+        """Warm the cache on a fixed interval until cancelled"""
+        if not self.enabled:
+            return
+        logger.info(
+            f"Cache warmer started: every {self.interval:.0f}s, "
+            f"{int(self.hourly_quota * self.quota_share)} provider requests/hour"
+        )
+        while True:
+            try:
+                self.last_run = await self.warm_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache warming failed: {e}")
+            await asyncio.sleep(self.interval)
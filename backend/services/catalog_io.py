@@ -0,0 +1,193 @@
+import asyncio
+import csv
+import io
+import json
+import time
+import uuid
+from typing import Iterator, Iterable, Dict, Any, List, Optional, IO
+import logging
+
+from services.search_index import build_search_fields, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic product ids, so re-importing a row without an
+# id updates the same document instead of creating a duplicate
+PRODUCT_ID_NAMESPACE = uuid.UUID("6f1c1d2e-6c3b-4d8e-9a51-5b0c2f7e4a10")
+
+# Separators accepted for list columns in CSV files
+LIST_SEPARATORS = ("|", ";")
+
+# Fields written by export and accepted by import
+EXPORT_PROJECTION = {"name": 1, "aliases": 1, "tags": 1, "image_url": 1}
+
+IMPORT_FORMATS = ("csv", "tsv", "jsonl")
+
+# Column delimiter of each delimited import format
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+
+def detect_format(filename: Optional[str], default: str = "csv") -> str:
+    """Infer import format (csv, tsv or jsonl) from a file name"""
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith((".jsonl", ".ndjson", ".json")):
+            return "jsonl"
+        if lowered.endswith(".tsv"):
+            return "tsv"
+        if lowered.endswith(".csv"):
+            return "csv"
+    return default
+
+
+def _split_list(value: Any) -> List[str]:
+    """Accept a list or a '|' / ';' separated string"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        items = value
+    else:
+        text = str(value)
+        separator = next((sep for sep in LIST_SEPARATORS if sep in text), None)
+        items = text.split(separator) if separator else [text]
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate an import row and build the product document, raising ValueError if invalid"""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+
+    name = str(row.get("name") or "").strip()
+    if len(name) < 2:
+        raise ValueError("missing or too short 'name'")
+
+    aliases = _split_list(row.get("aliases"))
+    tags = [tag.lower() for tag in _split_list(row.get("tags"))]
+    image_url = str(row.get("image_url") or "").strip() or None
+
+    product_id = str(row.get("id") or row.get("_id") or "").strip()
+    if not product_id:
+        product_id = str(uuid.uuid5(PRODUCT_ID_NAMESPACE, normalize_text(name)))
+
+    product = {
+        "_id": product_id,
+        "name": name,
+        "aliases": aliases,
+        "image_url": image_url,
+        "tags": tags
+    }
+    product.update(build_search_fields(name, aliases))
+    return product
+
+
+def iter_rows(stream: IO[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Stream raw rows from a CSV, TSV or JSONL text stream"""
+    if fmt in DELIMITERS:
+        for row in csv.DictReader(stream, delimiter=DELIMITERS[fmt]):
+            yield row
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # Surface as an invalid row rather than aborting the import
+                yield {"__error__": f"line {line_number}: invalid JSON ({e.msg})"}
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def open_text(binary_stream: IO[bytes]) -> IO[str]:
+    """Wrap a binary upload/file stream for line-by-line text reading"""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+
+def export_ndjson(products: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Render products as NDJSON lines in the import format"""
+    for product in products:
+        yield json.dumps({
+            "id": product["_id"],
+            "name": product.get("name", ""),
+            "aliases": product.get("aliases", []),
+            "tags": product.get("tags", []),
+            "image_url": product.get("image_url")
+        }, ensure_ascii=False) + "\n"
+
+
+def chunk_lines(lines: Iterable[str], chunk_size: int = 500) -> Iterator[str]:
+    """Join lines into chunks, so a streamed response is not one write per line"""
+    chunk: List[str] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+class CatalogImportService:
+    """Streaming bulk catalog import"""
+
+    def __init__(self, db_service, batch_size: int = 5000, max_reported_errors: int = 20):
+        self.db_service = db_service
+        self.batch_size = batch_size
+        self.max_reported_errors = max_reported_errors
+
+    async def import_rows(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Validate, normalize and upsert rows in unordered batches"""
+        start = time.perf_counter()
+        stats = {"processed": 0, "valid": 0, "invalid": 0, "upserted": 0, "modified": 0, "errors": []}
+
+        numbered = enumerate(rows, start=1)
+        while True:
+            # Reading and validating rows blocks, so it runs off the event loop
+            batch = await asyncio.to_thread(self._read_batch, numbered, stats)
+            if not batch:
+                break
+            await self._flush(batch, stats)
+
+        elapsed = time.perf_counter() - start
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["rows_per_second"] = round(stats["processed"] / elapsed, 1) if elapsed > 0 else 0.0
+
+        logger.info(
+            f"Catalog import: {stats['valid']} valid, {stats['invalid']} invalid rows "
+            f"in {stats['elapsed_seconds']}s ({stats['rows_per_second']} rows/s)"
+        )
+        return stats
+
+    def _read_batch(self, numbered_rows: Iterator, stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Normalize rows until a batch is full or the rows run out"""
+        batch: Dict[str, Dict[str, Any]] = {}
+        for row_number, row in numbered_rows:
+            stats["processed"] += 1
+            try:
+                if isinstance(row, dict) and "__error__" in row:
+                    raise ValueError(row["__error__"])
+                product = normalize_row(row)
+            except ValueError as e:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < self.max_reported_errors:
+                    stats["errors"].append(f"row {row_number}: {e}")
+                continue
+
+            stats["valid"] += 1
+            # Later rows win within a batch, matching upsert semantics
+            batch[product["_id"]] = product
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    async def import_stream(self, binary_stream: IO[bytes], fmt: str) -> Dict[str, Any]:
+        """Import a CSV, TSV or JSONL binary stream"""
+        return await self.import_rows(iter_rows(open_text(binary_stream), fmt))
+
+    async def _flush(self, batch: Dict[str, Dict[str, Any]], stats: Dict[str, Any]):
+        result = await self.db_service.bulk_upsert_products(list(batch.values()))
+        stats["upserted"] += result["upserted"]
+        stats["modified"] += result["modified"]
+        logger.info(f"Catalog import: flushed batch of {len(batch)} ({stats['processed']} rows read)")
@@ -1,13 +1,63 @@
 import os
+import asyncio
+import base64
+import json
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from typing import List, Optional, Dict, Iterator, Tuple
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure, OperationFailure
 import logging
 
+from services.search_index import build_search_fields, build_search_query, build_search_tiers, rank_product
+from services.session_schema import compact_session, expand_session
+from services.session_cache import SessionCache
+from services.write_behind import SessionWriteBuffer
+from services.metrics import MONGO_SECONDS, timed
+
 logger = logging.getLogger(__name__)
 
+# Product fields clients may request through projections
+PRODUCT_FIELDS = ("name", "aliases", "image_url", "tags")
+
+# Single-field indexes on the products collection
+PRODUCT_INDEXES = ("name", "name_norm", "aliases_norm", "search_tokens")
+
+
+def mongo_now() -> datetime:
+    """Current UTC time at MongoDB's millisecond precision, so stored and cached copies compare equal"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def encode_cursor(last_id: str) -> str:
+    """Encode an opaque continuation token for keyset pagination"""
+    payload = json.dumps({"after": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decode a continuation token, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = payload["after"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, str):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+def build_projection(fields: Optional[List[str]]) -> Dict[str, int]:
+    """Build a Mongo projection for the requested public product fields"""
+    requested = fields or list(PRODUCT_FIELDS)
+    unknown = [field for field in requested if field not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown product fields: {', '.join(unknown)}")
+    return {field: 1 for field in requested}
+
+
 class DatabaseService:
     """MongoDB database service"""
     
@@ -16,6 +66,15 @@ class DatabaseService:
         self.db = None
         self.products_collection = None
         self.sessions_collection = None
+        self.session_archive_collection = None
+        self.image_cache_collection = None
+        self.provider_usage_collection = None
+        # Hard expiry for sessions (0 disables the TTL index)
+        self.session_ttl_days = int(os.getenv("SESSION_TTL_DAYS", 30))
+        # Status polling reads active sessions from memory
+        self.session_cache = SessionCache()
+        # Session inserts and updates are coalesced and flushed in bulk
+        self.session_writes = SessionWriteBuffer(self)
         
     async def connect(self):
         """Connect to MongoDB"""
@@ -23,22 +82,43 @@ class DatabaseService:
             mongodb_url = os.getenv("MONGODB_URL", "mongodb://mongo:27017")
             database_name = os.getenv("MONGODB_DATABASE", "menu_matcher")
             
-            self.client = MongoClient(mongodb_url)
-            # Test connection
-            self.client.admin.command('ismaster')
+            # Retried connects replace the previous client
+            if self.client:
+                self.client.close()
+            
+            # MongoClient connects in the background; fail fast instead of the 30s default
+            self.client = MongoClient(
+                mongodb_url,
+                serverSelectionTimeoutMS=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+            )
             
             self.db = self.client[database_name]
             self.products_collection = self.db.products
             self.sessions_collection = self.db.ocr_sessions
+            self.session_archive_collection = self.db.ocr_session_archive
+            self.image_cache_collection = self.db.image_search_cache
+            self.provider_usage_collection = self.db.image_provider_usage
             
-            # Create indexes
-            self.products_collection.create_index("name")
-            self.sessions_collection.create_index("upload_time")
-            
+            # Test connection
+            await self.ping()
             logger.info(f"Connected to MongoDB: {mongodb_url}")
             
-            # Seed initial data if collections are empty
-            await self._seed_initial_data()
+            # Indexes and the seed check are independent round trips
+            await asyncio.gather(
+                *[
+                    asyncio.to_thread(self.products_collection.create_index, field)
+                    for field in PRODUCT_INDEXES
+                ],
+                asyncio.to_thread(self._ensure_session_ttl_index),
+                asyncio.to_thread(self.sessions_collection.create_index, [("menu_id", 1), ("upload_time", -1)]),
+                asyncio.to_thread(self._ensure_image_cache_index),
+                # Per-minute usage counters only matter for the last hour
+                asyncio.to_thread(self.provider_usage_collection.create_index, "minute", expireAfterSeconds=7200),
+                self._seed_initial_data()
+            )
+            
+            # Backfill search fields for products stored before they existed
+            await asyncio.to_thread(self._backfill_search_fields)
             
         except ConnectionFailure as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
@@ -47,15 +127,49 @@ class DatabaseService:
             logger.error(f"Database initialization error: {e}")
             raise
     
+    def _ensure_session_ttl_index(self):
+        """Create the upload_time index, converting it to/from a TTL index as configured"""
+        ttl_seconds = self.session_ttl_days * 86400
+        options = {"expireAfterSeconds": ttl_seconds} if ttl_seconds > 0 else {}
+        try:
+            self.sessions_collection.create_index("upload_time", **options)
+        except OperationFailure:
+            # Index exists with other options - change the TTL in place
+            if ttl_seconds <= 0:
+                logger.warning("Session TTL disabled but upload_time TTL index exists - leaving it as is")
+                return
+            self.db.command(
+                "collMod", self.sessions_collection.name,
+                index={"keyPattern": {"upload_time": 1}, "expireAfterSeconds": ttl_seconds}
+            )
+        if ttl_seconds > 0:
+            logger.info(f"Sessions expire after {self.session_ttl_days} days")
+    
+    def _ensure_image_cache_index(self):
+        """Expire cached image search results (IMAGE_CACHE_TTL_DAYS)"""
+        ttl_seconds = int(float(os.getenv("IMAGE_CACHE_TTL_DAYS", 30)) * 86400)
+        try:
+            self.image_cache_collection.create_index("fetched_at", expireAfterSeconds=ttl_seconds)
+        except OperationFailure:
+            self.db.command(
+                "collMod", self.image_cache_collection.name,
+                index={"keyPattern": {"fetched_at": 1}, "expireAfterSeconds": ttl_seconds}
+            )
+    
+    async def ping(self):
+        """Round trip to the server; raises if it is unreachable"""
+        await asyncio.to_thread(self.client.admin.command, "ping")
+    
     async def disconnect(self):
-        """Disconnect from MongoDB"""
+        """Flush pending session writes and disconnect from MongoDB"""
+        await self.session_writes.close()
         if self.client:
             self.client.close()
             logger.info("Disconnected from MongoDB")
     
     async def _seed_initial_data(self):
         """Seed initial product catalog data"""
-        if self.products_collection.count_documents({}) == 0:
+        if await asyncio.to_thread(self.products_collection.count_documents, {}, limit=1) == 0:
             initial_products = [
                 {
                     "_id": str(uuid.uuid4()),
@@ -115,9 +229,37 @@ class DatabaseService:
                 }
             ]
             
-            self.products_collection.insert_many(initial_products)
+            for product in initial_products:
+                product.update(build_search_fields(product["name"], product["aliases"]))
+            
+            await asyncio.to_thread(self.products_collection.insert_many, initial_products)
             logger.info(f"Seeded {len(initial_products)} initial products")
     
+    def _backfill_search_fields(self, batch_size: int = 1000):
+        """Compute normalized search fields for products missing them"""
+        cursor = self.products_collection.find(
+            {"name_norm": {"$exists": False}},
+            {"name": 1, "aliases": 1}
+        )
+        
+        updated = 0
+        operations = []
+        for product in cursor:
+            fields = build_search_fields(product.get("name", ""), product.get("aliases", []))
+            operations.append(UpdateOne({"_id": product["_id"]}, {"$set": fields}))
+            if len(operations) >= batch_size:
+                self.products_collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        
+        if operations:
+            self.products_collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        
+        if updated:
+            logger.info(f"Backfilled search fields for {updated} products")
+    
+    @timed(MONGO_SECONDS, operation="get_products")
     async def get_products(self, limit: int = 50, offset: int = 0) -> List[Dict]:
         """Get products from catalog"""
         try:
@@ -127,6 +269,64 @@ class DatabaseService:
             logger.error(f"Error fetching products: {e}")
             raise
     
+    @timed(MONGO_SECONDS, operation="get_products_page")
+    async def get_products_page(self, limit: int = 50, cursor: Optional[str] = None,
+                                fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of products ordered by _id using keyset pagination.
+        
+        Seeks past the cursor on the _id index instead of skipping documents,
+        so every page costs the same. Returns (products, next_cursor).
+        """
+        try:
+            query = {"_id": {"$gt": decode_cursor(cursor)}} if cursor else {}
+            projection = build_projection(fields)
+            
+            # Fetch one extra document to know whether another page exists
+            def find():
+                return list(self.products_collection.find(query, projection).sort("_id", 1).limit(limit + 1))
+            products = await asyncio.to_thread(find)
+            next_cursor = None
+            if len(products) > limit:
+                products = products[:limit]
+                next_cursor = encode_cursor(products[-1]["_id"])
+            return products, next_cursor
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching products page: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="bulk_upsert_products")
+    async def bulk_upsert_products(self, products: List[Dict]) -> Dict[str, int]:
+        """Upsert a batch of products by _id in one unordered bulk write"""
+        try:
+            operations = [
+                UpdateOne({"_id": product["_id"]}, {"$set": product}, upsert=True)
+                for product in products
+            ]
+            if not operations:
+                return {"upserted": 0, "modified": 0}
+
+            # Run off the event loop - large batches take a while
+            result = await asyncio.to_thread(
+                self.products_collection.bulk_write, operations, ordered=False
+            )
+            return {"upserted": result.upserted_count, "modified": result.modified_count}
+        except Exception as e:
+            logger.error(f"Error bulk upserting {len(products)} products: {e}")
+            raise
+
+    def iter_products(self, projection: Optional[Dict] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream all products in _id order (blocking iterator, run in a thread)"""
+        cursor = self.products_collection.find({}, projection).sort("_id", 1).batch_size(batch_size)
+        try:
+            for product in cursor:
+                yield product
+        finally:
+            cursor.close()
+
+    @timed(MONGO_SECONDS, operation="get_product")
     async def get_product(self, product_id: str) -> Optional[Dict]:
         """Get specific product by ID"""
         try:
@@ -135,32 +335,65 @@ class DatabaseService:
             logger.error(f"Error fetching product {product_id}: {e}")
             raise
     
+    @timed(MONGO_SECONDS, operation="find_products_by_name")
     async def find_products_by_name(self, name: str) -> List[Dict]:
         """Find products by name or aliases"""
         try:
-            # Search in name and aliases
-            query = {
-                "$or": [
-                    {"name": {"$regex": name, "$options": "i"}},
-                    {"aliases": {"$regex": name, "$options": "i"}}
-                ]
-            }
+            # Search the indexed normalized fields instead of an unanchored regex
+            query = build_search_query(name)
+            if not query:
+                return []
             return list(self.products_collection.find(query))
         except Exception as e:
             logger.error(f"Error searching products by name '{name}': {e}")
             raise
     
+    @timed(MONGO_SECONDS, operation="search_products")
+    async def search_products(self, query: str, limit: int = 20, prefix: bool = True,
+                              candidate_limit: int = 200) -> List[Dict]:
+        """Ranked product search over the normalized name, alias and token indexes"""
+        try:
+            # Bound the candidate set so latency does not grow with the catalog,
+            # filling it from the strongest matches down so the cap only drops
+            # weak ones; weaker tiers are skipped once there are enough results
+            budget = max(limit, candidate_limit)
+            ranked, seen = [], set()
+            for tier in build_search_tiers(query, prefix=prefix):
+                if len(ranked) >= limit or len(seen) >= budget:
+                    break
+                if seen:
+                    tier = {"$and": [tier, {"_id": {"$nin": list(seen)}}]}
+                # The cursor only queries once iterated, so list it off the event loop
+                cursor = self.products_collection.find(tier).limit(budget - len(seen))
+                for product in await asyncio.to_thread(list, cursor):
+                    seen.add(product["_id"])
+                    score = rank_product(product, query)
+                    if score > 0:
+                        product["score"] = score
+                        ranked.append(product)
+            
+            ranked.sort(key=lambda p: (-p["score"], p.get("name", "")))
+            return ranked[:limit]
+        except Exception as e:
+            logger.error(f"Error searching products for '{query}': {e}")
+            raise
+    
     async def store_session(self, session_data: Dict) -> str:
         """Store OCR session results"""
         try:
             session_id = str(uuid.uuid4())
+            now = mongo_now()
             session_doc = {
                 "_id": session_id,
-                "upload_time": datetime.utcnow(),
-                **session_data
+                "upload_time": now,
+                **compact_session(session_data),
+                # Bumped by every write, so cached copies can be revalidated cheaply
+                "updated_at": now
             }
             
-            self.sessions_collection.insert_one(session_doc)
+            # Inserted directly: the session id is handed to the client, so it must be durable
+            await self._insert_session(session_doc)
+            self.session_cache.put(session_id, session_doc)
             logger.info(f"Stored session: {session_id}")
             return session_id
             
@@ -168,27 +401,239 @@ class DatabaseService:
             logger.error(f"Error storing session: {e}")
             raise
     
+    @timed(MONGO_SECONDS, operation="store_session")
+    async def _insert_session(self, session_doc: Dict):
+        self.sessions_collection.insert_one(session_doc)
+    
     async def get_session(self, session_id: str) -> Optional[Dict]:
-        """Get OCR session by ID"""
+        """Get OCR session by ID, from the session cache when possible"""
+        session = self.session_cache.get(session_id)
+        if session is None and self.session_cache.stale(session_id) is not None:
+            # Another replica may have written it since; one indexed field says whether it did
+            session = self.session_cache.revalidate(session_id, await self._get_session_updated_at(session_id))
+        if session is None:
+            session = self.session_writes.overlay(session_id, await self._find_session(session_id))
+            if session is not None:
+                self.session_cache.put(session_id, session)
+        return expand_session(dict(session)) if session is not None else None
+    
+    @timed(MONGO_SECONDS, operation="get_session")
+    async def _find_session(self, session_id: str) -> Optional[Dict]:
         try:
-            return self.sessions_collection.find_one({"_id": session_id})
+            return await asyncio.to_thread(self.sessions_collection.find_one, {"_id": session_id})
         except Exception as e:
             logger.error(f"Error fetching session {session_id}: {e}")
             raise
     
+    @timed(MONGO_SECONDS, operation="get_session_updated_at")
+    async def _get_session_updated_at(self, session_id: str) -> Optional[datetime]:
+        try:
+            session = self.sessions_collection.find_one({"_id": session_id}, {"updated_at": 1})
+            return session.get("updated_at") if session else None
+        except Exception as e:
+            logger.error(f"Error checking session {session_id}: {e}")
+            raise
+    
+    async def get_latest_menu_session(self, menu_id: str) -> Optional[Dict]:
+        """Most recent session uploaded for a menu, with this process's unflushed writes"""
+        session_id = await self._find_latest_menu_session_id(menu_id)
+        return await self.get_session(session_id) if session_id else None
+    
+    @timed(MONGO_SECONDS, operation="get_latest_menu_session")
+    async def _find_latest_menu_session_id(self, menu_id: str) -> Optional[str]:
+        try:
+            # Sessions are inserted directly, so the newest is always in MongoDB
+            session = await asyncio.to_thread(
+                self.sessions_collection.find_one, {"menu_id": menu_id}, {"_id": 1}, sort=[("upload_time", -1)]
+            )
+            return session["_id"] if session else None
+        except Exception as e:
+            logger.error(f"Error fetching latest session of menu {menu_id}: {e}")
+            raise
+    
     async def update_session(self, session_id: str, update_data: Dict) -> bool:
-        """Update OCR session data"""
+        """Update OCR session data; False if the session does not exist"""
+        update_data = {**update_data, "updated_at": mongo_now()}
+        if self.session_writes.enabled:
+            # Batched with other sessions' updates; returns once its batch has landed
+            written = self.session_writes.update(session_id, update_data)
+            self.session_cache.update(session_id, update_data)
+            try:
+                return await asyncio.wait_for(asyncio.shield(written), timeout=self.session_writes.wait_timeout)
+            except asyncio.TimeoutError:
+                # Still queued and may land later; nobody is waiting for it any more
+                written.cancel()
+                self.session_cache.invalidate(session_id)
+                logger.error(f"Timed out waiting for update of session {session_id} to be written")
+                raise
+            except Exception as e:
+                self.session_cache.invalidate(session_id)
+                logger.error(f"Error updating session {session_id}: {e}")
+                raise
+        return await self._update_session(session_id, update_data)
+    
+    @timed(MONGO_SECONDS, operation="update_session")
+    async def _update_session(self, session_id: str, update_data: Dict) -> bool:
         try:
             result = self.sessions_collection.update_one(
                 {"_id": session_id}, 
                 {"$set": update_data}
             )
-            if result.modified_count > 0:
+            self.session_cache.update(session_id, update_data)
+            if result.matched_count > 0:
                 logger.info(f"Updated session: {session_id}")
                 return True
             else:
                 logger.warning(f"No session found to update: {session_id}")
                 return False
         except Exception as e:
+            self.session_cache.invalidate(session_id)
             logger.error(f"Error updating session {session_id}: {e}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def record_session_progress(self, session_id: str, update_data: Dict):
+        """
+        Publish progress of a session this process is working on. Readers see
+        it at once; it is persisted with the next write-behind flush (and not
+        at all when write-behind is disabled).
+        """
+        if self.session_writes.enabled:
+            update_data = {**update_data, "updated_at": mongo_now()}
+            self.session_writes.update(session_id, update_data, wait=False)
+        # Otherwise only in memory: the stored updated_at is unchanged, so revalidation keeps it
+        self.session_cache.update(session_id, update_data)
+    
+    @timed(MONGO_SECONDS, operation="get_session_hashes")
+    async def get_session_hashes(self, limit: int) -> List[Tuple[str, str, str]]:
+        """(session id, image hash, menu id) of the most recent hashed sessions of named menus, oldest first"""
+        try:
+            cursor = self.sessions_collection.find(
+                {"image_hash": {"$exists": True, "$ne": None}, "menu_id": {"$ne": None}},
+                {"image_hash": 1, "menu_id": 1}
+            ).sort("upload_time", -1).limit(limit)
+            return [(doc["_id"], doc["image_hash"], doc["menu_id"]) for doc in cursor][::-1]
+        except Exception as e:
+            logger.error(f"Error fetching session hashes: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="get_sessions_before")
+    async def get_sessions_before(self, cutoff: datetime, limit: int) -> List[Dict]:
+        """Get the oldest sessions uploaded before cutoff, as stored (compact)"""
+        try:
+            cursor = self.sessions_collection.find(
+                {"upload_time": {"$lt": cutoff}}
+            ).sort("upload_time", 1).limit(limit)
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"Error fetching sessions before {cutoff}: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="mark_sessions_archived")
+    async def mark_sessions_archived(self, session_ids: List[str], object_name: str):
+        """Record archive locations, then drop the sessions from the hot collection"""
+        try:
+            archived_at = datetime.utcnow()
+            self.session_archive_collection.bulk_write([
+                UpdateOne(
+                    {"_id": session_id},
+                    {"$set": {"object_name": object_name, "archived_at": archived_at}},
+                    upsert=True
+                )
+                for session_id in session_ids
+            ], ordered=False)
+            result = self.sessions_collection.delete_many({"_id": {"$in": session_ids}})
+            for session_id in session_ids:
+                self.session_cache.invalidate(session_id)
+            logger.info(f"Archived {result.deleted_count} sessions to {object_name}")
+        except Exception as e:
+            logger.error(f"Error marking sessions archived in {object_name}: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="get_archived_session_location")
+    async def get_archived_session_location(self, session_id: str) -> Optional[str]:
+        """Get the archive object holding a session, if it was archived"""
+        try:
+            entry = self.session_archive_collection.find_one({"_id": session_id})
+            return entry["object_name"] if entry else None
+        except Exception as e:
+            logger.error(f"Error looking up archived session {session_id}: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="get_item_counts")
+    async def get_item_counts(self, since: datetime, recent_since: datetime, min_count: int) -> List[Dict]:
+        """
+        How often each item search term appeared on menus uploaded since
+        `since`, in total and since `recent_since` (lowercased nameEnglish,
+        else name)
+        """
+        pipeline = [
+            {"$match": {"upload_time": {"$gte": since}}},
+            {"$project": {"upload_time": 1, "matches.name": 1, "matches.nameEnglish": 1}},
+            {"$unwind": "$matches"},
+            {"$project": {
+                "upload_time": 1,
+                "term": {"$toLower": {"$cond": [
+                    {"$gt": [{"$ifNull": ["$matches.nameEnglish", ""]}, ""]},
+                    "$matches.nameEnglish",
+                    {"$ifNull": ["$matches.name", ""]}
+                ]}}
+            }},
+            {"$group": {
+                "_id": "$term",
+                "total": {"$sum": 1},
+                "recent": {"$sum": {"$cond": [{"$gte": ["$upload_time", recent_since]}, 1, 0]}}
+            }},
+            {"$match": {"_id": {"$ne": ""}, "total": {"$gte": min_count}}}
+        ]
+        try:
+            return await asyncio.to_thread(
+                lambda: list(self.sessions_collection.aggregate(pipeline, allowDiskUse=True))
+            )
+        except Exception as e:
+            logger.error(f"Error counting menu items: {e}")
+            raise
+    
+    @timed(MONGO_SECONDS, operation="get_cached_images")
+    async def get_cached_images(self, key: str) -> Optional[Dict]:
+        """Cached image search result for a normalized search term"""
+        return await asyncio.to_thread(self.image_cache_collection.find_one, {"_id": key})
+    
+    @timed(MONGO_SECONDS, operation="store_cached_images")
+    async def store_cached_images(self, key: str, query: str, images: List[Dict], fetched_at: datetime, warmed: bool):
+        await asyncio.to_thread(
+            self.image_cache_collection.replace_one,
+            {"_id": key},
+            {"query": query, "images": images, "fetched_at": fetched_at, "warmed": warmed},
+            upsert=True
+        )
+    
+    @timed(MONGO_SECONDS, operation="record_provider_requests")
+    async def record_provider_requests(self, minute: datetime, caller: str, count: int):
+        """Add to the image provider requests made by `caller` in a minute"""
+        await asyncio.to_thread(
+            self.provider_usage_collection.update_one,
+            {"_id": minute},
+            {"$inc": {caller: count}, "$setOnInsert": {"minute": minute}},
+            upsert=True
+        )
+    
+    @timed(MONGO_SECONDS, operation="get_provider_usage")
+    async def get_provider_usage(self, since: datetime) -> Dict[str, int]:
+        """Image provider requests by caller since `since`, across replicas"""
+        def total():
+            usage: Dict[str, int] = {}
+            for doc in self.provider_usage_collection.find({"minute": {"$gte": since}}, {"_id": 0, "minute": 0}):
+                for caller, count in doc.items():
+                    usage[caller] = usage.get(caller, 0) + count
+            return usage
+        return await asyncio.to_thread(total)
+    
+    @timed(MONGO_SECONDS, operation="get_cached_image_keys")
+    async def get_cached_image_keys(self, keys: List[str], fetched_after: datetime) -> List[str]:
+        """Which of the search terms have a cached result fetched after `fetched_after`"""
+        def find():
+            cursor = self.image_cache_collection.find(
+                {"_id": {"$in": keys}, "fetched_at": {"$gt": fetched_after}}, {"_id": 1}
+            )
+            return [doc["_id"] for doc in cursor]
+        return await asyncio.to_thread(find)
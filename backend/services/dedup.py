@@ -0,0 +1,205 @@
+import io
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from PIL import Image, ImageOps
+
+from services.metrics import CACHE_REQUESTS
+from services.process_pools import process_pool
+
+logger = logging.getLogger(__name__)
+
+# 8x8 gradient bits: a 64-bit hash
+HASH_SIZE = 8
+
+
+def perceptual_hash(image_content: bytes, hash_size: int = HASH_SIZE) -> Optional[int]:
+    """
+    Difference hash of an image: whether each pixel of a tiny grayscale
+    thumbnail is brighter than its right neighbour. Re-encoding, scaling,
+    lighting and small crops or tilts flip only a few bits.
+    """
+    try:
+        with Image.open(io.BytesIO(image_content)) as image:
+            # Let the JPEG decoder skip most of the work at reduced scale
+            image.draft("L", (hash_size * 32, hash_size * 32))
+            gray = ImageOps.exif_transpose(image).convert("L")
+    except Exception as e:
+        logger.warning(f"Could not hash image: {e}")
+        return None
+
+    # Stretch contrast first so exposure differences do not move the gradients
+    gray = ImageOps.autocontrast(gray).resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(gray.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HammingIndex:
+    """
+    Multi-index hash table for Hamming-radius queries over fixed-width hashes.
+
+    Hashes are split into max_distance + 1 blocks. Two hashes within
+    max_distance bits agree exactly on at least one block (pigeonhole), so
+    a query only verifies the entries sharing one of its blocks. On 64-bit
+    hashes this prunes far better than a BK-tree, whose distances bunch up
+    around 32.
+    """
+
+    def __init__(self, max_distance: int, bits: int = HASH_SIZE * HASH_SIZE):
+        self.max_distance = max_distance
+        blocks = min(bits, max_distance + 1)
+        # (shift, mask) of each block, widths differing by at most one bit
+        self._blocks: List[Tuple[int, int]] = []
+        start = 0
+        for block in range(blocks):
+            width = bits // blocks + (1 if block < bits % blocks else 0)
+            self._blocks.append((start, (1 << width) - 1))
+            start += width
+        self._tables: List[Dict[int, List[Tuple[int, int, Any]]]] = [{} for _ in self._blocks]
+        self.size = 0
+
+    def add(self, key: int, value: Any):
+        self.size += 1
+        entry = (key, self.size, value)
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            table.setdefault((key >> shift) & mask, []).append(entry)
+
+    def search(self, key: int) -> List[Tuple[int, Any]]:
+        """(distance, value) pairs within max_distance, nearest and most recently added first"""
+        matches = {}
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            for candidate, seq, value in table.get((key >> shift) & mask, ()):
+                if seq not in matches:
+                    distance = hamming(key, candidate)
+                    if distance <= self.max_distance:
+                        matches[seq] = (distance, value)
+        ranked = sorted(matches.items(), key=lambda item: (item[1][0], -item[0]))
+        return [match for _, match in ranked]
+
+
+def format_hash(value: int) -> str:
+    return f"{value:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+class MenuDeduplicator:
+    """
+    Perceptual-hash index of processed menus, for reusing the session of a
+    re-photographed menu. Only uploads with a menu_id are indexed, and an
+    upload only matches sessions of its own menu_id: session ids are the
+    only access control on results, so anonymous uploads never share them.
+    """
+
+    def __init__(self, db_service, max_workers: Optional[int] = None):
+        self.db_service = db_service
+        # Off by default: unrelated menus printed from one template can hash alike
+        self.enabled = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+        # Differing bits (of 64) still treated as the same menu
+        self.max_distance = int(os.getenv("DEDUP_MAX_DISTANCE", 4))
+        self.max_candidates = int(os.getenv("DEDUP_MAX_CANDIDATES", 3))
+        self.index_limit = int(os.getenv("DEDUP_INDEX_LIMIT", 50000))
+        # Re-run OCR in the background and redo the session if the menus differ
+        self.confirm = os.getenv("DEDUP_CONFIRM", "false").lower() == "true"
+        self.confirm_min_similarity = float(os.getenv("DEDUP_CONFIRM_MIN_SIMILARITY", 0.8))
+
+        # 0 hashes in a thread off the event loop, >0 uses a process pool
+        if max_workers is None:
+            max_workers = int(os.getenv("DEDUP_WORKERS", 1))
+        self.max_workers = max(0, max_workers)
+
+        self.index = HammingIndex(self.max_distance)
+        self._loading = False
+        self._added_while_loading: List[Tuple[str, str, str]] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def load(self):
+        """Build the index from the hashes stored on recent sessions"""
+        if not self.enabled:
+            return
+        self._loading = True
+        try:
+            entries = await self.db_service.get_session_hashes(self.index_limit)
+            index = HammingIndex(self.max_distance)
+            # Sessions stored while the query ran may or may not be in its result
+            seen = set()
+            for session_id, image_hash, menu_id in entries + self._added_while_loading:
+                if session_id not in seen:
+                    seen.add(session_id)
+                    index.add(int(image_hash, 16), (session_id, menu_id))
+            self.index = index
+        finally:
+            self._loading = False
+            self._added_while_loading = []
+        logger.info(f"Loaded menu dedup index with {index.size} sessions")
+
+    async def hash_image(self, image_content: bytes, menu_id: Optional[str]) -> Optional[str]:
+        """Hex perceptual hash of a menu's upload, or None if it cannot be decoded or has no menu_id"""
+        if not self.enabled or not menu_id:
+            return None
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool() if self.max_workers > 0 else None
+        value = await loop.run_in_executor(pool, perceptual_hash, image_content)
+        return format_hash(value) if value is not None else None
+
+    def add(self, image_hash: Optional[str], session_id: str, menu_id: Optional[str]):
+        if not self.enabled or image_hash is None or not menu_id:
+            return
+        self.index.add(int(image_hash, 16), (session_id, menu_id))
+        if self._loading:
+            self._added_while_loading.append((session_id, image_hash, menu_id))
+
+    async def find_session(self, image_hash: Optional[str], menu_id: Optional[str],
+                           load_session: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+                           ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Nearest earlier session of the same menu_id with usable results, as (distance, session)"""
+        if not self.enabled or image_hash is None or not menu_id:
+            return None
+
+        candidates = [
+            (distance, session_id) for distance, (session_id, candidate_menu) in self.index.search(int(image_hash, 16))
+            if candidate_menu == menu_id
+        ]
+        for distance, session_id in candidates[:self.max_candidates]:
+            # Expired sessions stay in the index until the next restart
+            session = await load_session(session_id)
+            if (session and session.get("matches") and not session.get("ocr_error")
+                    and session.get("menu_id") == menu_id):
+                CACHE_REQUESTS.inc(cache="menu_dedup", result="hit")
+                logger.info(f"Upload matches session {session_id} (distance {distance})")
+                return distance, session
+
+        CACHE_REQUESTS.inc(cache="menu_dedup", result="miss")
+        return None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool(self.max_workers)
+            logger.info(f"Started image hashing process pool with {self.max_workers} workers")
+        return self._pool
+
+    def shutdown(self):
+        """Stop the hashing process pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def name_overlap(names: List[str], other: List[str]) -> float:
+    """Share of distinct item names two menus have in common (Jaccard)"""
+    a = {name.strip().casefold() for name in names if name.strip()}
+    b = {name.strip().casefold() for name in other if name.strip()}
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,106 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+import logging
+
+from services.menu_diff import item_key
+from services.metrics import CACHE_REQUESTS, IMAGE_CACHE_WARM_HITS
+
+logger = logging.getLogger(__name__)
+
+
+def has_real_images(images: List[Dict[str, Any]]) -> bool:
+    return any(image.get("source") != "placeholder" for image in images)
+
+
+class ImageResultCache:
+    """
+    Image search results by normalized search term, shared by all replicas
+    through MongoDB with a small in-process LRU in front.
+
+    Entries fetched by the cache warmer are flagged, so hits on them are
+    counted as warm hits.
+    """
+
+    def __init__(self, db_service, max_size: Optional[int] = None):
+        self.db_service = db_service
+        self.enabled = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = timedelta(days=float(os.getenv("IMAGE_CACHE_TTL_DAYS", 30)))
+        self.max_size = max_size if max_size is not None else int(os.getenv("IMAGE_CACHE_MEMORY_SIZE", 2000))
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        # Since startup, for the warmer report
+        self.hits = 0
+        self.warm_hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry: Optional[Dict[str, Any]], margin: timedelta = timedelta(0)) -> bool:
+        return entry is not None and entry["fetched_at"] + self.ttl - margin > datetime.utcnow()
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, query: str, count: int) -> Optional[List[Dict[str, Any]]]:
+        """Cached images for a search term, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = item_key(query)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        else:
+            try:
+                entry = await self.db_service.get_cached_images(key)
+            except Exception as e:
+                logger.warning(f"Image cache lookup failed for '{query}': {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+
+        if not self._fresh(entry) or len(entry["images"]) < count:
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache="image_search", result="miss")
+            return None
+
+        self.hits += 1
+        CACHE_REQUESTS.inc(cache="image_search", result="hit")
+        if entry.get("warmed"):
+            self.warm_hits += 1
+            IMAGE_CACHE_WARM_HITS.inc()
+        # Sessions own their copies
+        return [dict(image) for image in entry["images"][:count]]
+
+    async def put(self, query: str, images: List[Dict[str, Any]], warmed: bool = False):
+        """Cache a search result; results of only placeholders are not kept"""
+        if not self.enabled or not has_real_images(images):
+            return
+        key = item_key(query)
+        entry = {"images": [dict(image) for image in images], "fetched_at": datetime.utcnow(), "warmed": warmed}
+        self._remember(key, entry)
+        try:
+            await self.db_service.store_cached_images(key, query, entry["images"], entry["fetched_at"], warmed)
+        except Exception as e:
+            logger.warning(f"Could not store cached images for '{query}': {e}")
+
+    async def fresh_keys(self, keys: Iterable[str], margin: timedelta = timedelta(0)) -> Set[str]:
+        """Keys with an entry that stays fresh for at least `margin`"""
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return set()
+        return set(await self.db_service.get_cached_image_keys(keys, datetime.utcnow() - self.ttl + margin))
+
+    def hit_rates(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "warm_hits": self.warm_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "warm_hit_rate": round(self.warm_hits / lookups, 4) if lookups else None
+        }
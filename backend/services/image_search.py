@@ -3,18 +3,44 @@ import httpx
 import logging
 from typing import Optional, List, Dict
 
+from services.metrics import IMAGE_SEARCH_SECONDS, IMAGE_SEARCH_REQUESTS
+from services.image_variants import pexels_variants, unsplash_variants
+from services.provider_usage import FOREGROUND
+
 logger = logging.getLogger(__name__)
 
 class ImageSearchService:
     """Image search service for Pexels and Unsplash"""
     
-    def __init__(self):
+    def __init__(self, cache=None, usage=None):
+        self.cache = cache
+        # ProviderUsage counting requests against the shared hourly quota
+        self.usage = usage
         self.pexels_api_key = os.getenv("PEXELS_API_KEY")
         self.unsplash_access_key = os.getenv("UNSPLASH_ACCESS_KEY")
         self.timeout = 10.0
+        # Overridable so load tests can point at local stub servers
+        self.pexels_api_url = os.getenv("PEXELS_API_URL", "https://api.pexels.com/v1").rstrip("/")
+        self.unsplash_api_url = os.getenv("UNSPLASH_API_URL", "https://api.unsplash.com").rstrip("/")
     
     async def search_product_images(self, product_name: str, count: int = 3) -> List[Dict]:
-        """Search for multiple product images, trying Pexels first, then Unsplash"""
+        """Search for multiple product images, served from the result cache when possible"""
+        if self.cache is not None:
+            cached = await self.cache.get(product_name, count)
+            if cached is not None:
+                logger.info(f"✅ Using {len(cached)} cached images for '{product_name}'")
+                return cached
+        
+        images = await self.fetch_product_images(product_name, count)
+        if self.cache is not None:
+            await self.cache.put(product_name, images)
+        return images
+    
+    async def fetch_product_images(self, product_name: str, count: int = 3, caller: str = FOREGROUND) -> List[Dict]:
+        """
+        Search the providers for multiple product images, trying Pexels first,
+        then Unsplash. Every provider request is counted for `caller`.
+        """
         try:
             logger.info(f"Starting image search for product: '{product_name}' (requesting {count} images)")
             
@@ -23,7 +49,9 @@ class ImageSearchService:
             # Try Pexels first
             if self.pexels_api_key:
                 logger.info(f"Searching Pexels for: '{product_name}'")
-                pexels_images = await self._search_pexels_multiple(product_name, count)
+                with IMAGE_SEARCH_SECONDS.time(provider="pexels"):
+                    pexels_images = await self._search_pexels_multiple(product_name, count)
+                await self._record_request(caller)
                 images.extend(pexels_images)
                 logger.info(f"✅ Pexels found {len(pexels_images)} images for '{product_name}'")
             else:
@@ -33,7 +61,9 @@ class ImageSearchService:
             if len(images) < count and self.unsplash_access_key:
                 remaining_count = count - len(images)
                 logger.info(f"Searching Unsplash for: '{product_name}' (need {remaining_count} more images)")
-                unsplash_images = await self._search_unsplash_multiple(product_name, remaining_count)
+                with IMAGE_SEARCH_SECONDS.time(provider="unsplash"):
+                    unsplash_images = await self._search_unsplash_multiple(product_name, remaining_count)
+                await self._record_request(caller)
                 images.extend(unsplash_images)
                 logger.info(f"✅ Unsplash found {len(unsplash_images)} images for '{product_name}'")
             elif len(images) >= count:
@@ -72,6 +102,10 @@ class ImageSearchService:
             logger.info(f"🔄 Using {count} placeholder images due to error for '{product_name}'")
             return placeholder_images
     
+    async def _record_request(self, caller: str):
+        if self.usage is not None:
+            await self.usage.record(caller)
+    
     async def search_product_image(self, product_name: str) -> Optional[str]:
         """Legacy method for backward compatibility - returns single image URL"""
         images = await self.search_product_images(product_name, 1)
@@ -82,7 +116,7 @@ class ImageSearchService:
     async def _search_pexels_multiple(self, query: str, count: int) -> List[Dict]:
         """Search Pexels for multiple product images"""
         try:
-            url = "https://api.pexels.com/v1/search"
+            url = f"{self.pexels_api_url}/search"
             headers = {
                 "Authorization": self.pexels_api_key
             }
@@ -98,6 +132,7 @@ class ImageSearchService:
                 response = await client.get(url, headers=headers, params=params)
                 
                 logger.debug(f"Pexels API response status: {response.status_code}")
+                IMAGE_SEARCH_REQUESTS.inc(provider="pexels", outcome=str(response.status_code))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -108,11 +143,14 @@ class ImageSearchService:
                     
                     images = []
                     for photo in photos[:count]:  # Limit to requested count
+                        # Every size is kept so clients can pick one; url stays the default
+                        variants = pexels_variants(photo)
                         image_data = {
                             "url": photo["src"]["medium"],
                             "source": "pexels",
                             "photographer": photo.get("photographer", "Unknown"),
-                            "photographer_url": photo.get("photographer_url")
+                            "photographer_url": photo.get("photographer_url"),
+                            "variants": variants
                         }
                         images.append(image_data)
                         logger.debug(f"Pexels image added: {image_data['url']} (by {image_data['photographer']})")
@@ -123,13 +161,14 @@ class ImageSearchService:
                 
         except Exception as e:
             logger.error(f"Pexels search failed for '{query}': {e}")
+            IMAGE_SEARCH_REQUESTS.inc(provider="pexels", outcome="error")
         
         return []
     
     async def _search_unsplash_multiple(self, query: str, count: int) -> List[Dict]:
         """Search Unsplash for multiple product images"""
         try:
-            url = "https://api.unsplash.com/search/photos"
+            url = f"{self.unsplash_api_url}/search/photos"
             headers = {
                 "Authorization": f"Client-ID {self.unsplash_access_key}"
             }
@@ -145,6 +184,7 @@ class ImageSearchService:
                 response = await client.get(url, headers=headers, params=params)
                 
                 logger.debug(f"Unsplash API response status: {response.status_code}")
+                IMAGE_SEARCH_REQUESTS.inc(provider="unsplash", outcome=str(response.status_code))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -156,11 +196,13 @@ class ImageSearchService:
                     images = []
                     for photo in results[:count]:  # Limit to requested count
                         user = photo.get("user", {})
+                        variants = unsplash_variants(photo)
                         image_data = {
                             "url": photo["urls"]["regular"],
                             "source": "unsplash",
                             "photographer": user.get("name", "Unknown"),
-                            "photographer_url": user.get("links", {}).get("html")
+                            "photographer_url": user.get("links", {}).get("html"),
+                            "variants": variants
                         }
                         images.append(image_data)
                         logger.debug(f"Unsplash image added: {image_data['url']} (by {image_data['photographer']})")
@@ -171,6 +213,7 @@ class ImageSearchService:
                 
         except Exception as e:
             logger.error(f"Unsplash search failed for '{query}': {e}")
+            IMAGE_SEARCH_REQUESTS.inc(provider="unsplash", outcome="error")
         
         return []
     
@@ -0,0 +1,122 @@
+import os
+import math
+from typing import Any, Dict, List, Optional
+
+from services.metrics import IMAGE_VARIANTS_SERVED
+
+# Searches ask for landscape photos; used when a provider omits the dimensions
+DEFAULT_ASPECT = 1.5
+
+MAX_TARGET_WIDTH = 4096
+MAX_DPR = 4.0
+
+
+def _dimensions(photo: Dict[str, Any]):
+    width, height = photo.get("width"), photo.get("height")
+    if width and height:
+        return int(width), int(height)
+    return None, None
+
+
+def _variants(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Variants ordered by width, dropping missing URLs and repeated widths"""
+    variants = []
+    widths = set()
+    for variant in sorted(candidates, key=lambda v: v["width"]):
+        if variant["url"] and variant["width"] not in widths:
+            widths.add(variant["width"])
+            variants.append(variant)
+    return variants
+
+
+def pexels_variants(photo: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aspect-preserving sizes of a Pexels photo (src.tiny/landscape/portrait are crops)"""
+    src = photo.get("src", {})
+    width, height = _dimensions(photo)
+    aspect = width / height if width else DEFAULT_ASPECT
+
+    def fit(max_width: float, max_height: float) -> int:
+        # Pexels scales down to fit the box and never upscales
+        scaled = min(max_width, max_height * aspect)
+        return int(min(scaled, width) if width else scaled)
+
+    return _variants([
+        {"name": "small", "url": src.get("small"), "width": fit(math.inf, 130)},
+        {"name": "medium", "url": src.get("medium"), "width": fit(math.inf, 350)},
+        {"name": "large", "url": src.get("large"), "width": fit(940, 650)},
+        {"name": "large2x", "url": src.get("large2x"), "width": fit(1880, 1300)},
+        {"name": "original", "url": src.get("original"), "width": width or fit(math.inf, 4000)},
+    ])
+
+
+def unsplash_variants(photo: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Sizes of an Unsplash photo (urls.raw is untransformed and skipped)"""
+    urls = photo.get("urls", {})
+    width, _ = _dimensions(photo)
+
+    def fit(max_width: int) -> int:
+        return min(max_width, width) if width else max_width
+
+    return _variants([
+        {"name": "thumb", "url": urls.get("thumb"), "width": fit(200)},
+        {"name": "small", "url": urls.get("small"), "width": fit(400)},
+        {"name": "regular", "url": urls.get("regular"), "width": fit(1080)},
+        {"name": "full", "url": urls.get("full"), "width": width or 4000},
+    ])
+
+
+def build_srcset(variants: List[Dict[str, Any]]) -> str:
+    """HTML srcset attribute value ("url 400w, url 1080w")"""
+    return ", ".join(f"{variant['url']} {variant['width']}w" for variant in variants)
+
+
+def target_width(width: Optional[int], dpr: Optional[float]) -> Optional[int]:
+    """Device pixels a client needs, or None when it sent neither hint"""
+    if width is None and dpr is None:
+        return None
+    if not width:
+        # CSS width of a product card, for clients that only send their DPR
+        # (read per call: this module is imported before the app loads .env)
+        width = int(os.getenv("IMAGE_DEFAULT_WIDTH", 400))
+    css_width = min(max(width, 1), MAX_TARGET_WIDTH)
+    ratio = min(max(dpr or 1.0, 1.0), MAX_DPR)
+    return min(math.ceil(css_width * ratio), MAX_TARGET_WIDTH)
+
+
+def pick_variant(variants: List[Dict[str, Any]], width: int) -> Dict[str, Any]:
+    """Smallest variant at least `width` pixels wide, else the largest"""
+    for variant in variants:
+        if variant["width"] >= width:
+            return variant
+    return variants[-1]
+
+
+def adapt_items(items: List[Dict[str, Any]], width: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    Session items as served: each image with variants gets its srcset and,
+    given a `width`, a url pointing at the variant that fits `width` device
+    pixels. Only variants are stored. Items are copied; cached sessions are
+    shared.
+    """
+    adapted = []
+    for item in items:
+        images = item.get("images") or []
+        if not any(image.get("variants") for image in images):
+            adapted.append(item)
+            continue
+
+        sized = []
+        for image in images:
+            variants = image.get("variants")
+            if variants:
+                image = {**image, "srcset": build_srcset(variants)}
+                if width is not None:
+                    variant = pick_variant(variants, width)
+                    image.update(url=variant["url"], width=variant["width"])
+                    IMAGE_VARIANTS_SERVED.inc(source=image.get("source", ""), variant=variant["name"])
+            sized.append(image)
+        item = {**item, "images": sized}
+        if width is not None:
+            item["image_url"] = sized[0]["url"]
+        adapted.append(item)
+    return adapted
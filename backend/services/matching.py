@@ -1,86 +1,224 @@
-from typing import List, Dict, Any
+import os
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from fuzzywuzzy import fuzz
 import logging
 
+from services.metrics import CACHE_REQUESTS, QUEUE_DEPTH
+from services.process_pools import process_pool
+
 logger = logging.getLogger(__name__)
 
+# Catalog held by each pool worker, installed once by _init_worker so it is
+# not pickled with every chunk
+_worker_catalog: List[Tuple[str, str, str, List[str]]] = []
+
+
+def _prepare_catalog(products: List[Dict]) -> List[Tuple[str, str, str, List[str]]]:
+    """Pre-lowercase catalog entries as (id, name, name_lower, aliases_lower)"""
+    prepared = []
+    for product in products:
+        prepared.append((
+            product["_id"],
+            product["name"],
+            product["name"].lower(),
+            [alias.lower() for alias in product.get("aliases", [])]
+        ))
+    return prepared
+
+
+def _init_worker(catalog: List[Tuple[str, str, str, List[str]]]):
+    """Process pool initializer - keep the prepared catalog in the worker"""
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def _score_name(product_name: str, catalog: List[Tuple[str, str, str, List[str]]], threshold: int) -> Dict[str, Any]:
+    """Find best catalog match for a single product name"""
+    try:
+        name_lower = product_name.lower()
+        words = [word.lower() for word in product_name.split() if len(word) > 3] if " " in product_name else []
+
+        best_match = None
+        best_score = 0
+
+        for entry in catalog:
+            _, _, catalog_name, aliases = entry
+
+            # Check main name
+            score = fuzz.ratio(name_lower, catalog_name)
+            if score > best_score:
+                best_score = score
+                best_match = entry
+
+            # Check aliases
+            for alias in aliases:
+                score = fuzz.ratio(name_lower, alias)
+                if score > best_score:
+                    best_score = score
+                    best_match = entry
+
+            # Check partial matches for compound names
+            for word in words:
+                score = fuzz.partial_ratio(word, catalog_name)
+                if score > best_score:
+                    best_score = score
+                    best_match = entry
+
+        # Determine if match is good enough
+        if best_score >= threshold and best_match:
+            return {
+                "name": product_name,
+                "matched": True,
+                "confidence": best_score / 100.0,
+                "product_id": best_match[0],
+                "matched_name": best_match[1]
+            }
+        else:
+            return {
+                "name": product_name,
+                "matched": False,
+                "confidence": best_score / 100.0 if best_score > 0 else 0.0
+            }
+
+    except Exception as e:
+        logger.error(f"Error finding match for '{product_name}': {e}")
+        return {
+            "name": product_name,
+            "matched": False,
+            "confidence": 0.0
+        }
+
+
+def _score_chunk(product_names: List[str], threshold: int) -> List[Dict[str, Any]]:
+    """Score a chunk of names against the worker's catalog"""
+    return [_score_name(name, _worker_catalog, threshold) for name in product_names]
+
+
 class MatchingService:
     """Product catalog matching service"""
-    
-    def __init__(self, db_service):
+
+    def __init__(self, db_service, max_workers: Optional[int] = None):
         self.db_service = db_service
         self.match_threshold = 80  # Fuzzy matching threshold
-    
+
+        # 0 scores in a thread off the event loop, >0 uses a process pool
+        if max_workers is None:
+            max_workers = int(os.getenv("MATCHING_WORKERS", os.cpu_count() or 1))
+        self.max_workers = max(0, max_workers)
+        self.chunk_size = int(os.getenv("MATCHING_CHUNK_SIZE", 8))
+        self.catalog_limit = int(os.getenv("MATCHING_CATALOG_LIMIT", 1000))
+        self.catalog_ttl = float(os.getenv("MATCHING_CATALOG_TTL", 60))
+
+        self._catalog: List[Tuple[str, str, str, List[str]]] = []
+        self._catalog_loaded_at = 0.0
+        self._catalog_lock = asyncio.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
     async def match_products(self, product_names: List[str]) -> List[Dict[str, Any]]:
         """Match extracted product names against catalog"""
         try:
-            matches = []
-            
-            for name in product_names:
-                match_result = await self._find_best_match(name)
-                matches.append(match_result)
-            
+            matches = await self.match_products_batch(product_names)
+
             logger.info(f"Matched {len([m for m in matches if m['matched']])} of {len(matches)} products")
             return matches
-            
+
         except Exception as e:
             logger.error(f"Product matching failed: {e}")
             # Return unmatched results on error
             return [{"name": name, "matched": False, "confidence": 0.0} for name in product_names]
-    
-    async def _find_best_match(self, product_name: str) -> Dict[str, Any]:
-        """Find best match for a single product name"""
+
+    async def match_products_batch(self, product_names: List[str], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Split names into chunks and score them off the event loop, preserving order"""
+        if not product_names:
+            return []
+
+        catalog = await self._get_catalog()
+        chunk_size = max(1, chunk_size or self.chunk_size)
+        chunks = [product_names[i:i + chunk_size] for i in range(0, len(product_names), chunk_size)]
+        loop = asyncio.get_running_loop()
+
+        QUEUE_DEPTH.inc(len(chunks), queue="matching_chunks")
         try:
-            # Get all products from catalog
-            all_products = await self.db_service.get_products(limit=1000)
-            
-            best_match = None
-            best_score = 0
-            
-            # Check each product for matches
-            for product in all_products:
-                # Check main name
-                score = fuzz.ratio(product_name.lower(), product["name"].lower())
-                if score > best_score:
-                    best_score = score
-                    best_match = product
-                
-                # Check aliases
-                for alias in product.get("aliases", []):
-                    score = fuzz.ratio(product_name.lower(), alias.lower())
-                    if score > best_score:
-                        best_score = score
-                        best_match = product
-                
-                # Check partial matches for compound names
-                if " " in product_name:
-                    for word in product_name.split():
-                        if len(word) > 3:  # Skip short words
-                            score = fuzz.partial_ratio(word.lower(), product["name"].lower())
-                            if score > best_score:
-                                best_score = score
-                                best_match = product
-            
-            # Determine if match is good enough
-            if best_score >= self.match_threshold and best_match:
-                return {
-                    "name": product_name,
-                    "matched": True,
-                    "confidence": best_score / 100.0,
-                    "product_id": best_match["_id"],
-                    "matched_name": best_match["name"]
-                }
+            if self.max_workers == 0:
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(None, self._score_chunk_local, chunk, catalog)
+                    for chunk in chunks
+                ])
             else:
-                return {
-                    "name": product_name,
-                    "matched": False,
-                    "confidence": best_score / 100.0 if best_score > 0 else 0.0
-                }
-                
-        except Exception as e:
-            logger.error(f"Error finding match for '{product_name}': {e}")
-            return {
-                "name": product_name,
-                "matched": False,
-                "confidence": 0.0
-            } 
\ No newline at end of file
+                pool = self._get_pool()
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(pool, _score_chunk, chunk, self.match_threshold)
+                    for chunk in chunks
+                ])
+        finally:
+            QUEUE_DEPTH.dec(len(chunks), queue="matching_chunks")
+
+        return [match for chunk_result in results for match in chunk_result]
+
+    async def _find_best_match(self, product_name: str) -> Dict[str, Any]:
+        """Find best match for a single product name"""
+        catalog = await self._get_catalog()
+        return _score_name(product_name, catalog, self.match_threshold)
+
+    def _score_chunk_local(self, product_names: List[str], catalog) -> List[Dict[str, Any]]:
+        """Score a chunk of names in-process (thread executor)"""
+        return [_score_name(name, catalog, self.match_threshold) for name in product_names]
+
+    async def _get_catalog(self) -> List[Tuple[str, str, str, List[str]]]:
+        """Load the prepared catalog, refreshing it after catalog_ttl seconds"""
+        async with self._catalog_lock:
+            if self._catalog and time.monotonic() - self._catalog_loaded_at < self.catalog_ttl:
+                CACHE_REQUESTS.inc(cache="matching_catalog", result="hit")
+                return self._catalog
+            CACHE_REQUESTS.inc(cache="matching_catalog", result="miss")
+
+            all_products = await self.db_service.get_products(limit=self.catalog_limit)
+            catalog = _prepare_catalog(all_products)
+
+            if catalog != self._catalog:
+                self._catalog = catalog
+                # Workers hold the old catalog - recycle the pool on change
+                self._shutdown_pool()
+                logger.info(f"Loaded matching catalog with {len(catalog)} products")
+
+            self._catalog_loaded_at = time.monotonic()
+            return self._catalog
+
+    def invalidate_catalog(self):
+        """Force a catalog reload on the next match"""
+        self._catalog_loaded_at = 0.0
+
+    async def warm_up(self):
+        """Load the catalog and start the worker processes ahead of the first request"""
+        await self._get_catalog()
+        if self.max_workers > 0:
+            pool = self._get_pool()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(pool, _score_chunk, [], self.match_threshold)
+                for _ in range(self.max_workers)
+            ])
+            logger.info(f"Matching workers warmed up ({self.max_workers})")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool(
+                self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._catalog,)
+            )
+            logger.info(f"Started matching process pool with {self.max_workers} workers")
+        return self._pool
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            # In-flight chunks finish against the old catalog
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def shutdown(self):
+        """Stop the matching process pool"""
+        self._shutdown_pool()
@@ -0,0 +1,70 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.session_schema import build_session_items
+
+
+def item_key(name: str) -> str:
+    """Item identity across menu versions: casefolded name without punctuation or extra spaces"""
+    return " ".join(re.sub(r"[^\w\s]", " ", name.casefold()).split())
+
+
+def search_term(item: Dict[str, Any]) -> str:
+    """Normalized text the image search runs for an item"""
+    return item_key(item.get("nameEnglish") or item.get("name") or "")
+
+
+def has_images(item: Dict[str, Any]) -> bool:
+    """Whether an item already carries real (not placeholder) images"""
+    images = item.get("images") or []
+    return bool(images) and images[0].get("source") != "placeholder"
+
+
+def plan_reuse(ocr_products: List[Dict[str, Any]], previous_items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """For each OCR product, the previous version's item with the same name, or None"""
+    previous: Dict[str, Dict[str, Any]] = {}
+    for item in previous_items:
+        previous.setdefault(item_key(item.get("name", "")), item)
+    return [previous.get(item_key(product.get("name", ""))) for product in ocr_products]
+
+
+def merge_items(ocr_products: List[Dict[str, Any]], reuse: List[Optional[Dict[str, Any]]],
+                fresh_matches: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Session items for a new menu version. Items found in the previous version
+    keep its catalog match, and its images while the search term is the same;
+    fresh_matches covers the others, in order. Returns (items, items reused
+    with their images, items that only kept their match).
+    """
+    fresh = iter(fresh_matches)
+    matches = []
+    for product, previous in zip(ocr_products, reuse):
+        if previous is None:
+            matches.append(next(fresh))
+        else:
+            matches.append({
+                "name": product.get("name", "").strip(),
+                "matched": previous.get("matched", False),
+                "confidence": previous.get("confidence"),
+                "product_id": previous.get("product_id")
+            })
+
+    # Price, description and parsing notes always come from the new OCR pass
+    items = build_session_items(matches, ocr_products)
+    reused = reused_matches = 0
+    for item, previous in zip(items, reuse):
+        if previous is None:
+            continue
+        if has_images(previous) and search_term(previous) == search_term(item):
+            item["images"] = previous["images"]
+            item["image_url"] = previous.get("image_url") or previous["images"][0].get("url")
+            reused += 1
+        else:
+            reused_matches += 1
+    return items, reused, reused_matches
+
+
+def removed_count(ocr_products: List[Dict[str, Any]], previous_items: List[Dict[str, Any]]) -> int:
+    """Items of the previous version missing from the new one"""
+    current = {item_key(product.get("name", "")) for product in ocr_products}
+    return len({item_key(item.get("name", "")) for item in previous_items} - current)
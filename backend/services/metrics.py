@@ -0,0 +1,321 @@
+# A small Prometheus text-format registry instead of prometheus_client: the
+# profiler needs a hook on every Histogram.time() block (TIMING_HOOKS), all
+# metrics are recorded in the API process so multiprocess mode is not needed,
+# and /metrics stays free of another dependency.
+import time
+import threading
+import functools
+import inspect
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple, Optional, Sequence
+
+# Callbacks run after every Histogram.time() block as
+# hook(metric_name, labels, start_perf_counter, duration_seconds)
+TIMING_HOOKS: List[Callable[[str, Dict[str, str], float, float], None]] = []
+
+# Latency buckets in seconds, from fast Mongo lookups to slow OCR calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment while the block runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations, e.g. latencies"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> ([bucket counts], sum, count)
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(duration, **labels)
+            for hook in TIMING_HOOKS:
+                hook(self.name, labels, start, duration)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "menu_http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "menu_stage_duration_seconds", "Wall-clock time per pipeline stage", ["stage"]
+)
+MONGO_SECONDS = REGISTRY.histogram(
+    "menu_mongo_operation_duration_seconds", "MongoDB operation latency", ["operation"]
+)
+IMAGE_SEARCH_SECONDS = REGISTRY.histogram(
+    "menu_image_search_duration_seconds", "Image search latency by provider", ["provider"]
+)
+IMAGE_SEARCH_REQUESTS = REGISTRY.counter(
+    "menu_image_search_requests_total", "Image search requests by provider and outcome", ["provider", "outcome"]
+)
+IMAGE_VARIANTS_SERVED = REGISTRY.counter(
+    "menu_image_variants_served_total", "Images sized for a client's width/DPR by provider and variant",
+    ["source", "variant"]
+)
+IMAGE_SEARCH_CANCELLED = REGISTRY.counter(
+    "menu_image_search_cancelled_total",
+    "Item image searches cancelled while waiting for a slot (queued) or at the provider (in_flight)", ["state"]
+)
+BACKGROUND_CANCELLATIONS = REGISTRY.counter(
+    "menu_background_cancellations_total", "Image jobs cancelled by reason (abandoned/client)", ["reason"]
+)
+OCR_TOKENS = REGISTRY.counter(
+    "menu_ocr_tokens_total", "OpenAI tokens used for OCR by route", ["route", "type"]
+)
+OCR_ROUTE_SECONDS = REGISTRY.histogram(
+    "menu_ocr_route_duration_seconds", "OCR model call latency by fidelity route", ["route"]
+)
+OCR_ROUTE_REQUESTS = REGISTRY.counter(
+    "menu_ocr_route_requests_total", "OCR passes by route and outcome (accepted/escalated/error)", ["route", "outcome"]
+)
+OCR_RESPONSE_BYTES = REGISTRY.histogram(
+    "menu_ocr_response_bytes", "Size of the OCR model response", [],
+    buckets=(256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+)
+OCR_TRUNCATIONS = REGISTRY.counter(
+    "menu_ocr_truncations_total", "Cut-off OCR responses by outcome (recovered/partial/failed)", ["route", "outcome"]
+)
+OCR_BACKEND_SECONDS = REGISTRY.histogram(
+    "menu_ocr_backend_duration_seconds", "OCR latency by backend (remote/local)", ["backend"]
+)
+OCR_BACKEND_REQUESTS = REGISTRY.counter(
+    "menu_ocr_backend_requests_total",
+    "OCR results by backend and outcome (accepted/fallback/deadline/error)", ["backend", "outcome"]
+)
+DEDUP_CONFIRMATIONS = REGISTRY.counter(
+    "menu_dedup_confirmations_total",
+    "Background OCR checks of reused near-duplicate sessions by outcome (confirmed/diverged/error)", ["outcome"]
+)
+SESSION_FLUSH_SECONDS = REGISTRY.histogram(
+    "menu_session_flush_duration_seconds", "Latency of write-behind session bulk writes", []
+)
+SESSION_FLUSH_BATCH_SIZE = REGISTRY.histogram(
+    "menu_session_flush_batch_size", "Sessions written per write-behind bulk write", [],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+SESSION_FLUSH_ERRORS = REGISTRY.counter(
+    "menu_session_flush_errors_total", "Failed write-behind flushes (retried)", []
+)
+IMAGE_CACHE_WARM_HITS = REGISTRY.counter(
+    "menu_image_cache_warm_hits_total", "Image search cache hits served by entries the cache warmer prefetched", []
+)
+WARMER_PREFETCHES = REGISTRY.counter(
+    "menu_cache_warmer_prefetches_total", "Cache warmer image searches by outcome (cached/empty/error)", ["outcome"]
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "menu_cache_requests_total", "Cache lookups by cache and result (hit/miss, revalidated for sessions)", ["cache", "result"]
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "menu_queue_depth", "Work currently queued or in flight", ["queue"]
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "menu_admission_in_flight", "Admitted work currently holding a stage slot", ["stage"]
+)
+ADMISSION_WAITING = REGISTRY.gauge(
+    "menu_admission_waiting", "Work waiting for a stage slot by priority lane", ["stage", "lane"]
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "menu_admission_wait_seconds", "Time spent waiting for a stage slot", ["stage"]
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "menu_admission_rejections_total", "Work rejected with 503 by stage, lane and reason", ["stage", "lane", "reason"]
+)
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing the duration of a sync or async function"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,21 +1,136 @@
 import os
+import time
+import asyncio
 import base64
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import UploadFile
 import openai
 import logging
-import re
+
+from services.metrics import (
+    OCR_TOKENS, OCR_RESPONSE_BYTES, OCR_ROUTE_SECONDS, OCR_ROUTE_REQUESTS, OCR_TRUNCATIONS,
+    OCR_BACKEND_SECONDS, OCR_BACKEND_REQUESTS
+)
+from services.ocr_routing import OCRRoute, OCRRouter, estimate_complexity, prepare_image, result_quality
+from services.ocr_backends import OCRBackend, LocalOCRBackend, clean_menu_line
+from services.partial_json import salvage_products
 
 logger = logging.getLogger(__name__)
 
+# Structured prompt for menu OCR
+MENU_OCR_PROMPT = """
+            Analyze this menu image and extract all food items with their details. 
+            Return the data in the following JSON format:
+            
+            {
+                "products": [
+                    {
+                        "name": "Food item name as it appears on the menu (original language)",
+                        "nameEnglish": "English translation of the food item name (for image search)",
+                        "price": "Price if visible (e.g., '$12.99', '€15.50', or empty string if not visible)",
+                        "description": "Brief description if available (or empty string)",
+                        "parsingError": "Any issue parsing this specific item (or empty string if no issues)"
+                    }
+                ],
+                "error": ""
+            }
+            
+            Instructions:
+            - Extract ALL food items: main dishes, appetizers, soups, salads, beverages, desserts
+            - Keep original names in 'name' field exactly as they appear on the menu
+            - Provide English translation in 'nameEnglish' field for better image search
+            - If the original name is already in English, use the same name for both fields
+            - Clean item names: remove numbering, prices, and extra formatting
+            - Include prices only if clearly visible and associated with items
+            - Add descriptions only if they exist in the menu
+            - Use parsingError field for items that are hard to read or unclear
+            - Use the main error field only for overall parsing problems
+            - If you can't read the menu at all, set the main error field
+            - Return valid JSON format
+            - Focus on common, searchable English food names for nameEnglish (e.g., "Pizza", "Burger", "Salad")
+            """
+
+
+def continuation_prompt(products: List[Dict[str, str]]) -> str:
+    """Prompt asking only for the menu items after the last one already extracted"""
+    anchor = "\n".join(f"            - {product['name']}" for product in products[-3:])
+    return MENU_OCR_PROMPT + f"""
+            Your previous answer was cut off. Items up to and including these were already extracted:
+{anchor}
+            Return ONLY the items that come after "{products[-1]['name']}" on the menu, in the same JSON format.
+            If there are no more items, return an empty products list.
+            """
+
+
+def merge_products(products: List[Dict[str, str]], more: List[Dict[str, str]]) -> int:
+    """Append items not already present (by name and price); returns how many were added"""
+    seen = {(product["name"].casefold(), product["price"]) for product in products}
+    added = 0
+    for product in more:
+        key = (product["name"].casefold(), product["price"])
+        if key not in seen:
+            seen.add(key)
+            products.append(product)
+            added += 1
+    return added
+
+
+class RemoteOCRBackend(OCRBackend):
+    """GPT-4o Vision with fidelity routing, via the owning OCRService"""
+    
+    name = "remote"
+    
+    def __init__(self, service: "OCRService"):
+        self.service = service
+    
+    async def extract(self, image_content: bytes, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.service._extract_remote(image_content, stats)
+
+
 class OCRService:
     """OpenAI GPT-4o Vision OCR service with structured output"""
     
+    # remote: vision model only; local: local engine only;
+    # local_first: local engine, remote when its result falls short;
+    # remote_deadline: vision model, local engine when it misses the deadline or fails
+    POLICIES = ("remote", "local", "local_first", "remote_deadline")
+    
     def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self._client = None
+        self.router = OCRRouter()
+        self.max_continuations = int(os.getenv("OCR_MAX_CONTINUATIONS", 2))
+        
+        self.backends: Dict[str, OCRBackend] = {}
+        self.register_backend(RemoteOCRBackend(self))
+        self.register_backend(LocalOCRBackend())
+        self.policy = os.getenv("OCR_BACKEND_POLICY", "remote").lower()
+        if self.policy not in self.POLICIES:
+            logger.warning(f"Unknown OCR_BACKEND_POLICY '{self.policy}', using 'remote'")
+            self.policy = "remote"
+        self.remote_deadline = float(os.getenv("OCR_REMOTE_DEADLINE", 8))
+    
+    def register_backend(self, backend: OCRBackend):
+        """Add or replace the backend used under backend.name ("remote" or "local")"""
+        self.backends[backend.name] = backend
+    
+    def shutdown(self):
+        """Stop backend worker pools"""
+        for backend in self.backends.values():
+            backend.shutdown()
+    
+    @property
+    def client(self):
+        """OpenAI client, created on first use so a missing key does not block startup"""
+        if self._client is None:
+            self._client = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
     
     def _get_image_mime_type(self, image_content: bytes) -> str:
         """Detect image MIME type from content"""
@@ -33,14 +148,25 @@ class OCRService:
             return "image/jpeg"
     
     async def extract_structured_data(self, image_file: UploadFile) -> Dict[str, Any]:
-        """Extract structured menu data from image using GPT-4o Vision"""
+        """Extract structured menu data from image with the configured OCR backend policy"""
         try:
             # Reset file pointer to beginning
             await image_file.seek(0)
             
             # Read image content
             image_content = await image_file.read()
+            return await self.extract_from_bytes(image_content)
             
+        except Exception as e:
+            logger.error(f"OCR extraction failed: {e}")
+            return {
+                "products": [],
+                "error": f"Menu processing failed: {str(e)}"
+            }
+    
+    async def extract_from_bytes(self, image_content: bytes) -> Dict[str, Any]:
+        """Extract structured menu data from image bytes"""
+        try:
             # Validate image content
             if not image_content:
                 logger.error("Empty image content")
@@ -49,59 +175,192 @@ class OCRService:
                     "error": "Empty image content - please upload a valid image"
                 }
             
-            # Detect image format
-            mime_type = self._get_image_mime_type(image_content)
-            logger.info(f"Detected image format: {mime_type}")
+            # Layout statistics drive both model routing and fallback decisions
+            stats = await asyncio.to_thread(estimate_complexity, image_content)
             
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_content).decode('utf-8')
+            policy = self.policy
+            if policy != "remote" and not self.backends["local"].available:
+                policy = "remote"
             
-            # Validate base64 encoding
-            if not image_base64:
-                logger.error("Failed to encode image to base64")
-                return {
-                    "products": [],
-                    "error": "Failed to process image - encoding error"
-                }
+            if policy == "local":
+                return self._accept(await self._run_backend("local", image_content, stats))
+            if policy == "local_first":
+                return await self._extract_local_first(image_content, stats)
+            if policy == "remote_deadline":
+                return await self._extract_remote_with_deadline(image_content, stats)
+            return self._accept(await self._run_backend("remote", image_content, stats))
+            
+        except Exception as e:
+            logger.error(f"OCR extraction failed: {e}")
+            return {
+                "products": [],
+                "error": f"Menu processing failed: {str(e)}"
+            }
+    
+    async def _run_backend(self, name: str, image_content: bytes, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one backend, turning its failures into an error result"""
+        start = time.perf_counter()
+        try:
+            result = await self.backends[name].extract(image_content, stats)
+        except openai.APIError as e:
+            logger.error(f"OpenAI API error: {e}")
+            result = {
+                "products": [],
+                "error": f"AI service error: {str(e)}"
+            }
+        except Exception as e:
+            logger.error(f"OCR backend '{name}' failed: {e}")
+            result = {
+                "products": [],
+                "error": f"Menu processing failed: {str(e)}"
+            }
+        finally:
+            OCR_BACKEND_SECONDS.observe(time.perf_counter() - start, backend=name)
+        
+        result["backend"] = name
+        if not self._usable(result):
+            OCR_BACKEND_REQUESTS.inc(backend=name, outcome="error")
+        return result
+    
+    @staticmethod
+    def _usable(result: Dict[str, Any]) -> bool:
+        return bool(result.get("products")) or not result.get("error")
+    
+    def _accept(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if self._usable(result):
+            OCR_BACKEND_REQUESTS.inc(backend=result["backend"], outcome="accepted")
+        return result
+    
+    async def _extract_local_first(self, image_content: bytes, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Local engine first; the vision model only when the local result falls short"""
+        local = await self._run_backend("local", image_content, stats)
+        reason = self.router.shortfall(local, stats)
+        if not reason:
+            return self._accept(local)
+        
+        OCR_BACKEND_REQUESTS.inc(backend="local", outcome="fallback")
+        logger.info(
+            f"Local OCR result falls short ({reason}: {len(local['products'])} items, "
+            f"expected >= {self.router.expected_items(stats)}), using remote OCR"
+        )
+        remote = await self._run_backend("remote", image_content, stats)
+        if not self._usable(remote) and local.get("products"):
+            # Remote is down or rate-limited: a partial local read beats nothing
+            logger.warning("Remote OCR failed, keeping local result")
+            return self._accept(local)
+        return self._accept(remote)
+    
+    async def _extract_remote_with_deadline(self, image_content: bytes, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Vision model, racing the local engine once it misses the deadline or fails"""
+        remote_task = asyncio.create_task(self._run_backend("remote", image_content, stats))
+        done, _ = await asyncio.wait({remote_task}, timeout=self.remote_deadline)
+        if done:
+            remote = remote_task.result()
+            if self._usable(remote):
+                return self._accept(remote)
+            pending = set()
+        else:
+            OCR_BACKEND_REQUESTS.inc(backend="remote", outcome="deadline")
+            logger.warning(f"Remote OCR missed its {self.remote_deadline:.1f}s deadline, starting local OCR")
+            pending = {remote_task}
+        
+        # First usable result wins; the other one is abandoned
+        pending.add(asyncio.create_task(self._run_backend("local", image_content, stats)))
+        fallback = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if self._usable(result):
+                        return self._accept(result)
+                    fallback = fallback or result
+        finally:
+            for task in pending:
+                task.cancel()
+        return fallback if fallback is not None else remote_task.result()
+    
+    async def _extract_remote(self, image_content: bytes, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Vision model OCR, starting at the cheapest route likely to read the menu"""
+        route = self.router.select(stats)
+        logger.info(
+            f"OCR route '{route.name}' for {stats['width']}x{stats['height']} image "
+            f"({stats['text_lines']} text lines, density {stats['text_density']})"
+        )
+        
+        best = None
+        for attempt in range(self.router.max_escalations + 1):
+            try:
+                result = await self._extract_with_route(route, image_content)
+            except openai.APIError:
+                if best is None:
+                    raise
+                # Keep the cheaper pass rather than failing the upload
+                OCR_ROUTE_REQUESTS.inc(route=route.name, outcome="error")
+                logger.warning(f"OCR escalation to '{route.name}' failed, keeping previous result")
+                break
             
-            logger.info(f"Base64 encoded image length: {len(image_base64)}")
+            if best is None or result_quality(result) > result_quality(best):
+                best = result
             
-            # Create the structured prompt for menu OCR
-            prompt = """
-            Analyze this menu image and extract all food items with their details. 
-            Return the data in the following JSON format:
+            reason = self.router.escalation_reason(result, stats)
+            next_route = self.router.escalate(route) if reason else None
+            if not next_route or attempt == self.router.max_escalations:
+                OCR_ROUTE_REQUESTS.inc(route=route.name, outcome="accepted")
+                break
             
-            {
-                "products": [
-                    {
-                        "name": "Food item name as it appears on the menu (original language)",
-                        "nameEnglish": "English translation of the food item name (for image search)",
-                        "price": "Price if visible (e.g., '$12.99', '€15.50', or empty string if not visible)",
-                        "description": "Brief description if available (or empty string)",
-                        "parsingError": "Any issue parsing this specific item (or empty string if no issues)"
-                    }
-                ],
-                "error": ""
+            OCR_ROUTE_REQUESTS.inc(route=route.name, outcome="escalated")
+            logger.info(
+                f"Escalating OCR from '{route.name}' to '{next_route.name}' ({reason}: "
+                f"{len(result.get('products', []))} items, expected >= {self.router.expected_items(stats)})"
+            )
+            route = next_route
+        
+        return best
+    
+    async def _extract_with_route(self, route: OCRRoute, image_content: bytes) -> Dict[str, Any]:
+        """Run one OCR pass with the route's model, detail level and token budget"""
+        # Downscale images the model would shrink anyway to save upload time
+        resized = await asyncio.to_thread(prepare_image, image_content, route.max_side)
+        if resized is not None:
+            image_content = resized
+        
+        # Detect image format
+        mime_type = self._get_image_mime_type(image_content)
+        logger.info(f"Detected image format: {mime_type}")
+        
+        # Encode image to base64
+        image_base64 = base64.b64encode(image_content).decode('utf-8')
+        
+        # Validate base64 encoding
+        if not image_base64:
+            logger.error("Failed to encode image to base64")
+            return {
+                "products": [],
+                "error": "Failed to process image - encoding error"
             }
+        
+        logger.info(f"Base64 encoded image length: {len(image_base64)}")
+        
+        # The OpenAI client is blocking; keep it off the event loop
+        response_content, finish_reason = await asyncio.to_thread(
+            self._complete, route, mime_type, image_base64, MENU_OCR_PROMPT
+        )
+        
+        try:
+            return self._parse_structured_response(response_content)
             
-            Instructions:
-            - Extract ALL food items: main dishes, appetizers, soups, salads, beverages, desserts
-            - Keep original names in 'name' field exactly as they appear on the menu
-            - Provide English translation in 'nameEnglish' field for better image search
-            - If the original name is already in English, use the same name for both fields
-            - Clean item names: remove numbering, prices, and extra formatting
-            - Include prices only if clearly visible and associated with items
-            - Add descriptions only if they exist in the menu
-            - Use parsingError field for items that are hard to read or unclear
-            - Use the main error field only for overall parsing problems
-            - If you can't read the menu at all, set the main error field
-            - Return valid JSON format
-            - Focus on common, searchable English food names for nameEnglish (e.g., "Pizza", "Burger", "Salad")
-            """
-            
-            # Make API call to GPT-4o Vision
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON response ({finish_reason}): {e}")
+            logger.debug(f"Raw response: {response_content}")
+            return await asyncio.to_thread(self._recover_truncated, route, mime_type, image_base64, response_content)
+    
+    def _complete(self, route: OCRRoute, mime_type: str, image_base64: str, prompt: str):
+        """Call the vision model; returns (response content, finish reason)"""
+        # Make API call to GPT-4o Vision
+        with OCR_ROUTE_SECONDS.time(route=route.name):
             response = self.client.chat.completions.create(
-                model="gpt-4o",
+                model=route.model,
                 messages=[
                     {
                         "role": "user",
@@ -110,84 +369,112 @@ class OCRService:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}"
+                                    "url": f"data:{mime_type};base64,{image_base64}",
+                                    "detail": route.detail
                                 }
                             }
                         ]
                     }
                 ],
-                max_tokens=4000,
+                max_tokens=route.max_tokens,
                 temperature=0.1,
                 response_format={"type": "json_object"}
             )
-            
-            # Parse the structured response
-            response_content = response.choices[0].message.content
-            logger.info(f"OCR response length: {len(response_content)}")
-            
-            try:
-                structured_data = json.loads(response_content)
-                
-                # Validate the structure
-                if not isinstance(structured_data, dict):
-                    raise ValueError("Response is not a valid JSON object")
-                
-                if "products" not in structured_data:
-                    structured_data["products"] = []
-                
-                if "error" not in structured_data:
-                    structured_data["error"] = ""
-                
-                # Validate products array
-                if not isinstance(structured_data["products"], list):
-                    structured_data["products"] = []
-                
-                # Clean and validate each product
-                cleaned_products = []
-                for product in structured_data["products"]:
-                    if isinstance(product, dict):
-                        cleaned_product = {
-                            "name": str(product.get("name", "")).strip(),
-                            "nameEnglish": str(product.get("nameEnglish", "")).strip(),
-                            "price": str(product.get("price", "")).strip(),
-                            "description": str(product.get("description", "")).strip(),
-                            "parsingError": str(product.get("parsingError", "")).strip()
-                        }
-                        
-                        # Only add products with valid names
-                        if cleaned_product["name"] and len(cleaned_product["name"]) > 1:
-                            cleaned_products.append(cleaned_product)
-                
-                structured_data["products"] = cleaned_products
-                
-                logger.info(f"Successfully parsed {len(cleaned_products)} products")
-                return structured_data
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.error(f"Raw response: {response_content}")
-                
-                # Check if response was truncated
-                if len(response_content) > 7000:
-                    logger.warning("Response appears to be truncated - consider increasing max_tokens")
-                
-                return {
-                    "products": [],
-                    "error": f"Failed to parse menu data - response may be truncated. Try with a smaller menu image or contact support."
-                }
-            
-        except openai.APIError as e:
-            logger.error(f"OpenAI API error: {e}")
-            return {
-                "products": [],
-                "error": f"AI service error: {str(e)}"
-            }
-        except Exception as e:
-            logger.error(f"OCR extraction failed: {e}")
+        
+        choice = response.choices[0]
+        response_content = choice.message.content or ""
+        logger.info(f"OCR response length: {len(response_content)}")
+        
+        # Record token usage and response size
+        OCR_RESPONSE_BYTES.observe(len(response_content.encode("utf-8")))
+        usage = getattr(response, "usage", None)
+        if usage:
+            OCR_TOKENS.inc(usage.prompt_tokens or 0, route=route.name, type="prompt")
+            OCR_TOKENS.inc(usage.completion_tokens or 0, route=route.name, type="completion")
+        
+        return response_content, getattr(choice, "finish_reason", None)
+    
+    def _recover_truncated(self, route: OCRRoute, mime_type: str, image_base64: str,
+                           response_content: str) -> Dict[str, Any]:
+        """Keep the complete items of a cut-off response and ask for the rest of the menu"""
+        salvaged = salvage_products(response_content)
+        products = self._clean_products(salvaged["products"])
+        
+        if not products:
+            OCR_TRUNCATIONS.inc(route=route.name, outcome="failed")
             return {
                 "products": [],
-                "error": f"Menu processing failed: {str(e)}"
+                "error": f"Failed to parse menu data - response may be truncated. Try with a smaller menu image or contact support."
             }
+        
+        logger.warning(f"OCR response cut off after {len(products)} items, requesting continuation")
+        outcome = "partial"
+        for _ in range(self.max_continuations):
+            try:
+                content, finish_reason = self._complete(
+                    route, mime_type, image_base64, continuation_prompt(products)
+                )
+            except openai.APIError as e:
+                logger.error(f"OCR continuation failed: {e}")
+                break
+            
+            continuation = salvage_products(content)
+            added = merge_products(products, self._clean_products(continuation["products"]))
+            logger.info(f"OCR continuation added {added} items ({finish_reason})")
+            
+            if continuation["complete"]:
+                outcome = "recovered"
+                break
+            if not added:
+                break
+        
+        OCR_TRUNCATIONS.inc(route=route.name, outcome=outcome)
+        if outcome == "partial":
+            logger.warning(f"Returning {len(products)} items from an incomplete OCR response")
+        return {"products": products, "error": salvaged["error"]}
+    
+    def _parse_structured_response(self, response_content: str) -> Dict[str, Any]:
+        """Parse and clean the model's JSON response (raises JSONDecodeError)"""
+        structured_data = json.loads(response_content)
+        
+        # Validate the structure
+        if not isinstance(structured_data, dict):
+            raise ValueError("Response is not a valid JSON object")
+        
+        if "products" not in structured_data:
+            structured_data["products"] = []
+        
+        if "error" not in structured_data:
+            structured_data["error"] = ""
+        
+        # Validate products array
+        if not isinstance(structured_data["products"], list):
+            structured_data["products"] = []
+        
+        cleaned_products = self._clean_products(structured_data["products"])
+        structured_data["products"] = cleaned_products
+        
+        logger.info(f"Successfully parsed {len(cleaned_products)} products")
+        return structured_data
+    
+    def _clean_products(self, products: List[Any]) -> List[Dict[str, str]]:
+        """Clean and validate each product"""
+        cleaned_products = []
+        for product in products:
+            if isinstance(product, dict):
+                cleaned_product = {
+                    "name": str(product.get("name", "")).strip(),
+                    "nameEnglish": str(product.get("nameEnglish", "")).strip(),
+                    "price": str(product.get("price", "")).strip(),
+                    "description": str(product.get("description", "")).strip(),
+                    "parsingError": str(product.get("parsingError", "")).strip()
+                }
+                
+                # Only add products with valid names
+                if cleaned_product["name"] and len(cleaned_product["name"]) > 1:
+                    cleaned_products.append(cleaned_product)
+        
+        return cleaned_products
     
     async def extract_text(self, image_file: UploadFile) -> str:
         """Legacy method for backward compatibility - extracts text only"""
@@ -224,28 +511,11 @@ class OCRService:
             product_names = []
             
             for line in lines:
-                # Clean up the line
-                line = line.strip()
-                
-                # Skip empty lines
+                # Remove numbering, prices and noise
+                line = clean_menu_line(line)
                 if not line:
                     continue
                 
-                # Remove common menu artifacts
-                line = re.sub(r'^\d+[\.\)]\s*', '', line)  # Remove numbering
-                line = re.sub(r'\$[\d\.,]+', '', line)    # Remove prices
-                line = re.sub(r'\d+\.\d+', '', line)      # Remove decimal numbers
-                line = re.sub(r'\s+', ' ', line)          # Normalize spaces
-                line = line.strip()
-                
-                # Skip if too short or looks like noise
-                if len(line) < 3:
-                    continue
-                
-                # Skip lines that are mostly numbers or symbols
-                if re.match(r'^[\d\s\$\.\,\-]+$', line):
-                    continue
-                
                 # Add to results
                 product_names.append(line)
             
@@ -0,0 +1,219 @@
+import io
+import os
+import re
+import shutil
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+import logging
+
+from PIL import Image, ImageOps
+
+from services.process_pools import process_pool
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+# Tesseract reads best at roughly 300 DPI; narrower images are upscaled to this width
+LOCAL_MIN_WIDTH = 1600
+
+CURRENCY = r"[$€£¥₸₽]"
+# A price at the end of a line, optionally after dot leaders ("Borscht ..... 4.50")
+PRICE_AT_END = re.compile(
+    r"(?:\s*[.·…_]{2,}\s*|\s+|^)(?P<price>"
+    + CURRENCY + r"\s?\d{1,5}(?:[.,]\d{1,2})?"
+    r"|\d{1,3}(?:[ \u00a0]\d{3})+\s?(?:" + CURRENCY + r"|tg|тг|kzt|руб)?"
+    r"|\d{1,5}[.,]\d{2}\s?(?:" + CURRENCY + r"|tg|тг|kzt|руб)?"
+    r"|\d{2,5}\s?(?:" + CURRENCY + r"|tg|тг|kzt|руб)?"
+    r")\s*$",
+    re.IGNORECASE
+)
+BULLET = re.compile(r"^[•·*|>\-–—]+\s*")
+
+
+def clean_menu_line(line: str) -> str:
+    """Strip numbering, prices and extra spacing from a menu line; '' when it is noise"""
+    line = line.strip()
+    line = re.sub(r'^\d+[\.\)]\s*', '', line)  # Remove numbering
+    line = re.sub(r'\$[\d\.,]+', '', line)    # Remove prices
+    line = re.sub(r'\d+\.\d+', '', line)      # Remove decimal numbers
+    line = re.sub(r'\s+', ' ', line)          # Normalize spaces
+    line = line.strip()
+
+    # Skip if too short or looks like noise
+    if len(line) < 3:
+        return ""
+
+    # Skip lines that are mostly numbers or symbols
+    if re.match(r'^[\d\s\$\.\,\-]+$', line):
+        return ""
+
+    return line
+
+
+def _is_heading(name: str) -> bool:
+    """Section titles such as "DESSERTS" or "Hot Drinks:" carry no price"""
+    words = name.rstrip(":").split()
+    return name.endswith(":") or (name.upper() == name and len(words) <= 4)
+
+
+def _is_description(name: str) -> bool:
+    return name[0].islower() or name[0] in "(," or (len(name.split()) > 6 and "," in name)
+
+
+def _looks_misread(name: str) -> bool:
+    readable = sum(1 for char in name if char.isalnum() or char in " '&-")
+    return readable / len(name) < 0.8
+
+
+def parse_menu_text(text: str, max_items: int = 200) -> List[Dict[str, str]]:
+    """Rule-based menu parser: one item per line with an optional trailing price"""
+    products: List[Dict[str, str]] = []
+    seen = set()
+
+    for raw_line in text.splitlines():
+        line = BULLET.sub("", raw_line.strip())
+        if not line:
+            continue
+
+        price = ""
+        match = PRICE_AT_END.search(line)
+        if match:
+            price = re.sub(r"\s+", " ", match.group("price"))
+            line = line[:match.start()]
+
+        name = clean_menu_line(line).rstrip(" .·…_-")
+        if len(name) < 3:
+            # A price on its own line belongs to the item above it
+            if price and products and not products[-1]["price"]:
+                products[-1]["price"] = price
+            continue
+
+        if not price:
+            if _is_heading(name):
+                continue
+            if products and _is_description(name):
+                previous = products[-1]
+                previous["description"] = f"{previous['description']} {name}".strip()
+                continue
+
+        key = (name.casefold(), price)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        products.append({
+            "name": name,
+            # No translation without a language model; image search uses the original name
+            "nameEnglish": name,
+            "price": price,
+            "description": "",
+            "parsingError": "Text may be misread" if _looks_misread(name) else ""
+        })
+        if len(products) >= max_items:
+            break
+
+    return products
+
+
+def _run_tesseract(image_content: bytes, lang: str, psm: int, timeout: float, tesseract_cmd: str) -> str:
+    """Grayscale, upscale and contrast-stretch the image, then run Tesseract on it"""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    with Image.open(io.BytesIO(image_content)) as image:
+        gray = ImageOps.exif_transpose(image).convert("L")
+
+    if gray.width < LOCAL_MIN_WIDTH:
+        scale = LOCAL_MIN_WIDTH / gray.width
+        gray = gray.resize((LOCAL_MIN_WIDTH, int(gray.height * scale)), Image.LANCZOS)
+    gray = ImageOps.autocontrast(gray)
+
+    return pytesseract.image_to_string(gray, lang=lang, config=f"--psm {psm}", timeout=timeout)
+
+
+def _local_extract(image_content: bytes, lang: str, psm: int, timeout: float, tesseract_cmd: str,
+                   max_items: int) -> Dict[str, Any]:
+    """Process pool entry point: image bytes to structured menu data"""
+    text = _run_tesseract(image_content, lang, psm, timeout, tesseract_cmd)
+    products = parse_menu_text(text, max_items)
+    return {
+        "products": products,
+        "error": "" if products else "No menu items could be read from the image"
+    }
+
+
+class OCRBackend(ABC):
+    """
+    OCR engine interface. extract() turns menu image bytes into
+    {"products": [...], "error": str} with the same product fields as the
+    vision model's JSON.
+    """
+
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def extract(self, image_content: bytes, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        ...
+
+    def shutdown(self):
+        pass
+
+
+class LocalOCRBackend(OCRBackend):
+    """Tesseract plus a rule-based line parser, run in a process pool"""
+
+    name = "local"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("OCR_LOCAL_WORKERS", 2))
+        self.max_workers = max(1, max_workers)
+        self.lang = os.getenv("OCR_LOCAL_LANG", "eng")
+        # Page segmentation mode 4: a single column of text of variable sizes
+        self.psm = int(os.getenv("OCR_LOCAL_PSM", 4))
+        self.timeout = float(os.getenv("OCR_LOCAL_TIMEOUT", 20))
+        self.max_items = int(os.getenv("OCR_LOCAL_MAX_ITEMS", 200))
+        self.tesseract_cmd = os.getenv("TESSERACT_CMD", "tesseract")
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = pytesseract is not None and shutil.which(self.tesseract_cmd) is not None
+            if not self._available:
+                logger.warning("Local OCR unavailable: install pytesseract and the tesseract-ocr binary")
+        return self._available
+
+    async def extract(self, image_content: bytes, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if not self.available:
+            return {"products": [], "error": "Local OCR engine is not installed"}
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self._get_pool(), _local_extract,
+            image_content, self.lang, self.psm, self.timeout, self.tesseract_cmd, self.max_items
+        )
+        logger.info(f"Local OCR read {len(result['products'])} products")
+        return result
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool(self.max_workers)
+            logger.info(f"Started local OCR process pool with {self.max_workers} workers")
+        return self._pool
+
+    def shutdown(self):
+        """Stop the local OCR process pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,165 @@
+import io
+import os
+from typing import Dict, Any, List, Optional
+import logging
+
+from PIL import Image, ImageChops, ImageStat
+
+logger = logging.getLogger(__name__)
+
+# Width the image is reduced to before measuring text density
+ANALYSIS_WIDTH = 512
+# Horizontal gradient (0-255) above which a pixel counts as an edge
+EDGE_THRESHOLD = 40
+# Share of edge pixels for a row to count as part of a text line
+INK_ROW_THRESHOLD = 0.04
+
+
+class OCRRoute:
+    """Model, vision detail level and token budget for one OCR pass"""
+
+    def __init__(self, name: str, model: str, detail: str, max_tokens: int, max_side: Optional[int] = None):
+        self.name = name
+        self.model = model
+        self.detail = detail
+        self.max_tokens = max_tokens
+        # Longest image side sent to the model; larger images are downscaled first
+        self.max_side = max_side
+
+    @classmethod
+    def from_env(cls, name: str, model: str, detail: str, max_tokens: int, max_side: int) -> "OCRRoute":
+        prefix = f"OCR_ROUTE_{name.upper()}_"
+        return cls(
+            name,
+            os.getenv(prefix + "MODEL", model),
+            os.getenv(prefix + "DETAIL", detail),
+            int(os.getenv(prefix + "MAX_TOKENS", max_tokens)),
+            int(os.getenv(prefix + "MAX_SIDE", max_side))
+        )
+
+    def __repr__(self) -> str:
+        return f"OCRRoute({self.name}: {self.model}, detail={self.detail}, max_tokens={self.max_tokens})"
+
+
+def estimate_complexity(image_content: bytes) -> Dict[str, Any]:
+    """Cheap layout statistics: dimensions, edge density and number of text lines"""
+    stats = {"bytes": len(image_content), "width": 0, "height": 0, "text_density": 0.0, "text_lines": None}
+    try:
+        with Image.open(io.BytesIO(image_content)) as image:
+            stats["width"], stats["height"] = image.size
+            # Let the JPEG decoder skip most of the work at reduced scale
+            image.draft("L", (ANALYSIS_WIDTH, ANALYSIS_WIDTH * image.height // max(image.width, 1)))
+            gray = image.convert("L")
+    except Exception as e:
+        logger.warning(f"Could not analyse image for OCR routing: {e}")
+        return stats
+
+    if gray.width > ANALYSIS_WIDTH:
+        gray = gray.resize((ANALYSIS_WIDTH, max(1, gray.height * ANALYSIS_WIDTH // gray.width)))
+
+    # Text is dense in horizontal gradients; photos and plain backgrounds are not
+    edges = ImageChops.difference(gray, ImageChops.offset(gray, 1, 0))
+    edges = edges.point(lambda v: 255 if v > EDGE_THRESHOLD else 0)
+    stats["text_density"] = round(ImageStat.Stat(edges).mean[0] / 255, 4)
+
+    # Average each row down to one pixel and count runs of inked rows
+    row_profile = edges.resize((1, edges.height), Image.BOX).tobytes()
+    lines, run = 0, 0
+    for value in row_profile:
+        if value / 255 > INK_ROW_THRESHOLD:
+            run += 1
+        else:
+            if run >= 2:
+                lines += 1
+            run = 0
+    if run >= 2:
+        lines += 1
+    stats["text_lines"] = lines
+    return stats
+
+
+def prepare_image(image_content: bytes, max_side: Optional[int]) -> Optional[bytes]:
+    """Downscale to max_side as JPEG; None when the original can be sent as is"""
+    if not max_side:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_content)) as image:
+            if max(image.size) <= max_side:
+                return None
+            image.draft("RGB", (max_side, max_side))
+            resized = image.convert("RGB")
+            resized.thumbnail((max_side, max_side))
+            buffer = io.BytesIO()
+            resized.save(buffer, format="JPEG", quality=85)
+            return buffer.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not downscale image for OCR: {e}")
+        return None
+
+
+class OCRRouter:
+    """Picks the cheapest OCR route a menu is likely to need and decides when to escalate"""
+
+    def __init__(self):
+        self.routes: List[OCRRoute] = [
+            OCRRoute.from_env("light", "gpt-4o-mini", "low", 1500, 512),
+            OCRRoute.from_env("standard", "gpt-4o", "auto", 4000, 2048),
+            OCRRoute.from_env("high", "gpt-4o", "high", 8000, 2048),
+        ]
+        self.enabled = os.getenv("OCR_ROUTING_ENABLED", "true").lower() == "true"
+        self.light_max_lines = int(os.getenv("OCR_LIGHT_MAX_LINES", 20))
+        self.high_min_lines = int(os.getenv("OCR_HIGH_MIN_LINES", 80))
+        self.max_escalations = int(os.getenv("OCR_MAX_ESCALATIONS", 1))
+        self.min_items = int(os.getenv("OCR_MIN_ITEMS", 3))
+        # Expected items per detected text line (name, price and description lines)
+        self.items_per_line = float(os.getenv("OCR_MIN_ITEMS_PER_LINE", 0.2))
+        self.max_error_ratio = float(os.getenv("OCR_MAX_PARSING_ERROR_RATIO", 0.2))
+
+    def route(self, name: str) -> OCRRoute:
+        return next(route for route in self.routes if route.name == name)
+
+    def select(self, stats: Dict[str, Any]) -> OCRRoute:
+        """First route for an image, from its estimated complexity"""
+        lines = stats.get("text_lines")
+        if not self.enabled or lines is None:
+            return self.route("standard")
+        if lines <= self.light_max_lines:
+            return self.route("light")
+        if lines >= self.high_min_lines:
+            return self.route("high")
+        return self.route("standard")
+
+    def escalate(self, route: OCRRoute) -> Optional[OCRRoute]:
+        """Next higher-fidelity route, if any"""
+        index = self.routes.index(route)
+        return self.routes[index + 1] if index + 1 < len(self.routes) else None
+
+    def expected_items(self, stats: Dict[str, Any]) -> int:
+        lines = stats.get("text_lines") or 0
+        return max(self.min_items, int(lines * self.items_per_line))
+
+    def escalation_reason(self, result: Dict[str, Any], stats: Dict[str, Any]) -> Optional[str]:
+        """Why a pass's result is not good enough, or None to accept it"""
+        if not self.enabled:
+            return None
+        return self.shortfall(result, stats)
+
+    def shortfall(self, result: Dict[str, Any], stats: Dict[str, Any]) -> Optional[str]:
+        """Why a result falls short of what the image is expected to hold, or None"""
+        products = result.get("products", [])
+        if result.get("error") and not products:
+            return "error"
+        if products:
+            errors = sum(1 for product in products if product.get("parsingError"))
+            if errors / len(products) > self.max_error_ratio:
+                return "parsing_errors"
+        if len(products) < self.expected_items(stats):
+            return "too_few_items"
+        return None
+
+
+def result_quality(result: Dict[str, Any]) -> tuple:
+    """Sort key preferring results without errors, then more cleanly parsed items"""
+    products = result.get("products", [])
+    clean = sum(1 for product in products if not product.get("parsingError"))
+    return (not result.get("error"), clean, len(products))
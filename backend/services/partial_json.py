@@ -0,0 +1,47 @@
+import json
+import re
+from typing import Dict, Any, List
+
+_DECODER = json.JSONDecoder()
+_PRODUCTS_START = re.compile(r'"products"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+_ERROR_FIELD = re.compile(r'"error"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def salvage_products(content: str) -> Dict[str, Any]:
+    """
+    Recover every complete object of the "products" array from a possibly
+    truncated model response. Returns the products, the top-level error if
+    it was received, and whether the array was closed.
+    """
+    result = {"products": [], "error": "", "complete": False}
+
+    error_match = _ERROR_FIELD.search(content)
+    if error_match:
+        try:
+            result["error"] = json.loads(error_match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    start = _PRODUCTS_START.search(content)
+    if not start:
+        return result
+
+    pos = start.end()
+    products: List[Any] = []
+    while True:
+        pos = _SEPARATORS.match(content, pos).end()
+        if pos >= len(content):
+            break
+        if content[pos] == "]":
+            result["complete"] = True
+            break
+        try:
+            value, pos = _DECODER.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            # The object at pos was cut off
+            break
+        products.append(value)
+
+    result["products"] = products
+    return result
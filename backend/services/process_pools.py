@@ -0,0 +1,13 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(max_workers: int, **kwargs) -> ProcessPoolExecutor:
+    """
+    Process pool whose workers start from a clean forkserver (spawn where
+    that is unavailable). Forking the server itself would copy its event
+    loop, threads and open sockets, and locks held by other threads at
+    fork time stay locked in the child.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method), **kwargs)
@@ -0,0 +1,280 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import functools
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+from services.metrics import TIMING_HOOKS
+
+logger = logging.getLogger(__name__)
+
+# Profile collecting samples and stage timings for the current request/job
+_active_profile: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+# Set for a profiled request and inherited by the background jobs it schedules
+_profile_requested: ContextVar[bool] = ContextVar("profile_requested", default=False)
+
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])})"
+
+
+def _stack_from_frame(frame) -> List[str]:
+    """Root-first list of frame labels"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _running_task(loop: asyncio.AbstractEventLoop) -> Optional[asyncio.Task]:
+    """
+    The task the loop is stepping right now, read from the sampler thread.
+    asyncio.current_task() only works on the loop's own thread, so this reads
+    asyncio.tasks._current_tasks, a private CPython detail that may change
+    between versions; without it every sample is recorded as awaiting.
+    """
+    current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+    if current_tasks is None:
+        return None
+    try:
+        return current_tasks.get(loop)
+    except Exception:
+        return None
+
+
+def _stage_name(metric_name: str, labels: Dict[str, str]) -> str:
+    if "stage" in labels:
+        return labels["stage"]
+    short = metric_name.replace("menu_", "").replace("_duration_seconds", "").replace("_operation", "")
+    return ":".join([short] + [str(value) for value in labels.values()])
+
+
+class Profile:
+    """Stack samples and a stage waterfall for one request or background job"""
+
+    def __init__(self, name: str, kind: str, sample_interval: float):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.kind = kind
+        self.sample_interval = sample_interval
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.samples: Counter = Counter()
+        self.stages: List[Dict[str, Any]] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def add_stage(self, name: str, start: float, duration: float):
+        self.stages.append({
+            "stage": name,
+            "offset_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3)
+        })
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format (flamegraph.pl, speedscope, inferno)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "started_at": self.started_at.isoformat() + "Z",
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values())
+        }
+
+    def waterfall(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "sample_interval_ms": self.sample_interval * 1000,
+            "stages": sorted(self.stages, key=lambda s: s["offset_ms"])
+        }
+
+
+class Profiler:
+    """
+    Opt-in per-request sampling profiler.
+
+    A background thread samples the event loop thread every sample interval.
+    Samples count towards a profile when the running task belongs to it
+    (the request task or any task it created); while its tasks are suspended
+    their await stacks are recorded instead, so the result is a wall-clock
+    profile of just that request.
+    """
+
+    def __init__(self):
+        self.configure()
+
+        self.profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._active: List[Profile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def configure(self):
+        """Read the settings from the environment"""
+        self.admin_token = os.getenv("ADMIN_TOKEN", "")
+        self.enabled = bool(self.admin_token)
+        self.sample_interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)) / 1000.0
+        self.keep = int(os.getenv("PROFILE_KEEP", 50))
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Hook task creation and stage timings; call once from the running loop"""
+        # The module-level profiler is created on import, before the app loads .env
+        self.configure()
+        if not self.enabled:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+
+        previous_factory = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous_factory is not None:
+                task = previous_factory(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            context = kwargs.get("context")
+            profile = context.get(_active_profile) if context is not None else _active_profile.get()
+            if profile is not None:
+                profile.tasks.add(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        TIMING_HOOKS.append(self._record_timing)
+        logger.info(f"Request profiling enabled (sample interval {self.sample_interval * 1000:.1f}ms)")
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return self.enabled and bool(token) and token == self.admin_token
+
+    def wants_profile(self, request) -> bool:
+        """
+        Profile when the request carries the admin token in X-Profile-Token.
+        ?profile=0 turns it off; the token is never read from the URL, where
+        access logs and proxies would keep it.
+        """
+        if not self.enabled or self._loop is None:
+            return False
+        if not self.is_admin(request.headers.get("X-Profile-Token")):
+            return False
+        return request.query_params.get("profile", "1").lower() not in ("0", "false", "no", "off")
+
+    def requested(self) -> bool:
+        """Whether the current context descends from a profiled request"""
+        return self.enabled and self._loop is not None and _profile_requested.get()
+
+    @asynccontextmanager
+    async def profile(self, name: str, kind: str = "request"):
+        profile = Profile(name, kind, self.sample_interval)
+        profile_token = _active_profile.set(profile)
+        requested_token = _profile_requested.set(True)
+        current = asyncio.current_task()
+        if current is not None:
+            profile.tasks.add(current)
+
+        with self._lock:
+            self._active.append(profile)
+            self._ensure_sampler()
+        try:
+            yield profile
+        finally:
+            profile.end = time.perf_counter()
+            with self._lock:
+                self._active.remove(profile)
+                self.profiles[profile.id] = profile
+                while len(self.profiles) > self.keep:
+                    self.profiles.popitem(last=False)
+            _active_profile.reset(profile_token)
+            _profile_requested.reset(requested_token)
+            logger.info(
+                f"Profiled {kind} '{name}' as {profile.id}: "
+                f"{profile.duration * 1000:.0f}ms, {sum(profile.samples.values())} samples"
+            )
+
+    def profiled(self, kind: str):
+        """Decorator profiling an async job when it was scheduled by a profiled request"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.requested():
+                    return await func(*args, **kwargs)
+                label = " ".join([func.__name__] + [str(arg) for arg in args[:1]])
+                async with self.profile(label, kind=kind):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self.profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [profile.summary() for profile in reversed(self.profiles.values())]
+
+    def _record_timing(self, metric_name: str, labels: Dict[str, str], start: float, duration: float):
+        profile = _active_profile.get()
+        if profile is not None and metric_name != "menu_http_request_duration_seconds":
+            profile.add_stage(_stage_name(metric_name, labels), start, duration)
+
+    def _ensure_sampler(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._thread = None
+                    return
+            try:
+                self._take_sample(active)
+            except Exception as e:
+                # Racing the event loop; drop the sample rather than the profile
+                logger.debug(f"Profiler sample failed: {e}")
+            time.sleep(self.sample_interval)
+
+    def _take_sample(self, active: List[Profile]):
+        running = _running_task(self._loop)
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+
+        for profile in active:
+            tasks = list(profile.tasks)
+            if running is not None and running in tasks and loop_frame is not None:
+                stack = ["on-cpu", f"task:{running.get_name()}"] + _stack_from_frame(loop_frame)
+                profile.samples[";".join(stack)] += 1
+                continue
+
+            # Nothing of ours on the CPU - record where each live task is waiting
+            for task in tasks:
+                if task.done():
+                    continue
+                frames = task.get_stack(limit=MAX_STACK_DEPTH)
+                if frames:
+                    stack = ["waiting", f"task:{task.get_name()}"] + [_frame_label(f) for f in frames]
+                    profile.samples[";".join(stack)] += 1
+
+
+profiler = Profiler()
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Callers whose provider requests are counted separately
+FOREGROUND = "foreground"
+WARMER = "warmer"
+
+
+class ProviderUsage:
+    """
+    Image provider requests per minute and caller, shared by all replicas
+    through MongoDB, so the hourly provider quota can be split between
+    uploads and the cache warmer.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+
+    async def record(self, caller: str, count: int = 1):
+        """Count requests sent to a provider; a failed write only loses the count"""
+        minute = datetime.utcnow().replace(second=0, microsecond=0)
+        try:
+            await self.db_service.record_provider_requests(minute, caller, count)
+        except Exception as e:
+            logger.warning(f"Could not record {count} {caller} provider requests: {e}")
+
+    async def last_hour(self) -> Dict[str, int]:
+        """Requests by caller over the last hour"""
+        return await self.db_service.get_provider_usage(datetime.utcnow() - timedelta(hours=1))
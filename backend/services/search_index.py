@@ -0,0 +1,132 @@
+import re
+import unicodedata
+from typing import List, Dict, Any
+
+# Precomputed search fields stored on each product document
+SEARCH_FIELDS = ("name_norm", "aliases_norm", "search_tokens")
+
+# Any run of non-word characters (keeps letters of every script, e.g. Cyrillic)
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized, de-duplicated tokens"""
+    tokens = []
+    for token in normalize_text(text).split():
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def build_search_fields(name: str, aliases: List[str]) -> Dict[str, Any]:
+    """Build the normalized fields used by the indexed search path"""
+    aliases_norm = []
+    for alias in aliases or []:
+        alias_norm = normalize_text(alias)
+        if alias_norm and alias_norm not in aliases_norm:
+            aliases_norm.append(alias_norm)
+
+    search_tokens = tokenize(name)
+    for alias_norm in aliases_norm:
+        for token in alias_norm.split():
+            if token not in search_tokens:
+                search_tokens.append(token)
+
+    return {
+        "name_norm": normalize_text(name),
+        "aliases_norm": aliases_norm,
+        "search_tokens": search_tokens
+    }
+
+
+def build_search_query(query: str, prefix: bool = True) -> Dict[str, Any]:
+    """
+    Build an index-friendly Mongo filter for a search string.
+
+    Only exact values and anchored, case-sensitive regexes are used against
+    the normalized fields so every clause can use its index. Normalized text
+    only contains word characters and single spaces, so user input cannot
+    inject regex metacharacters.
+    """
+    query_norm = normalize_text(query)
+    tokens = tokenize(query)
+    if not query_norm:
+        return {}
+
+    clauses = [
+        {"name_norm": query_norm},
+        {"aliases_norm": query_norm},
+        {"search_tokens": {"$in": tokens}}
+    ]
+    if prefix:
+        anchored = {"$regex": f"^{query_norm}"}
+        clauses.append({"name_norm": anchored})
+        clauses.append({"aliases_norm": anchored})
+        # Treat the last token as incomplete (search-as-you-type)
+        clauses.append({"search_tokens": {"$regex": f"^{tokens[-1]}"}})
+
+    return {"$or": clauses}
+
+
+def build_search_tiers(query: str, prefix: bool = True) -> List[Dict[str, Any]]:
+    """
+    The clauses of build_search_query as separate filters, strongest match
+    first: exact name/alias, name/alias prefix, all tokens, any token. Every
+    product a tier matches outranks those only later tiers match.
+    """
+    query_norm = normalize_text(query)
+    tokens = tokenize(query)
+    if not query_norm:
+        return []
+
+    tiers = [{"$or": [{"name_norm": query_norm}, {"aliases_norm": query_norm}]}]
+    if prefix:
+        anchored = {"$regex": f"^{query_norm}"}
+        tiers.append({"$or": [{"name_norm": anchored}, {"aliases_norm": anchored}]})
+    if len(tokens) > 1:
+        tiers.append({"search_tokens": {"$all": tokens}})
+    token_clauses = [{"search_tokens": {"$in": tokens}}]
+    if prefix:
+        # Treat the last token as incomplete (search-as-you-type)
+        token_clauses.append({"search_tokens": {"$regex": f"^{tokens[-1]}"}})
+    tiers.append({"$or": token_clauses})
+    return tiers
+
+
+def rank_product(product: Dict[str, Any], query: str) -> float:
+    """Score a candidate product against a search string (0-100)"""
+    query_norm = normalize_text(query)
+    tokens = tokenize(query)
+    if not query_norm:
+        return 0.0
+
+    name_norm = product.get("name_norm") or normalize_text(product.get("name", ""))
+    aliases_norm = product.get("aliases_norm") or [normalize_text(a) for a in product.get("aliases", [])]
+    product_tokens = product.get("search_tokens") or tokenize(" ".join([name_norm] + aliases_norm))
+
+    if name_norm == query_norm:
+        return 100.0
+    if query_norm in aliases_norm:
+        return 90.0
+    if name_norm.startswith(query_norm):
+        return 80.0
+    if any(alias.startswith(query_norm) for alias in aliases_norm):
+        return 70.0
+
+    # Token overlap, last token may be a prefix
+    matched = 0
+    for i, token in enumerate(tokens):
+        if token in product_tokens:
+            matched += 1
+        elif i == len(tokens) - 1 and any(t.startswith(token) for t in product_tokens):
+            matched += 0.5
+    return round(60.0 * matched / len(tokens), 2)
@@ -0,0 +1,87 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from services.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """
+    Bounded LRU of session documents, as stored (compact).
+
+    Entries are served for ttl seconds after they were read or checked.
+    After that an entry is only served again once the caller has confirmed,
+    with a cheap updated_at lookup, that no replica changed the session
+    since (revalidate). Cached documents are shared; callers must not
+    mutate them.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size if max_size is not None else int(os.getenv("SESSION_CACHE_SIZE", 1000))
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_CACHE_TTL", 2.0))
+        # session id -> (document, fresh until)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """A session checked within the last ttl seconds"""
+        entry = self._entries.get(session_id)
+        if entry is None or entry[1] < time.monotonic():
+            CACHE_REQUESTS.inc(cache="session", result="miss")
+            return None
+        self._entries.move_to_end(session_id)
+        CACHE_REQUESTS.inc(cache="session", result="hit")
+        return entry[0]
+
+    def stale(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """A cached session past its ttl, to revalidate against MongoDB"""
+        entry = self._entries.get(session_id)
+        return entry[0] if entry is not None else None
+
+    def revalidate(self, session_id: str, updated_at: Any) -> Optional[Dict[str, Any]]:
+        """
+        Serve a stale entry for another ttl if the session's stored updated_at
+        still matches it; otherwise drop it. Sessions without updated_at are
+        never revalidated.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        document = entry[0]
+        if updated_at is None or document.get("updated_at") != updated_at:
+            del self._entries[session_id]
+            return None
+        self._entries[session_id] = (document, time.monotonic() + self.ttl)
+        self._entries.move_to_end(session_id)
+        CACHE_REQUESTS.inc(cache="session", result="revalidated")
+        return document
+
+    def put(self, session_id: str, document: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+        self._entries[session_id] = (document, time.monotonic() + self.ttl)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, session_id: str, update_data: Dict[str, Any]):
+        """Apply a $set-style update to a cached session (write-through)"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        if any("." in key for key in update_data):
+            # Nested paths are not applied in memory; read the next copy from MongoDB
+            self.invalidate(session_id)
+            return
+        document, fresh_until = entry
+        # Copy so documents already handed out are not changed underneath readers
+        self._entries[session_id] = ({**document, **update_data}, fresh_until)
+
+    def invalidate(self, session_id: str):
+        self._entries.pop(session_id, None)
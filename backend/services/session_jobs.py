@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional
+import logging
+
+from services.metrics import BACKGROUND_CANCELLATIONS
+
+logger = logging.getLogger(__name__)
+
+# Cancellations the client did not ask for; its next poll resumes the session
+AUTO_RESUME_REASONS = ("abandoned", "shutdown")
+
+
+class ImageJob:
+    """One session's image search run: its per-item tasks and when a client last asked for it"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.tasks: Optional[List[asyncio.Task]] = None
+        # The detached task running the whole job
+        self.runner: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        self.cancel_reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def started(self, tasks: List[asyncio.Task]):
+        self.tasks = tasks
+
+    def cancel(self, reason: str) -> bool:
+        """
+        Cancel the item searches still queued or running; finished items keep
+        their images. A job still waiting to start is skipped when it does.
+        """
+        if self.cancelled:
+            return False
+        if self.tasks is not None:
+            pending = [task for task in self.tasks if not task.done()]
+            if not pending:
+                return False
+            for task in pending:
+                task.cancel()
+        self.cancel_reason = reason
+        BACKGROUND_CANCELLATIONS.inc(reason=reason)
+        return True
+
+
+class SessionJobs:
+    """
+    Image jobs running in this process, by session.
+
+    Clients poll /session/{id}/status while images load. A job nobody has
+    polled for abandon_after seconds is cancelled, as is one cancelled
+    explicitly; either way its partial results are kept for a resume.
+    """
+
+    def __init__(self):
+        # 0 disables abandonment detection; explicit cancels still work
+        self.abandon_after = float(os.getenv("SESSION_ABANDON_TIMEOUT", 30))
+        self.sweep_interval = float(os.getenv("SESSION_ABANDON_SWEEP_INTERVAL", 5))
+        self._jobs: Dict[str, ImageJob] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def start(self, session_id: str) -> ImageJob:
+        job = ImageJob(session_id)
+        self._jobs[session_id] = job
+        return job
+
+    def finish(self, job: ImageJob):
+        if self._jobs.get(job.session_id) is job:
+            del self._jobs[job.session_id]
+
+    def running(self, session_id: str) -> bool:
+        return session_id in self._jobs
+
+    def touch(self, session_id: str):
+        """Record that a client is still waiting for the session"""
+        job = self._jobs.get(session_id)
+        if job is not None:
+            job.last_seen = time.monotonic()
+
+    def cancel(self, session_id: str, reason: str = "client") -> bool:
+        job = self._jobs.get(session_id)
+        return job is not None and job.cancel(reason)
+
+    async def supersede(self, session_id: str):
+        """
+        Cancel a session's job and wait until it has stored its partial
+        results, so a job started after it for new items is not overwritten
+        """
+        job = self._jobs.get(session_id)
+        if job is None:
+            return
+        job.cancel("superseded")
+        if job.runner is not None and not job.runner.done():
+            await asyncio.wait([job.runner])
+
+    def sweep(self) -> int:
+        """Cancel the jobs of sessions no client has asked about lately"""
+        if self.abandon_after <= 0:
+            return 0
+        cutoff = time.monotonic() - self.abandon_after
+        abandoned = [job for job in self._jobs.values() if job.last_seen < cutoff]
+        cancelled = sum(1 for job in abandoned if job.cancel("abandoned"))
+        if cancelled:
+            logger.info(f"Cancelled image processing of {cancelled} abandoned sessions")
+        return cancelled
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """Cancel every job and give them time to store their partial results"""
+        if timeout is None:
+            timeout = float(os.getenv("SESSION_JOBS_SHUTDOWN_TIMEOUT", 5))
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel("shutdown")
+        runners = [job.runner for job in jobs if job.runner is not None and not job.runner.done()]
+        if runners:
+            _, pending = await asyncio.wait(runners, timeout=timeout)
+            for runner in pending:
+                runner.cancel()
+            logger.info(f"Stopped {len(runners)} image jobs on shutdown ({len(pending)} did not finish in time)")
+
+    async def run_forever(self):
+        """Sweep for abandoned sessions until cancelled"""
+        if self.abandon_after <= 0:
+            return
+        logger.info(f"Abandoned session sweeper started: cancelling after {self.abandon_after:.0f}s without polls")
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
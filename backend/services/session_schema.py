@@ -0,0 +1,82 @@
+from typing import Dict, Any, List
+
+# Compact sessions keep each OCR item once, in "matches"
+SESSION_SCHEMA_VERSION = 2
+
+# OCR fields carried on every match, used to rebuild structured_ocr.products
+OCR_PRODUCT_FIELDS = ("name", "nameEnglish", "price", "description", "parsingError")
+
+# Fields of an expanded session that clients may see; storage paths, hashes,
+# schema, archive and dedup bookkeeping stay internal
+PUBLIC_SESSION_FIELDS = (
+    "_id", "upload_time", "raw_ocr_text", "parsed_items", "structured_ocr", "matches", "ocr_error",
+    "images_processed", "images_cancelled", "menu_id", "previous_session_id",
+    "reused_items", "reused_matches", "recomputed_items", "removed_items"
+)
+
+
+def compact_session(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop the duplicated copies of the OCR output from a session document.
+
+    parsed_items and structured_ocr.products are both derivable from matches,
+    so only matches and the OCR error are stored.
+    """
+    if session_data.get("schema_version") == SESSION_SCHEMA_VERSION:
+        return session_data
+
+    compact = {
+        key: value for key, value in session_data.items()
+        if key not in ("parsed_items", "structured_ocr", "raw_ocr_text")
+    }
+    compact["ocr_error"] = session_data.get("ocr_error", (session_data.get("structured_ocr") or {}).get("error", ""))
+    compact.setdefault("matches", [])
+    compact["schema_version"] = SESSION_SCHEMA_VERSION
+    return compact
+
+
+def expand_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the legacy session fields from a compact document on read"""
+    if not session or session.get("schema_version") != SESSION_SCHEMA_VERSION:
+        return session
+
+    matches: List[Dict[str, Any]] = session.get("matches", [])
+    expanded = dict(session)
+    expanded["raw_ocr_text"] = ""
+    expanded["parsed_items"] = [match.get("name", "") for match in matches]
+    expanded["structured_ocr"] = {
+        "products": [
+            {field: match.get(field, "") or "" for field in OCR_PRODUCT_FIELDS}
+            for match in matches
+        ],
+        "error": session.get("ocr_error", "")
+    }
+    return expanded
+
+
+def public_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """An expanded session reduced to PUBLIC_SESSION_FIELDS"""
+    return {field: session[field] for field in PUBLIC_SESSION_FIELDS if field in session}
+
+
+def build_session_items(matches: List[Dict[str, Any]], ocr_products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge catalog matches with their OCR details (images are filled in later)"""
+    items = []
+    for i, match in enumerate(matches):
+        # Find corresponding OCR product
+        ocr_product = ocr_products[i] if i < len(ocr_products) else {}
+
+        items.append({
+            "name": match["name"],
+            "nameEnglish": ocr_product.get("nameEnglish", ""),
+            "matched": match["matched"],
+            "confidence": match.get("confidence"),
+            "product_id": match.get("product_id"),
+            "image_url": None,  # Will be populated by background task
+            "images": [],  # Will be populated by background task
+            "price": ocr_product.get("price", ""),
+            "description": ocr_product.get("description", ""),
+            "parsingError": ocr_product.get("parsingError", "")
+        })
+    return items
+
@@ -0,0 +1,99 @@
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Any, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StartupStep:
+    """One initialization step and its progress"""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]], depends_on: Sequence[str], required: bool):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.required = required
+        self.done = asyncio.Event()
+        self.status = "pending"
+        self.attempts = 0
+        self.duration = 0.0
+        self.error = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "attempts": self.attempts,
+            "duration_ms": round(self.duration * 1000, 1),
+            "error": self.error
+        }
+
+
+class StartupCoordinator:
+    """
+    Runs initialization steps concurrently, each as soon as its dependencies
+    are done, and retries failed steps with capped exponential backoff so a
+    dependency that is down delays readiness instead of killing the process.
+    """
+
+    def __init__(self):
+        self.retry_delay = float(os.getenv("STARTUP_RETRY_DELAY", 1.0))
+        self.max_retry_delay = float(os.getenv("STARTUP_MAX_RETRY_DELAY", 30.0))
+        self.steps: Dict[str, StartupStep] = {}
+        self.started_at = time.perf_counter()
+        self.ready_at = None
+
+    def add(self, name: str, func: Callable[[], Awaitable[Any]], depends_on: Sequence[str] = (),
+            required: bool = True):
+        self.steps[name] = StartupStep(name, func, depends_on, required)
+
+    @property
+    def ready(self) -> bool:
+        return all(step.status == "ready" for step in self.steps.values() if step.required)
+
+    async def run(self):
+        """Run every step to completion"""
+        await asyncio.gather(*[self._run_step(step) for step in self.steps.values()])
+
+    async def _run_step(self, step: StartupStep):
+        for dependency in step.depends_on:
+            await self.steps[dependency].done.wait()
+
+        delay = self.retry_delay
+        while True:
+            step.status = "running"
+            step.attempts += 1
+            start = time.perf_counter()
+            try:
+                await step.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                step.duration = time.perf_counter() - start
+                step.status = "retrying"
+                step.error = str(e)
+                logger.warning(f"Startup step '{step.name}' failed (attempt {step.attempts}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(self.max_retry_delay, delay * 2)
+                continue
+
+            step.duration = time.perf_counter() - start
+            step.status = "ready"
+            step.error = None
+            step.done.set()
+            logger.info(f"Startup step '{step.name}' ready in {step.duration * 1000:.0f}ms")
+            break
+
+        if self.ready and self.ready_at is None:
+            self.ready_at = time.perf_counter()
+            logger.info(f"Service ready {self.ready_at - self.started_at:.2f}s after startup")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.perf_counter() - self.started_at, 1),
+            "ready_after_s": round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+            "steps": {name: step.describe() for name, step in self.steps.items()}
+        }
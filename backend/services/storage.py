@@ -1,4 +1,5 @@
 import os
+import asyncio
 import uuid
 from minio import Minio
 from minio.error import S3Error
@@ -24,9 +25,10 @@ class StorageService:
             secret_key=self.secret_key,
             secure=self.secure
         )
-        
-        # Ensure bucket exists
-        self._ensure_bucket_exists()
+    
+    async def connect(self):
+        """Ensure the bucket exists (the client itself connects lazily)"""
+        await asyncio.to_thread(self._ensure_bucket_exists)
     
     def _ensure_bucket_exists(self):
         """Create bucket if it doesn't exist"""
@@ -73,6 +75,39 @@ class StorageService:
             logger.error(f"Error storing image: {e}")
             raise
     
+    def put_bytes(self, object_name: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+        """Store raw bytes under object_name"""
+        try:
+            from io import BytesIO
+            self.client.put_object(
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                data=BytesIO(data),
+                length=len(data),
+                content_type=content_type
+            )
+            return object_name
+        except S3Error as e:
+            logger.error(f"Error storing object {object_name}: {e}")
+            raise
+    
+    def get_bytes(self, object_name: str) -> bytes:
+        """Read raw bytes of object_name"""
+        response = None
+        try:
+            response = self.client.get_object(
+                bucket_name=self.bucket_name,
+                object_name=object_name
+            )
+            return response.read()
+        except S3Error as e:
+            logger.error(f"Error reading object {object_name}: {e}")
+            raise
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+    
     def get_image_url(self, object_name: str) -> str:
         """Get presigned URL for image access"""
         try:
@@ -0,0 +1,269 @@
+import os
+import copy
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError, WriteError, WTimeoutError
+
+from services.metrics import QUEUE_DEPTH, SESSION_FLUSH_SECONDS, SESSION_FLUSH_BATCH_SIZE, SESSION_FLUSH_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether writing the same update again may succeed (lost connection, failover, write concern)"""
+    if isinstance(error, (ConnectionFailure, ExecutionTimeout, WTimeoutError)):
+        return True
+    if isinstance(error, BulkWriteError):
+        # Only the write concern failed; no update was rejected
+        return not error.details.get("writeErrors")
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+
+class _PendingWrite:
+    """Coalesced fields to $set on one session, and the callers waiting for them to land"""
+
+    __slots__ = ("fields", "waiters", "attempts")
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+        self.waiters: List[asyncio.Future] = []
+        # Flushes that failed transiently
+        self.attempts = 0
+
+    def merge(self, newer: "_PendingWrite"):
+        self.fields.update(newer.fields)
+        self.waiters.extend(newer.waiters)
+
+    def apply(self, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if document is None:
+            return None
+        return {**document, **self.fields}
+
+    def operation(self, session_id: str) -> UpdateOne:
+        # Snapshot: callers keep mutating the objects they handed in (e.g. matches)
+        return UpdateOne({"_id": session_id}, {"$set": copy.deepcopy(self.fields)})
+
+    def resolve(self, matched: bool):
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(matched)
+
+    def fail(self, error: Exception):
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+
+
+class SessionWriteBuffer:
+    """
+    Write-behind buffer for session updates. Sessions are inserted directly,
+    so a stored session is durable and every buffered update has a document
+    to match.
+
+    Updates are coalesced per session and flushed as one unordered bulk
+    write when max_batch sessions are pending or every flush_interval seconds.
+    Readers overlay pending updates, so a process always sees its own writes.
+
+    An update MongoDB rejects fails its waiters and is dropped without
+    holding up the rest of its batch. Transient failures are retried on the
+    next flush, at most max_retries times.
+    """
+
+    def __init__(self, db_service, max_batch: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.db_service = db_service
+        self.enabled = os.getenv("SESSION_WRITE_BEHIND", "true").lower() == "true"
+        self.max_batch = max(1, max_batch or int(os.getenv("SESSION_WRITE_BATCH_SIZE", 100)))
+        self.flush_interval = flush_interval or float(os.getenv("SESSION_WRITE_FLUSH_INTERVAL", 0.25))
+        self.max_retries = int(os.getenv("SESSION_WRITE_MAX_RETRIES", 40))
+        # How long update_session waits for its update to land
+        self.wait_timeout = float(os.getenv("SESSION_WRITE_TIMEOUT", 30))
+
+        self._pending: "OrderedDict[str, _PendingWrite]" = OrderedDict()
+        # Batch being written, still overlaid on reads until it has landed
+        self._in_flight: Dict[str, _PendingWrite] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def update(self, session_id: str, fields: Dict[str, Any], wait: bool = True) -> Optional[asyncio.Future]:
+        """
+        Queue a $set. With wait, returns a future that resolves to whether the
+        session matched once the update is flushed.
+        """
+        write = _PendingWrite(dict(fields))
+        waiter = None
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            write.waiters.append(waiter)
+        self._enqueue(session_id, write)
+        return waiter
+
+    def _enqueue(self, session_id: str, write: _PendingWrite):
+        pending = self._pending.get(session_id)
+        if pending is None:
+            self._pending[session_id] = write
+            QUEUE_DEPTH.inc(queue="session_writes")
+        else:
+            pending.merge(write)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    def overlay(self, session_id: str, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """A session as read from MongoDB, with this process's unflushed writes applied"""
+        for writes in (self._in_flight, self._pending):
+            write = writes.get(session_id)
+            if write is not None:
+                document = write.apply(document)
+        return document
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not await self.flush():
+                # Back off instead of retrying whenever a full batch wakes the loop
+                await asyncio.sleep(self.flush_interval)
+
+    async def flush(self) -> bool:
+        """
+        Write everything pending as bulk writes of up to max_batch sessions.
+        False if a batch failed transiently and was queued again.
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = OrderedDict()
+                while self._pending and len(batch) < self.max_batch:
+                    session_id, write = self._pending.popitem(last=False)
+                    batch[session_id] = write
+                QUEUE_DEPTH.dec(len(batch), queue="session_writes")
+
+                self._in_flight = batch
+                try:
+                    retry = await self._write(batch)
+                except asyncio.CancelledError:
+                    # Writes may still land; writing them again is idempotent
+                    self._requeue(batch)
+                    raise
+                finally:
+                    self._in_flight = {}
+                if retry:
+                    self._requeue(retry)
+                    return False
+            return True
+
+    async def _write(self, batch: "OrderedDict[str, _PendingWrite]") -> "OrderedDict[str, _PendingWrite]":
+        """
+        Write a batch, settling the waiters of every update that landed or was
+        rejected. Returns the writes to retry.
+        """
+        session_ids = list(batch)
+        operations = [write.operation(session_id) for session_id, write in batch.items()]
+        rejected: Dict[str, Exception] = {}
+        try:
+            result = await self._bulk_write(operations)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            if is_transient(e):
+                return self._retry(batch, e)
+            for error in e.details["writeErrors"]:
+                rejected[session_ids[error["index"]]] = WriteError(error.get("errmsg"), error.get("code"), error)
+            matched = e.details.get("nMatched", 0)
+        except Exception as e:
+            if is_transient(e):
+                return self._retry(batch, e)
+            if len(batch) > 1:
+                # Not tied to one update (e.g. a document too large to send): write them one by one
+                retry = OrderedDict()
+                for session_id, write in batch.items():
+                    retry.update(await self._write(OrderedDict([(session_id, write)])))
+                return retry
+            rejected[session_ids[0]] = e
+            matched = 0
+
+        SESSION_FLUSH_BATCH_SIZE.observe(len(operations))
+        for session_id, error in rejected.items():
+            SESSION_FLUSH_ERRORS.inc()
+            logger.error(f"Update of session {session_id} was rejected, dropping it: {error}")
+            batch[session_id].fail(error)
+        landed = {session_id: write for session_id, write in batch.items() if session_id not in rejected}
+        missing = await self._missing(landed) if matched < len(landed) else set()
+        for session_id, write in landed.items():
+            if session_id in missing:
+                logger.warning(f"No session found to update: {session_id}")
+            write.resolve(session_id not in missing)
+        return OrderedDict()
+
+    async def _bulk_write(self, operations: List[UpdateOne]):
+        start = time.perf_counter()
+        try:
+            # Unordered: one rejected update does not stop the others
+            return await asyncio.to_thread(
+                self.db_service.sessions_collection.bulk_write, operations, ordered=False
+            )
+        finally:
+            SESSION_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    def _retry(self, batch: "OrderedDict[str, _PendingWrite]", error: Exception) -> "OrderedDict[str, _PendingWrite]":
+        """The writes of a transiently failed batch that have retries left; the others fail"""
+        SESSION_FLUSH_ERRORS.inc()
+        retry = OrderedDict()
+        for session_id, write in batch.items():
+            write.attempts += 1
+            if write.attempts > self.max_retries:
+                logger.error(f"Giving up on update of session {session_id} after {self.max_retries} retries: {error}")
+                write.fail(error)
+            else:
+                retry[session_id] = write
+        if retry:
+            logger.warning(f"Session write flush of {len(batch)} sessions failed, will retry: {error}")
+        return retry
+
+    async def _missing(self, batch: Dict[str, _PendingWrite]) -> set:
+        """Sessions of a flushed batch that matched no document"""
+        def find():
+            cursor = self.db_service.sessions_collection.find({"_id": {"$in": list(batch)}}, {"_id": 1})
+            return {doc["_id"] for doc in cursor}
+        try:
+            return set(batch) - await asyncio.to_thread(find)
+        except Exception as e:
+            logger.warning(f"Could not check which flushed sessions exist: {e}")
+            return set()
+
+    def _requeue(self, batch: "OrderedDict[str, _PendingWrite]"):
+        """Put a failed batch back ahead of writes queued since, newer writes winning"""
+        for session_id, newer in self._pending.items():
+            if session_id in batch:
+                batch[session_id].merge(newer)
+            else:
+                batch[session_id] = newer
+        QUEUE_DEPTH.inc(len(batch) - len(self._pending), queue="session_writes")
+        self._pending = batch
+
+    async def close(self):
+        """Stop the flush loop and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error(f"{len(self._pending)} session writes could not be flushed on shutdown")
+            for write in self._pending.values():
+                write.fail(RuntimeError("Session write buffer closed before the update was flushed"))
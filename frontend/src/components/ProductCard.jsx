@@ -63,6 +63,8 @@ const ProductCard = ({ item }) => {
             <div className="aspect-w-16 aspect-h-9 rounded-lg overflow-hidden">
               <img
                 src={displayImages[currentImageIndex].url}
+                srcSet={displayImages[currentImageIndex].srcset || undefined}
+                sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
                 alt={name}
                 className="w-full h-32 object-cover rounded-lg"
                 onError={(e) => {